@@ -15,9 +15,17 @@ import functools
 import edgedb
 from fastapi import APIRouter, FastAPI, Request
 from freeauth.conf.settings import get_settings
-from freeauth.ext.fastapi_ext import FreeAuthApp
-
-router = APIRouter(prefix="/v1")
+from freeauth.ext.fastapi_ext import (
+    FastJSONResponse,
+    FreeAuthApp,
+    FreeAuthRoute,
+)
+
+router = APIRouter(
+    prefix="/v1",
+    route_class=FreeAuthRoute,
+    default_response_class=FastJSONResponse,
+)
 auth_app = FreeAuthApp()
 
 
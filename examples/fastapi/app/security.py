@@ -11,6 +11,7 @@
 from __future__ import annotations
 
 import json
+import uuid
 from http import HTTPStatus
 
 from fastapi import Depends, HTTPException, Response
@@ -26,7 +27,11 @@ from freeauth.db.auth.auth_qry_async_edgeql import (
     validate_account,
 )
 from freeauth.ext.fastapi_ext.utils import get_client_info
-from freeauth.security.utils import get_password_hash, verify_password
+from freeauth.security.utils import (
+    get_password_hash,
+    resolve_account,
+    verify_password,
+)
 from pydantic import BaseModel
 
 from .asgi import auth_app, router
@@ -45,9 +50,8 @@ async def authenticate_with_password(
 ) -> SignInResult | None:
     user: ValidateAccountResult | None = await validate_account(
         auth_app.db,
-        username=body.account,
-        mobile=body.account,
-        email=body.account,
+        **resolve_account(body.account),
+        interval=None,
     )
 
     if not user:
@@ -68,11 +72,12 @@ async def authenticate_with_password(
             detail="Invalid Password",
         )
 
-    token = await auth_app.create_access_token(response, user.id)
+    jti = uuid.uuid4()
+    await auth_app.create_access_token(response, user.id, jti)
     return await sign_in(
         auth_app.db,
         id=user.id,
-        access_token=token,
+        jti=jti,
         client_info=json.dumps(client_info),
     )
 
@@ -113,7 +118,8 @@ async def logout(
     if not token:
         return "ok"
 
-    await sign_out(auth_app.db, access_token=token.access_token)
+    await sign_out(auth_app.db, id=token.id)
+    auth_app.token_cache.discard(token.access_token)
     settings = get_settings()
     response.delete_cookie(
         key=settings.jwt_cookie_key,
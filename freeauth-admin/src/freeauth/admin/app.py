@@ -24,11 +24,19 @@ from starlette.responses import JSONResponse, Response
 from starlette.status import HTTP_422_UNPROCESSABLE_ENTITY
 
 from freeauth.conf.settings import get_settings
-from freeauth.ext.fastapi_ext import FreeAuthApp
+from freeauth.ext.fastapi_ext import (
+    FastJSONResponse,
+    FreeAuthApp,
+    FreeAuthRoute,
+)
 
 from .log import configure_logging
 
-router = APIRouter(prefix="/v1")
+router = APIRouter(
+    prefix="/v1",
+    route_class=FreeAuthRoute,
+    default_response_class=FastJSONResponse,
+)
 
 auth_app = FreeAuthApp()
 
@@ -91,7 +99,7 @@ def get_app():
 
     from . import tasks
 
-    tasks.init_app()
+    tasks.init_app(app)
 
     @app.get("/ping", include_in_schema=False)
     async def health_check() -> dict[str, str]:
@@ -100,6 +108,7 @@ def get_app():
     from .applications import endpoints  # noqa
     from .audit_logs import endpoints  # noqa
     from .auth import endpoints  # noqa
+    from .authz import endpoints  # noqa
     from .organizations import endpoints  # noqa
     from .permissions import endpoints  # noqa
     from .roles import endpoints  # noqa
@@ -15,7 +15,7 @@ import uuid
 from http import HTTPStatus
 from typing import Any
 
-from fastapi import Depends, HTTPException, Query
+from fastapi import Depends, HTTPException, Query, Response
 
 from freeauth.db.admin.admin_qry_async_edgeql import (
     DeleteApplicationResult,
@@ -34,6 +34,7 @@ from freeauth.security.utils import gen_random_string, get_password_hash
 
 from ..app import auth_app, router
 from ..dataclasses import PaginatedData, QueryBody
+from ..responses import paginated_response
 from .dataclasses import (
     ApplicationDeleteBody,
     ApplicationStatusBody,
@@ -120,11 +121,12 @@ async def delete_applications(
     tags=["应用管理"],
     summary="获取应用列表",
     description="分页获取，支持关键字搜索、排序及条件过滤",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:apps"))],
 )
 async def get_applications(
     body: QueryBody,
-) -> PaginatedData:
+) -> Response:
     filtering_expr = body.get_filtering_expr(FILTER_TYPE_MAPPING)
     result = await auth_app.db.query_single_json(
         f"""\
@@ -166,7 +168,7 @@ async def get_applications(
         page=body.page,
         per_page=body.per_page,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.get(
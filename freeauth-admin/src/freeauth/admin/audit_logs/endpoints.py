@@ -11,12 +11,21 @@
 
 from __future__ import annotations
 
-from fastapi import Depends
+import uuid
+from datetime import datetime
+from http import HTTPStatus
+
+from fastapi import Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+from freeauth.db.exporting import AuditLogExporter, export_audit_logs_async
 
 from ..app import auth_app, router
 from ..dataclasses import PaginatedData, QueryBody
+from ..responses import paginated_response, parse_export_format
 
 FILTER_TYPE_MAPPING = {
+    "user.id": "uuid",
     "event_type": "AuditEventType",
     "created_at": "datetime",
     "is_succeed": "bool",
@@ -28,11 +37,12 @@ FILTER_TYPE_MAPPING = {
     tags=["审计日志"],
     summary="获取审计日志列表",
     description="分页获取，支持关键字搜索、排序及条件过滤",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:audit_logs"))],
 )
 async def query_audit_logs(
     body: QueryBody,
-) -> PaginatedData:
+) -> Response:
     filtering_expr = body.get_filtering_expr(FILTER_TYPE_MAPPING)
     result = await auth_app.db.query_single_json(
         f"""\
@@ -40,16 +50,15 @@ async def query_audit_logs(
             page := <optional int64>$page ?? 1,
             per_page := <optional int64>$per_page ?? 20,
             q := <optional str>$q,
+            pattern := '%' ++ q ++ '%',
+            matched_users := search_users(q),
             audit_logs := (
                 SELECT AuditLog
                 FILTER (
                     true IF not EXISTS q ELSE
-                    .raw_ua ?? '' ILIKE q OR
-                    .client_ip ?? '' ILIKE q OR
-                    .user.name ?? '' ILIKE q OR
-                    .user.username ?? '' ILIKE q OR
-                    .user.mobile ?? '' ILIKE q OR
-                    .user.email ?? '' ILIKE q
+                    .user IN matched_users OR
+                    .client_ip ILIKE pattern OR
+                    .raw_ua ?? '' ILIKE pattern
                 ) AND {filtering_expr}
             ),
             total := count(audit_logs)
@@ -83,9 +92,56 @@ async def query_audit_logs(
             ))
         );\
         """,
-        q=f"%{body.q}%" if body.q else None,
+        q=body.q or None,
         page=body.page,
         per_page=body.per_page,
     )
 
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
+
+
+@router.get(
+    "/audit_logs/export",
+    tags=["审计日志"],
+    summary="导出审计日志",
+    description=(
+        "按创建时间顺序流式导出指定时间段内的审计日志，格式为 NDJSON 或"
+        " gzip 压缩的 CSV；下载中断后，可传入最后收到的一条日志的创建时间"
+        "和 ID 继续导出。未指定时区的时间按 UTC 处理"
+    ),
+    dependencies=[Depends(auth_app.perm_accepted("manage:audit_logs"))],
+)
+async def export_audit_logs(
+    fmt: str = Depends(parse_export_format),
+    since: datetime = Query(..., title="开始时间（包含）"),
+    until: datetime = Query(..., title="结束时间（不包含）"),
+    after_created_at: datetime
+    | None = Query(None, title="已导出的最后一条日志的创建时间"),
+    after_id: uuid.UUID
+    | None = Query(None, title="已导出的最后一条日志的 ID"),
+) -> StreamingResponse:
+    if (after_created_at is None) != (after_id is None):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail={"after_id": "after_created_at 和 after_id 需同时提供"},
+        )
+    exporter = AuditLogExporter(
+        fmt,
+        since,
+        until,
+        after=(after_created_at, after_id) if after_id else None,
+    )
+    if exporter.until <= exporter.since:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail={"until": "结束时间需晚于开始时间"},
+        )
+    return StreamingResponse(
+        export_audit_logs_async(auth_app.db, exporter),
+        media_type=exporter.media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{exporter.filename}"'
+            )
+        },
+    )
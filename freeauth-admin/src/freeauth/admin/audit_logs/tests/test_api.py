@@ -0,0 +1,74 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+from __future__ import annotations
+
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from freeauth.db.auth.auth_qry_async_edgeql import SignInResult
+
+
+@pytest.mark.parametrize(
+    "keyword,matched",
+    [
+        ("Mac OS X", True),
+        ("chrome/112", True),
+        ("162.158", True),
+        ("162.158.233.39", True),
+        ("39", True),
+        ("Firefox", False),
+        ("10.0.0.1", False),
+    ],
+)
+def test_query_audit_logs_by_client(
+    bo_client: TestClient, bo_user: SignInResult, keyword: str, matched: bool
+):
+    resp = bo_client.post("/v1/audit_logs/query", json={"q": keyword})
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    user_ids = [row["user"]["id"] for row in rv["rows"]]
+    assert (str(bo_user.id) in user_ids) is matched
+
+
+def test_query_audit_logs_by_user(
+    bo_client: TestClient, bo_user: SignInResult
+):
+    assert bo_user.mobile
+    for keyword in (bo_user.mobile, bo_user.mobile[-4:], bo_user.mobile[:2]):
+        resp = bo_client.post("/v1/audit_logs/query", json={"q": keyword})
+        rv = resp.json()
+        assert resp.status_code == HTTPStatus.OK, rv
+        assert str(bo_user.id) in [row["user"]["id"] for row in rv["rows"]]
+
+
+def test_query_audit_logs_of_user(
+    bo_client: TestClient, bo_user: SignInResult
+):
+    resp = bo_client.post(
+        "/v1/audit_logs/query",
+        json={
+            "filter_by": [
+                {
+                    "field": "user.id",
+                    "operator": "eq",
+                    "value": str(bo_user.id),
+                }
+            ],
+            "order_by": ["-created_at"],
+        },
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["total"] > 0
+    assert {row["user"]["id"] for row in rv["rows"]} == {str(bo_user.id)}
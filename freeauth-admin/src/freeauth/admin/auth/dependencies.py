@@ -18,14 +18,19 @@ import edgedb
 from fastapi import Depends, HTTPException
 
 from freeauth.conf.login_settings import LoginSettings
+from freeauth.conf.settings import get_settings
 from freeauth.db.auth.auth_qry_async_edgeql import (
+    FreeauthAuditStatusCode,
     FreeauthCodeType,
+    FreeauthVerifyType,
     GetUserByAccountResult,
     get_user_by_account,
 )
+from freeauth.ext.fastapi_ext.utils import get_client_info
 from freeauth.security.utils import MOBILE_REGEX
 
 from ..app import auth_app
+from ..audit_logs.dataclasses import AUDIT_STATUS_CODE_MAPPING
 from .dataclasses import (
     SignInCodeBody,
     SignInSendCodeBody,
@@ -149,12 +154,116 @@ async def verify_account_when_send_code(
     )
 
 
-async def verify_account_when_sign_in_with_code(
-    body: SignInCodeBody,
-) -> GetUserByAccountResult:
-    is_sms = re.match(MOBILE_REGEX, body.account)
-    return await get_signin_account(
-        auth_app.db,
-        mobile=body.account if is_sms else None,
-        email=body.account if not is_sms else None,
+def code_rate_limits(
+    verify_type: FreeauthVerifyType,
+    action: str,
+    account: str,
+    client_info: dict,
+    max_attempts: int,
+) -> dict[str, int]:
+    prefix = f"code:{verify_type.value}:{action}"
+    limits = {f"{prefix}:account:{account}": max_attempts}
+    client_ip = client_info.get("client_ip")
+    if client_ip:
+        limits[f"{prefix}:ip:{client_ip}"] = (
+            max_attempts * get_settings().code_rate_limit_ip_multiplier
+        )
+    return limits
+
+
+async def limit_code_sending(
+    verify_type: FreeauthVerifyType,
+    account: str,
+    client_info: dict,
+    max_attempts: int,
+    interval: int,
+):
+    limits = code_rate_limits(
+        verify_type, "send", account, client_info, max_attempts
     )
+    if not await auth_app.rate_limiter.hit(limits, interval * 60):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail={"code": "验证码获取次数超限，请稍后再次获取"},
+        )
+
+
+async def limit_code_validating(
+    verify_type: FreeauthVerifyType,
+    account: str,
+    client_info: dict,
+    max_attempts: int,
+    interval: int,
+):
+    limits = code_rate_limits(
+        verify_type, "validate", account, client_info, max_attempts
+    )
+    if await auth_app.rate_limiter.exceeded(limits, interval * 60):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail={
+                "code": AUDIT_STATUS_CODE_MAPPING[
+                    FreeauthAuditStatusCode.CODE_ATTEMPTS_EXCEEDED
+                ]
+            },
+        )
+
+
+async def limit_signup_code_sending(
+    body: SignUpSendCodeBody,
+    client_info: dict = Depends(get_client_info),
+    login_settings: LoginSettings = Depends(auth_app.login_settings),
+):
+    if login_settings.signup_code_sending_limit_enabled:
+        await limit_code_sending(
+            FreeauthVerifyType.SIGNUP,
+            body.account,
+            client_info,
+            login_settings.signup_code_sending_max_attempts,
+            login_settings.signup_code_sending_interval,
+        )
+
+
+async def limit_signin_code_sending(
+    body: SignInSendCodeBody,
+    client_info: dict = Depends(get_client_info),
+    login_settings: LoginSettings = Depends(auth_app.login_settings),
+):
+    if login_settings.signin_code_sending_limit_enabled:
+        await limit_code_sending(
+            FreeauthVerifyType.SIGNIN,
+            body.account,
+            client_info,
+            login_settings.signin_code_sending_max_attempts,
+            login_settings.signin_code_sending_interval,
+        )
+
+
+async def limit_signup_code_validating(
+    body: SignUpBody,
+    client_info: dict = Depends(get_client_info),
+    login_settings: LoginSettings = Depends(auth_app.login_settings),
+):
+    if login_settings.signup_code_validating_limit_enabled:
+        await limit_code_validating(
+            FreeauthVerifyType.SIGNUP,
+            body.account,
+            client_info,
+            login_settings.signup_code_validating_max_attempts,
+            login_settings.signup_code_validating_interval,
+        )
+
+
+async def limit_signin_code_validating(
+    body: SignInCodeBody,
+    client_info: dict = Depends(get_client_info),
+    login_settings: LoginSettings = Depends(auth_app.login_settings),
+):
+    if login_settings.signin_code_validating_limit_enabled:
+        await limit_code_validating(
+            FreeauthVerifyType.SIGNIN,
+            body.account,
+            client_info,
+            login_settings.signin_code_validating_max_attempts,
+            login_settings.signin_code_validating_interval,
+        )
@@ -14,6 +14,7 @@ from __future__ import annotations
 import json
 import re
 import string
+import uuid
 from http import HTTPStatus
 
 from fastapi import BackgroundTasks, Depends, HTTPException, Response
@@ -27,33 +28,36 @@ from freeauth.db.auth.auth_qry_async_edgeql import (
     FreeauthVerifyType,
     GetCurrentUserResult,
     GetUserByAccessTokenResult,
-    GetUserByAccountResult,
     SendCodeResult,
     SignInResult,
     ValidateAccountResult,
     ValidateCodeResult,
+    VerifyCodeAndSignInResult,
     create_audit_log,
+    record_pwd_failure,
     send_code,
     sign_in,
     sign_out,
-    sign_up,
+    sign_up_and_sign_in,
     update_profile,
     update_pwd,
     validate_account,
     validate_code,
+    verify_code_and_sign_in,
 )
 from freeauth.ext.fastapi_ext.utils import get_client_info
 from freeauth.security.utils import (
     MOBILE_REGEX,
     gen_random_string,
     get_password_hash,
+    resolve_account,
     verify_password,
 )
 
-from .. import logger
+from .. import logger, tasks
 from ..app import auth_app, router
 from ..audit_logs.dataclasses import AUDIT_STATUS_CODE_MAPPING
-from ..tasks import send_email, sms_provider
+from ..tasks import send_email
 from .dataclasses import (
     ResetPwdBody,
     SignInCodeBody,
@@ -64,8 +68,12 @@ from .dataclasses import (
     UpdateProfileBody,
 )
 from .dependencies import (
+    code_rate_limits,
+    limit_signin_code_sending,
+    limit_signin_code_validating,
+    limit_signup_code_sending,
+    limit_signup_code_validating,
     verify_account_when_send_code,
-    verify_account_when_sign_in_with_code,
     verify_account_when_sign_up,
     verify_new_account_when_send_code,
 )
@@ -130,9 +138,9 @@ async def send_auth_code(
                 ttl=ttl or settings.verify_code_ttl,
             ),
         )
-    elif code_type == FreeauthCodeType.SMS and sms_provider:
+    elif code_type == FreeauthCodeType.SMS and tasks.sms_dispatcher:
         background_tasks.add_task(
-            sms_provider.send_auth_code,
+            tasks.sms_dispatcher.send_auth_code,
             account,
             code,
             ttl or settings.verify_code_ttl,
@@ -140,12 +148,26 @@ async def send_auth_code(
     return rv
 
 
+async def limit_code_failure(
+    verify_type: FreeauthVerifyType,
+    account: str,
+    max_attempts: int | None,
+    interval: int | None,
+    client_info: dict,
+):
+    if max_attempts is not None and interval:
+        limits = code_rate_limits(
+            verify_type, "validate", account, client_info, max_attempts
+        )
+        await auth_app.rate_limiter.add(limits, interval * 60)
+
+
 async def validate_auth_code(
     account: str,
     verify_type: FreeauthVerifyType,
     code: str,
     max_attempts: int | None,
-    user: GetUserByAccountResult | None,
+    interval: int | None,
     client_info: dict,
 ):
     code_type = FreeauthCodeType.EMAIL
@@ -161,14 +183,9 @@ async def validate_auth_code(
     )
     status_code = FreeauthAuditStatusCode(str(rv.status_code))
     if status_code != FreeauthAuditStatusCode.OK:
-        if user:
-            await create_audit_log(
-                auth_app.db,
-                user_id=user.id,
-                client_info=json.dumps(client_info),
-                status_code=status_code.value,  # type: ignore
-                event_type=FreeauthAuditEventType.SIGNIN.value,  # type: ignore
-            )
+        await limit_code_failure(
+            verify_type, account, max_attempts, interval, client_info
+        )
         raise HTTPException(
             status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
             detail={"code": AUDIT_STATUS_CODE_MAPPING[status_code]},
@@ -180,7 +197,10 @@ async def validate_auth_code(
     tags=["认证相关"],
     summary="发送注册验证码",
     description="通过短信或邮件发送注册验证码",
-    dependencies=[Depends(verify_new_account_when_send_code)],
+    dependencies=[
+        Depends(limit_signup_code_sending),
+        Depends(verify_new_account_when_send_code),
+    ],
 )
 async def send_signup_code(
     body: SignUpSendCodeBody,
@@ -215,7 +235,10 @@ async def send_signup_code(
     tags=["认证相关"],
     summary="使用验证码注册账号",
     description="通过手机号或邮箱注册账号",
-    dependencies=[Depends(verify_account_when_sign_up)],
+    dependencies=[
+        Depends(limit_signup_code_validating),
+        Depends(verify_account_when_sign_up),
+    ],
 )
 async def sign_up_with_code(
     body: SignUpBody,
@@ -232,14 +255,19 @@ async def sign_up_with_code(
             if settings.signup_code_validating_limit_enabled
             else None
         ),
-        user=None,
+        interval=(
+            settings.signup_code_validating_interval
+            if settings.signup_code_validating_limit_enabled
+            else None
+        ),
         client_info=client_info,
     )
     code_type: FreeauthCodeType = body.code_type
     username: str = gen_random_string(8)
     password: str = gen_random_string(12, secret=True)
     client_info: str = json.dumps(client_info)
-    user = await sign_up(
+    jti = uuid.uuid4()
+    user = await sign_up_and_sign_in(
         auth_app.db,
         name=username,
         username=username,
@@ -248,14 +276,11 @@ async def sign_up_with_code(
         hashed_password=get_password_hash(password),
         reset_pwd_on_next_login=settings.change_pwd_after_first_login_enabled,
         client_info=client_info,
+        jti=jti,
     )
-    token = await auth_app.create_access_token(response, user.id)
-    return await sign_in(
-        auth_app.db,
-        id=user.id,
-        access_token=token,
-        client_info=client_info,
-    )
+    token = auth_app.encode_access_token(settings, user.id, jti)
+    auth_app.set_access_token_cookie(response, token, settings)
+    return user
 
 
 @router.post(
@@ -263,7 +288,10 @@ async def sign_up_with_code(
     tags=["认证相关"],
     summary="发送登录验证码",
     description="通过短信或邮件发送登录验证码",
-    dependencies=[Depends(verify_account_when_send_code)],
+    dependencies=[
+        Depends(limit_signin_code_sending),
+        Depends(verify_account_when_send_code),
+    ],
 )
 async def send_signin_code(
     body: SignInSendCodeBody,
@@ -298,35 +326,62 @@ async def send_signin_code(
     tags=["认证相关"],
     summary="使用验证码登录账号",
     description="通过手机号或邮箱及验证码登录账号",
+    dependencies=[Depends(limit_signin_code_validating)],
 )
 async def sign_in_with_code(
     body: SignInCodeBody,
     response: Response,
-    user: GetUserByAccountResult = Depends(
-        verify_account_when_sign_in_with_code
-    ),
     client_info: dict = Depends(get_client_info),
     settings: LoginSettings = Depends(auth_app.login_settings),
 ) -> SignInResult | None:
-    await validate_auth_code(
-        account=body.account,
-        verify_type=FreeauthVerifyType.SIGNIN,
-        code=body.code,
-        max_attempts=(
-            settings.signin_code_validating_max_attempts
-            if settings.signin_code_validating_limit_enabled
-            else None
-        ),
-        user=user,
-        client_info=client_info,
+    limit_enabled = settings.signin_code_validating_limit_enabled
+    max_attempts = (
+        settings.signin_code_validating_max_attempts if limit_enabled else None
     )
-    token = await auth_app.create_access_token(response, user.id)
-    return await sign_in(
+    interval = (
+        settings.signin_code_validating_interval if limit_enabled else None
+    )
+    code_type = FreeauthCodeType.EMAIL
+    if re.match(MOBILE_REGEX, body.account):
+        code_type = FreeauthCodeType.SMS
+
+    # The account lookup, the code check, the audit log and the token are
+    # all handled by a single query, which stores the token by its jti.
+    jti = uuid.uuid4()
+    rv: VerifyCodeAndSignInResult = await verify_code_and_sign_in(
         auth_app.db,
-        id=user.id,
-        access_token=token,
+        account=body.account,
+        code_type=code_type.value,  # type: ignore
+        code=body.code,
+        max_attempts=max_attempts,
         client_info=json.dumps(client_info),
+        jti=jti,
     )
+    status_code = FreeauthAuditStatusCode(str(rv.status_code))
+    if status_code in (
+        FreeauthAuditStatusCode.ACCOUNT_NOT_EXISTS,
+        FreeauthAuditStatusCode.ACCOUNT_DISABLED,
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail={"account": AUDIT_STATUS_CODE_MAPPING[status_code]},
+        )
+    if status_code != FreeauthAuditStatusCode.OK:
+        await limit_code_failure(
+            FreeauthVerifyType.SIGNIN,
+            body.account,
+            max_attempts,
+            interval,
+            client_info,
+        )
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail={"code": AUDIT_STATUS_CODE_MAPPING[status_code]},
+        )
+    assert rv.user
+    token = auth_app.encode_access_token(settings, rv.user.id, jti)
+    auth_app.set_access_token_cookie(response, token, settings)
+    return rv.user
 
 
 @router.post(
@@ -349,9 +404,7 @@ async def sign_in_with_pwd(
         )
     user: ValidateAccountResult | None = await validate_account(
         auth_app.db,
-        username=body.account if "username" in pwd_signin_modes else None,
-        mobile=body.account if "mobile" in pwd_signin_modes else None,
-        email=body.account if "email" in pwd_signin_modes else None,
+        **resolve_account(body.account, pwd_signin_modes),
         interval=(
             settings.signin_pwd_validating_interval
             if settings.signin_pwd_validating_limit_enabled
@@ -378,12 +431,20 @@ async def sign_in_with_pwd(
     ):
         field = "password"
         status_code = FreeauthAuditStatusCode.INVALID_PASSWORD
-        if (
-            settings.signin_pwd_validating_limit_enabled
-            and user.recent_failed_attempts
-            >= settings.signin_pwd_validating_max_attempts
-        ):
-            status_code = FreeauthAuditStatusCode.PASSWORD_ATTEMPTS_EXCEEDED
+        if settings.signin_pwd_validating_limit_enabled:
+            if (
+                user.recent_failed_attempts
+                >= settings.signin_pwd_validating_max_attempts
+            ):
+                status_code = (
+                    FreeauthAuditStatusCode.PASSWORD_ATTEMPTS_EXCEEDED
+                )
+            else:
+                await record_pwd_failure(
+                    auth_app.db,
+                    id=user.id,
+                    interval=settings.signin_pwd_validating_interval,
+                )
 
     if status_code:
         await create_audit_log(
@@ -398,11 +459,12 @@ async def sign_in_with_pwd(
             detail={field: AUDIT_STATUS_CODE_MAPPING[status_code]},
         )
 
-    token = await auth_app.create_access_token(response, user.id)
+    jti = uuid.uuid4()
+    await auth_app.create_access_token(response, user.id, jti)
     return await sign_in(
         auth_app.db,
         id=user.id,
-        access_token=token,
+        jti=jti,
         client_info=json.dumps(client_info),
     )
 
@@ -488,7 +550,8 @@ async def post_sign_out(
     if not token:
         return "ok"
 
-    await sign_out(auth_app.db, access_token=token.access_token)
+    await sign_out(auth_app.db, id=token.id)
+    auth_app.token_cache.discard(token.access_token)
     if current_user:
         await create_audit_log(
             auth_app.db,
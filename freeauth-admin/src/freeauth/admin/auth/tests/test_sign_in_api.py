@@ -26,7 +26,10 @@ from freeauth.db.auth.auth_qry_async_edgeql import (
 )
 from freeauth.security.utils import gen_random_string
 
-from ...audit_logs.dataclasses import AuthAuditEventType
+from ...audit_logs.dataclasses import (
+    AUDIT_STATUS_CODE_MAPPING,
+    AuthAuditEventType,
+)
 from ...users.tests.test_api import create_user
 
 
@@ -170,6 +173,43 @@ def test_validate_sign_in_code_failed(
     assert error["detail"]["errors"] == errors
 
 
+def test_sign_in_code_rate_limits(test_client: TestClient):
+    account = "13800000000"
+    create_user(test_client, mobile=account)
+    test_client.put(
+        "/v1/login_settings",
+        json={
+            "signinCodeSendingLimitEnabled": True,
+            "signinCodeSendingMaxAttempts": 1,
+            "signinCodeValidatingMaxAttempts": 2,
+        },
+    )
+    resp = test_client.post("/v1/sign_in/code", json={"account": account})
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    resp = test_client.post("/v1/sign_in/code", json={"account": account})
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+    assert error["detail"]["errors"] == {
+        "code": "验证码获取次数超限，请稍后再次获取"
+    }
+
+    data = {"account": account, "code": "123123"}
+    resp = test_client.post("/v1/sign_in/verify", json=data)
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+    assert error["detail"]["errors"] == {"code": "验证码错误，请重新输入"}
+    test_client.post("/v1/sign_in/verify", json=data)
+    # rejected by the limiter, the code itself has already expired
+    resp = test_client.post("/v1/sign_in/verify", json=data)
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+    assert error["detail"]["errors"] == {
+        "code": AUDIT_STATUS_CODE_MAPPING[
+            FreeauthAuditStatusCode.CODE_ATTEMPTS_EXCEEDED
+        ]
+    }
+
+
 def test_sign_in_with_code(test_client: TestClient, bo_client: TestClient):
     account: str = "13800000000"
     data: Dict = {
@@ -209,9 +249,18 @@ def test_sign_in_with_code(test_client: TestClient, bo_client: TestClient):
     test_client.post("/v1/sign_in/code", json={"account": account})
     data = {
         "account": account,
-        "code": "888888",
+        "code": "000000",
     }
     resp = test_client.post("/v1/sign_in/verify", json=data)
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+    assert (
+        error["detail"]["errors"]["code"]
+        == AUDIT_STATUS_CODE_MAPPING[FreeauthAuditStatusCode.CODE_INCORRECT]
+    )
+
+    data["code"] = "888888"
+    resp = test_client.post("/v1/sign_in/verify", json=data)
     user = resp.json()
     assert resp.status_code == HTTPStatus.OK, user
     assert user["email"] == account
@@ -223,12 +272,19 @@ def test_sign_in_with_code(test_client: TestClient, bo_client: TestClient):
     payload = jwt.decode(
         token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm]
     )
-    assert payload["sub"] == user["id"]
+    assert payload["sub"] == user["id"] and payload["jti"]
+    resp = test_client.get("/v1/me")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    assert resp.json()["id"] == user["id"]
 
     resp = test_client.post("/v1/audit_logs/query", json={"q": account})
     rv = resp.json()
     assert resp.status_code == HTTPStatus.OK, rv
-    assert len(rv["rows"]) == 1
+    assert len(rv["rows"]) == 2
+    assert (
+        FreeauthAuditStatusCode(rv["rows"][1]["status_code"])
+        == FreeauthAuditStatusCode.CODE_INCORRECT
+    )
     assert rv["rows"][0]["event_type"] == AuthAuditEventType.SIGNIN.value
     assert (
         FreeauthAuditStatusCode(rv["rows"][0]["status_code"])
@@ -304,6 +360,32 @@ def test_sign_in_with_password(test_client: TestClient):
         == "密码连续多次输入错误，账号暂时被锁定"
     )
 
+    # a successful sign-in resets the failure counter
+    resp = test_client.post("/v1/sign_in", json=dict(data, password=password))
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    resp = test_client.post("/v1/sign_in", json=data)
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+    assert error["detail"]["errors"]["password"] == "密码输入错误"
+
+
+def test_sign_in_with_digit_leading_username(test_client: TestClient, mocker):
+    # generated usernames may start with a digit
+    mocker.patch(
+        "freeauth.admin.users.endpoints.gen_random_string",
+        return_value="1user",
+    )
+    password = gen_random_string(12, secret=True)
+    user = create_user(test_client, mobile="13800000000", password=password)
+    assert user.username == "1user"
+
+    resp = test_client.post(
+        "/v1/sign_in", json={"account": "1user", "password": password}
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["id"] == str(user.id)
+
 
 def test_get_user_me(bo_client: TestClient, bo_user):
     resp = bo_client.get("/v1/me")
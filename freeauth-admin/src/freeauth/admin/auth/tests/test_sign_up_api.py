@@ -259,7 +259,10 @@ def test_sign_up(test_client: TestClient):
     payload = jwt.decode(
         token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm]
     )
-    assert payload["sub"] == user["id"]
+    assert payload["sub"] == user["id"] and payload["jti"]
+    resp = test_client.get("/v1/me")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    assert resp.json()["id"] == user["id"]
 
     resp = test_client.post("/v1/audit_logs/query", json={"q": account})
     rv = resp.json()
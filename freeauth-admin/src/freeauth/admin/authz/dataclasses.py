@@ -0,0 +1,98 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import uuid
+
+from pydantic import Field, root_validator
+from pydantic.dataclasses import dataclass
+
+from ..dataclasses import BaseModelConfig
+
+
+@dataclass(config=BaseModelConfig)
+class AuthzCheckItem:
+    perm_code: str = Field(
+        ...,
+        title="权限代码",
+        description="需要校验的权限代码",
+        min_length=1,
+    )
+    user_id: uuid.UUID | None = Field(
+        None,
+        title="用户 ID",
+        description="用户 ID 与访问令牌二选一",
+    )
+    access_token: str | None = Field(
+        None,
+        title="访问令牌",
+        description="用户登录后获得的访问令牌",
+    )
+
+    @root_validator(skip_on_failure=True)
+    def validate_user_or_token(cls, values):
+        if (values.get("user_id") is None) == (
+            values.get("access_token") is None
+        ):
+            raise ValueError("用户 ID 与访问令牌需提供且只能提供一项")
+        return values
+
+
+@dataclass(config=BaseModelConfig)
+class AuthzCheckBody:
+    items: list[AuthzCheckItem] = Field(
+        ...,
+        title="待校验项",
+        description="用户（或访问令牌）与权限代码的组合，单次最多 1000 项",
+        min_items=1,
+        max_items=1000,
+    )
+
+
+@dataclass(config=BaseModelConfig)
+class AuthzCheckResult:
+    user_id: uuid.UUID | None = Field(
+        ...,
+        title="用户 ID",
+        description="访问令牌无效时为空",
+    )
+    perm_code: str = Field(..., title="权限代码")
+    allowed: bool = Field(..., title="是否具有该权限")
+
+
+@dataclass(config=BaseModelConfig)
+class TokenIntrospectBody:
+    tokens: list[str] = Field(
+        ...,
+        title="访问令牌列表",
+        description="单次最多 100 个",
+        min_items=1,
+        max_items=100,
+    )
+
+
+@dataclass(config=BaseModelConfig)
+class TokenIntrospection:
+    active: bool = Field(
+        ...,
+        title="是否有效",
+        description="令牌未过期、未撤销且用户未被禁用时有效",
+    )
+    sub: uuid.UUID | None = Field(default=None, title="用户 ID")
+    exp: int | None = Field(default=None, title="过期时间（UNIX 时间戳）")
+    revoked: bool | None = Field(default=None, title="是否已撤销")
+    permissions: list[str] | None = Field(
+        default=None,
+        title="权限代码列表",
+        description="用户在调用方应用中拥有的全部权限代码",
+    )
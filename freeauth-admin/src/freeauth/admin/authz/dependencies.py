@@ -0,0 +1,87 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import hashlib
+import uuid
+from collections import OrderedDict
+from http import HTTPStatus
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from starlette.concurrency import run_in_threadpool
+
+from freeauth.db.auth.auth_qry_async_edgeql import get_application_secret
+from freeauth.security.utils import verify_password
+
+from ..app import auth_app
+
+
+class VerifiedSecretCache:
+    """Remembers application secrets that passed bcrypt verification.
+
+    Entries are keyed by the stored hash and a digest of the secret, so
+    rotating the secret of an application invalidates them. Failed
+    attempts are never cached and always pay the full bcrypt cost.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, bytes], None] = OrderedDict()
+
+    async def verify(self, secret: str, hashed_secret: str) -> bool:
+        key = (hashed_secret, hashlib.sha256(secret.encode()).digest())
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True
+        if not await run_in_threadpool(verify_password, secret, hashed_secret):
+            return False
+        self._entries[key] = None
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+verified_secret_cache = VerifiedSecretCache()
+
+
+async def get_client_app_id(
+    credentials: HTTPBasicCredentials = Depends(HTTPBasic()),
+) -> uuid.UUID:
+    """Authenticates the calling service with its application ID and
+    secret, passed as HTTP Basic credentials."""
+    try:
+        app_id = uuid.UUID(credentials.username)
+    except ValueError:
+        app_id = None
+    app = (
+        await get_application_secret(auth_app.db, id=app_id)
+        if app_id
+        else None
+    )
+    if (
+        not app
+        or not app.hashed_secret
+        or not await verified_secret_cache.verify(
+            credentials.password, app.hashed_secret
+        )
+    ):
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail="应用身份验证失败",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return app.id
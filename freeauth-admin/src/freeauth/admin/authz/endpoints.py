@@ -0,0 +1,215 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import uuid
+from http import HTTPStatus
+from typing import cast
+from urllib.parse import parse_qs
+
+from fastapi import Depends, HTTPException, Request
+
+from freeauth.db.auth.auth_qry_async_edgeql import (
+    check_permissions,
+    introspect_tokens,
+)
+
+from ..app import auth_app, router
+from .dataclasses import (
+    AuthzCheckBody,
+    AuthzCheckResult,
+    TokenIntrospectBody,
+    TokenIntrospection,
+)
+from .dependencies import get_client_app_id
+
+
+@router.post(
+    "/authz/check",
+    tags=["权限校验"],
+    summary="批量校验用户权限",
+    description=(
+        "供下游服务调用，以应用 ID 和应用密钥作为 HTTP Basic 凭证；"
+        "一次请求校验多组用户（或访问令牌）与权限代码，权限范围为调用方应用"
+    ),
+)
+async def check_user_permissions(
+    body: AuthzCheckBody,
+    app_id: uuid.UUID = Depends(get_client_app_id),
+) -> list[AuthzCheckResult]:
+    token_payloads: dict[str, dict] = {}
+    jti_tokens: dict[uuid.UUID, str] = {}
+    for item in body.items:
+        if item.access_token and item.access_token not in token_payloads:
+            payload = auth_app.verify_access_token(item.access_token)
+            if payload:
+                token_payloads[item.access_token] = payload
+                jti = auth_app.token_jti(payload)
+                if jti:
+                    jti_tokens[jti] = item.access_token
+
+    users = await check_permissions(
+        auth_app.db,
+        app_id=app_id,
+        perm_codes=list({item.perm_code for item in body.items}),
+        jtis=list(jti_tokens),
+        access_tokens=[
+            token
+            for token, payload in token_payloads.items()
+            if not auth_app.token_jti(payload)
+        ],
+        user_ids=list({item.user_id for item in body.items if item.user_id}),
+    )
+    user_perms: dict[uuid.UUID, set[str]] = {}
+    token_user_ids: dict[str, uuid.UUID] = {}
+    for user in users:
+        user_perms[user.id] = set(user.perm_codes)
+        tokens = [jti_tokens[jti] for jti in user.jtis] + user.access_tokens
+        for token in tokens:
+            # the token must still belong to the user it was issued to
+            if auth_app.is_token_subject(token_payloads[token], user.id):
+                token_user_ids[token] = user.id
+
+    results = []
+    for item in body.items:
+        user_id = item.user_id or token_user_ids.get(item.access_token or "")
+        results.append(
+            AuthzCheckResult(
+                user_id=user_id,
+                perm_code=item.perm_code,
+                allowed=user_id is not None
+                and item.perm_code.upper() in user_perms.get(user_id, set()),
+            )
+        )
+    return results
+
+
+async def introspect(
+    access_tokens: list[str], app_id: uuid.UUID
+) -> list[TokenIntrospection]:
+    payloads: dict[str, dict] = {}
+    jti_tokens: dict[uuid.UUID, str] = {}
+    for access_token in access_tokens:
+        if access_token in payloads:
+            continue
+        payload = auth_app.verify_access_token(access_token)
+        if payload:
+            payloads[access_token] = payload
+            jti = auth_app.token_jti(payload)
+            if jti:
+                jti_tokens[jti] = access_token
+
+    rv = await introspect_tokens(
+        auth_app.db,
+        app_id=app_id,
+        jtis=list(jti_tokens),
+        access_tokens=[
+            access_token
+            for access_token, payload in payloads.items()
+            if not auth_app.token_jti(payload)
+        ],
+    )
+    verified: dict[str, uuid.UUID] = {}
+    revoked = set()
+    for token in rv.tokens:
+        # tokens without a jti are the ones stored as is
+        access_token = (
+            jti_tokens[token.jti]
+            if token.jti
+            else cast(str, token.access_token)
+        )
+        if token.is_revoked:
+            revoked.add(access_token)
+        elif auth_app.is_token_subject(payloads[access_token], token.user.id):
+            verified[access_token] = token.user.id
+    users = {user.id: user for user in rv.users}
+
+    results = []
+    for access_token in access_tokens:
+        user_id = verified.get(access_token)
+        user = users.get(user_id) if user_id else None
+        if user and not user.is_deleted:
+            results.append(
+                TokenIntrospection(
+                    active=True,
+                    sub=user.id,
+                    exp=int(payloads[access_token]["exp"]),
+                    revoked=False,
+                    permissions=sorted(user.perm_codes),
+                )
+            )
+        else:
+            results.append(
+                TokenIntrospection(
+                    active=False, revoked=access_token in revoked or None
+                )
+            )
+    return results
+
+
+@router.post(
+    "/authz/introspect",
+    tags=["权限校验"],
+    summary="令牌自省",
+    description=(
+        "遵循 RFC 7662，请求体为表单格式的 token 参数，"
+        "以应用 ID 和应用密钥作为 HTTP Basic 凭证；"
+        "返回令牌状态、所属用户及其在调用方应用中的权限代码"
+    ),
+    response_model_exclude_none=True,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-www-form-urlencoded": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["token"],
+                        "properties": {
+                            "token": {"type": "string"},
+                            "token_type_hint": {"type": "string"},
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def introspect_token(
+    request: Request,
+    app_id: uuid.UUID = Depends(get_client_app_id),
+) -> TokenIntrospection:
+    # parsed by hand, as form support requires python-multipart
+    form = parse_qs((await request.body()).decode())
+    tokens = form.get("token")
+    if not tokens or not tokens[0]:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail={"token": "该字段为必填项"},
+        )
+    (result,) = await introspect(tokens[:1], app_id)
+    return result
+
+
+@router.post(
+    "/authz/introspect/batch",
+    tags=["权限校验"],
+    summary="批量令牌自省",
+    description="同令牌自省，一次请求校验多个令牌，结果与请求顺序一致",
+    response_model_exclude_none=True,
+)
+async def introspect_tokens_in_batch(
+    body: TokenIntrospectBody,
+    app_id: uuid.UUID = Depends(get_client_app_id),
+) -> list[TokenIntrospection]:
+    return await introspect(body.tokens, app_id)
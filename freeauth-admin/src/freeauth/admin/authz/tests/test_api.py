@@ -0,0 +1,163 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import uuid
+from http import HTTPStatus
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from freeauth.db.auth.auth_qry_async_edgeql import SignInResult
+
+from ..dependencies import verified_secret_cache
+
+
+@pytest.fixture
+def application(bo_client: TestClient, faker) -> dict[str, Any]:
+    resp = bo_client.post("/v1/applications", json=dict(name=faker.company()))
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    return resp.json()
+
+
+def test_check_auth(bo_client: TestClient, application: dict[str, Any]):
+    body = dict(items=[dict(user_id=str(uuid.uuid4()), perm_code="read")])
+    resp = bo_client.post("/v1/authz/check", json=body)
+    assert resp.status_code == HTTPStatus.UNAUTHORIZED, resp.json()
+
+    for credentials in [
+        ("not-an-id", application["secret"]),
+        (str(uuid.uuid4()), application["secret"]),
+        (application["id"], "wrong secret"),
+    ]:
+        resp = bo_client.post("/v1/authz/check", json=body, auth=credentials)
+        assert resp.status_code == HTTPStatus.UNAUTHORIZED, resp.json()
+        assert resp.json()["detail"]["message"] == "应用身份验证失败"
+
+    verified_secret_cache.clear()
+    auth = (application["id"], application["secret"])
+    resp = bo_client.post("/v1/authz/check", json=body, auth=auth)
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    assert len(verified_secret_cache._entries) == 1
+
+    resp = bo_client.put(f"/v1/applications/{application['id']}/secret")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    resp = bo_client.post("/v1/authz/check", json=body, auth=auth)
+    assert resp.status_code == HTTPStatus.UNAUTHORIZED, resp.json()
+
+
+def test_check_validate_errors(
+    bo_client: TestClient, application: dict[str, Any]
+):
+    auth = (application["id"], application["secret"])
+    resp = bo_client.post("/v1/authz/check", json=dict(items=[]), auth=auth)
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+    assert error["detail"]["errors"]["items"] == "请至少选择一项"
+
+    resp = bo_client.post(
+        "/v1/authz/check",
+        json=dict(items=[dict(perm_code="read")]),
+        auth=auth,
+    )
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, error
+
+
+def test_check_user_permissions(
+    bo_client: TestClient,
+    bo_user: SignInResult,
+    application: dict[str, Any],
+):
+    auth = (application["id"], application["secret"])
+    resp = bo_client.post(
+        "/v1/authz/check",
+        json=dict(
+            items=[
+                dict(user_id=str(bo_user.id), perm_code="read"),
+                dict(access_token="invalid token", perm_code="read"),
+                dict(
+                    access_token=bo_client.cookies["access_token"],
+                    perm_code="read",
+                ),
+            ]
+        ),
+        auth=auth,
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv == [
+        dict(user_id=str(bo_user.id), perm_code="read", allowed=False),
+        dict(user_id=None, perm_code="read", allowed=False),
+        dict(user_id=str(bo_user.id), perm_code="read", allowed=False),
+    ]
+
+
+def test_introspect_token(
+    bo_client: TestClient,
+    bo_user: SignInResult,
+    application: dict[str, Any],
+):
+    access_token = bo_client.cookies["access_token"]
+    resp = bo_client.post(
+        "/v1/authz/introspect", data=dict(token=access_token)
+    )
+    assert resp.status_code == HTTPStatus.UNAUTHORIZED, resp.json()
+
+    auth = (application["id"], application["secret"])
+    resp = bo_client.post("/v1/authz/introspect", data={}, auth=auth)
+    assert resp.status_code == HTTPStatus.BAD_REQUEST, resp.json()
+
+    resp = bo_client.post(
+        "/v1/authz/introspect", data=dict(token=access_token), auth=auth
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["active"] is True
+    assert rv["sub"] == str(bo_user.id)
+    assert rv["revoked"] is False
+    assert rv["permissions"] == []
+    assert isinstance(rv["exp"], int)
+
+    resp = bo_client.post(
+        "/v1/authz/introspect", data=dict(token="invalid token"), auth=auth
+    )
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    assert resp.json() == dict(active=False)
+
+
+def test_introspect_tokens_in_batch(
+    bo_client: TestClient,
+    bo_user: SignInResult,
+    application: dict[str, Any],
+):
+    auth = (application["id"], application["secret"])
+    access_token = bo_client.cookies["access_token"]
+    body = dict(tokens=[access_token, "invalid token", access_token])
+    resp = bo_client.post("/v1/authz/introspect/batch", json=body, auth=auth)
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert [item["active"] for item in rv] == [True, False, True]
+    assert rv[0] == rv[2]
+
+    resp = bo_client.post("/v1/sign_out")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    resp = bo_client.post("/v1/authz/introspect/batch", json=body, auth=auth)
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv == [
+        dict(active=False, revoked=True),
+        dict(active=False),
+        dict(active=False, revoked=True),
+    ]
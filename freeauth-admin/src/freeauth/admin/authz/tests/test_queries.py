@@ -0,0 +1,304 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import uuid
+
+import edgedb
+import pytest
+
+from freeauth.db.admin.admin_qry_async_edgeql import (
+    CreateApplicationResult,
+    CreateUserResult,
+    create_application,
+    create_org_type,
+    create_permission,
+    create_role,
+    create_user,
+    delete_org_type,
+    delete_role,
+    perm_bind_roles,
+    perm_unbind_roles,
+    role_bind_users,
+    role_unbind_users,
+    update_user_roles,
+)
+from freeauth.db.auth.auth_qry_async_edgeql import check_permissions
+
+
+async def new_user(
+    edgedb_client: edgedb.AsyncIOClient, username: str
+) -> CreateUserResult:
+    return await create_user(
+        edgedb_client,
+        name=username,
+        username=username,
+        email=None,
+        mobile=None,
+        hashed_password="password",
+        reset_pwd_on_first_login=False,
+        organization_ids=None,
+        org_type_id=None,
+    )
+
+
+async def user_perm_codes(
+    edgedb_client: edgedb.AsyncIOClient, user: CreateUserResult
+) -> set[str]:
+    return set(
+        await edgedb_client.query(
+            """
+            select (
+                select freeauth::User filter .id = <uuid>$id
+            ).permissions.code
+            """,
+            id=user.id,
+        )
+    )
+
+
+@pytest.fixture
+async def application(
+    edgedb_client: edgedb.AsyncIOClient,
+) -> CreateApplicationResult:
+    return await create_application(
+        edgedb_client,
+        name="下游服务",
+        description=None,
+        hashed_secret="secret",
+    )
+
+
+@pytest.mark.asyncio
+async def test_check_permissions(
+    edgedb_client: edgedb.AsyncIOClient,
+    application: CreateApplicationResult,
+):
+    other_app = await create_application(
+        edgedb_client, name="其他服务", description=None, hashed_secret=""
+    )
+    perms = [
+        await create_permission(
+            edgedb_client,
+            name=code,
+            code=code,
+            description=None,
+            application_id=app.id,
+            tags=None,
+        )
+        for code, app in [
+            ("read", application),
+            ("write", application),
+            ("*", other_app),
+        ]
+    ]
+    reader = await create_role(
+        edgedb_client,
+        name="reader",
+        code="READER",
+        description=None,
+        org_type_id=None,
+    )
+    await perm_bind_roles(
+        edgedb_client,
+        role_ids=[reader.id],
+        permission_ids=[perms[0].id, perms[2].id],
+    )
+    user = await new_user(edgedb_client, "user")
+    admin = await new_user(edgedb_client, "admin")
+    await role_bind_users(
+        edgedb_client, user_ids=[user.id], role_ids=[reader.id]
+    )
+    jti = uuid.uuid4()
+    await edgedb_client.query(
+        """
+        with user := (select freeauth::User filter .id = <uuid>$user_id)
+        for token in {
+            (insert freeauth::Token {
+                user := user,
+                access_token := <str>$access_token,
+            }),
+            (insert freeauth::Token { user := user, jti := <uuid>$jti }),
+        } union token;
+        """,
+        user_id=user.id,
+        access_token="token",
+        jti=jti,
+    )
+
+    rv = await check_permissions(
+        edgedb_client,
+        app_id=application.id,
+        perm_codes=["READ", "write", "*"],
+        jtis=[jti, uuid.uuid4()],
+        access_tokens=["token", "unknown"],
+        user_ids=[admin.id],
+    )
+    results = {r.id: r for r in rv}
+    assert results.keys() == {user.id, admin.id}
+    assert results[user.id].jtis == [jti]
+    assert results[user.id].access_tokens == ["token"]
+    # the wildcard permission belongs to another application
+    assert results[user.id].perm_codes == ["READ"]
+    assert results[admin.id].perm_codes == []
+
+    wildcard = await create_permission(
+        edgedb_client,
+        name="*",
+        code="*",
+        description=None,
+        application_id=application.id,
+        tags=None,
+    )
+    await perm_bind_roles(
+        edgedb_client, role_ids=[reader.id], permission_ids=[wildcard.id]
+    )
+    rv = await check_permissions(
+        edgedb_client,
+        app_id=application.id,
+        perm_codes=["READ", "write"],
+        jtis=[],
+        access_tokens=[],
+        user_ids=[user.id],
+    )
+    assert sorted(rv[0].perm_codes) == ["READ", "WRITE"]
+
+
+@pytest.mark.asyncio
+async def test_user_permissions_maintained(
+    edgedb_client: edgedb.AsyncIOClient,
+    application: CreateApplicationResult,
+):
+    read, write = [
+        await create_permission(
+            edgedb_client,
+            name=code,
+            code=code,
+            description=None,
+            application_id=application.id,
+            tags=None,
+        )
+        for code in ["read", "write"]
+    ]
+    reader, writer = [
+        await create_role(
+            edgedb_client,
+            name=code,
+            code=code,
+            description=None,
+            org_type_id=None,
+        )
+        for code in ["READER", "WRITER"]
+    ]
+    await perm_bind_roles(
+        edgedb_client,
+        role_ids=[reader.id, writer.id],
+        permission_ids=[read.id],
+    )
+    user = await new_user(edgedb_client, "user")
+    await role_bind_users(
+        edgedb_client, user_ids=[user.id], role_ids=[reader.id, writer.id]
+    )
+    assert await user_perm_codes(edgedb_client, user) == {"read"}
+
+    await perm_bind_roles(
+        edgedb_client, role_ids=[writer.id], permission_ids=[write.id]
+    )
+    assert await user_perm_codes(edgedb_client, user) == {"read", "write"}
+
+    # still granted through the writer role
+    await perm_unbind_roles(
+        edgedb_client, role_ids=[reader.id], permission_ids=[read.id]
+    )
+    assert await user_perm_codes(edgedb_client, user) == {"read", "write"}
+
+    await role_unbind_users(
+        edgedb_client, user_ids=[user.id], role_ids=[writer.id]
+    )
+    assert await user_perm_codes(edgedb_client, user) == set()
+
+    await update_user_roles(
+        edgedb_client, id=user.id, role_ids=[reader.id, writer.id]
+    )
+    assert await user_perm_codes(edgedb_client, user) == {"read", "write"}
+
+    await delete_role(edgedb_client, ids=[writer.id])
+    assert await user_perm_codes(edgedb_client, user) == set()
+
+
+@pytest.mark.asyncio
+async def test_delete_org_type_revokes_permissions(
+    edgedb_client: edgedb.AsyncIOClient,
+    application: CreateApplicationResult,
+):
+    read, write = [
+        await create_permission(
+            edgedb_client,
+            name=code,
+            code=code,
+            description=None,
+            application_id=application.id,
+            tags=None,
+        )
+        for code in ["read", "write"]
+    ]
+    org_type = await create_org_type(
+        edgedb_client, name="外部组织", code="EXTERNAL", description=None
+    )
+    reader = await create_role(
+        edgedb_client,
+        name="reader",
+        code="READER",
+        description=None,
+        org_type_id=None,
+    )
+    writer = await create_role(
+        edgedb_client,
+        name="writer",
+        code="WRITER",
+        description=None,
+        org_type_id=org_type.id,
+    )
+    await perm_bind_roles(
+        edgedb_client, role_ids=[reader.id], permission_ids=[read.id]
+    )
+    await perm_bind_roles(
+        edgedb_client, role_ids=[writer.id], permission_ids=[write.id]
+    )
+    user = await create_user(
+        edgedb_client,
+        name="user",
+        username="user",
+        email=None,
+        mobile=None,
+        hashed_password="password",
+        reset_pwd_on_first_login=False,
+        organization_ids=None,
+        org_type_id=org_type.id,
+    )
+    await role_bind_users(
+        edgedb_client, user_ids=[user.id], role_ids=[reader.id, writer.id]
+    )
+    assert await user_perm_codes(edgedb_client, user) == {"read", "write"}
+
+    await delete_org_type(edgedb_client, ids=[org_type.id])
+    assert await user_perm_codes(edgedb_client, user) == {"read"}
+    rv = await check_permissions(
+        edgedb_client,
+        app_id=application.id,
+        perm_codes=["read", "write"],
+        jtis=[],
+        access_tokens=[],
+        user_ids=[user.id],
+    )
+    assert rv[0].perm_codes == ["READ"]
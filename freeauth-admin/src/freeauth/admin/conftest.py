@@ -26,7 +26,7 @@ from freeauth.db.auth.auth_qry_async_edgeql import (
     FreeauthCodeType,
     SignInResult,
 )
-from freeauth.ext.fastapi_ext import FreeAuthTestApp
+from freeauth.ext.fastapi_ext import FreeAuthTestApp, RateLimiter
 
 
 @pytest.fixture(scope="session")
@@ -109,7 +109,11 @@ def app(mocker) -> FastAPI:
     mocker.patch("freeauth.ext.fastapi_ext.FreeAuthApp", FreeAuthTestApp)
 
     from . import app as freeauth_app
+    from .organizations.cache import organization_tree_cache
 
+    organization_tree_cache.clear()
+    freeauth_app.auth_app.invalidate_login_settings()
+    freeauth_app.auth_app.rate_limiter = RateLimiter()
     return freeauth_app.get_app()
 
 
@@ -0,0 +1,54 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict
+from typing import Hashable
+
+
+class OrganizationTreeCache:
+    """Serialized organization trees with their ETags.
+
+    Keys include the `tree_version` of the organization type, which every
+    write to its organizations or members bumps, so an entry is only looked
+    up while the tree it holds is current, whichever process changed it.
+
+    :param maxsize: Maximum number of trees kept
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    @staticmethod
+    def etag(key: Hashable) -> str:
+        return f'"{hashlib.sha1(repr(key).encode()).hexdigest()}"'
+
+    def get(self, key: Hashable) -> bytes | None:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def set(self, key: Hashable, content: bytes) -> None:
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+organization_tree_cache = OrganizationTreeCache()
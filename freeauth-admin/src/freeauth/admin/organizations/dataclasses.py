@@ -11,12 +11,13 @@
 
 from __future__ import annotations
 
+import dataclasses
 import uuid
 
 from pydantic import Field, validator
 from pydantic.dataclasses import dataclass
 
-from freeauth.db.admin.admin_qry_async_edgeql import GetOrganizationNodeResult
+from freeauth.db.admin.admin_qry_async_edgeql import GetOrganizationTreeResult
 
 from ..dataclasses import FilterItem  # noqa
 from ..dataclasses import BaseModelConfig, QueryBody
@@ -199,6 +200,13 @@ class DepartmentPostOrPutBody:
         return v.upper() if v else v
 
 
+@dataclass(config=BaseModelConfig)
+class DepartmentMoveBody:
+    parent_id: uuid.UUID = Field(
+        ..., title="新的上级部门", description="部门 ID 或企业机构 ID"
+    )
+
+
 @dataclass(config=BaseModelConfig)
 class OrganizationDeleteBody:
     ids: list[uuid.UUID] = Field(
@@ -208,8 +216,10 @@ class OrganizationDeleteBody:
     )
 
 
-@dataclass
-class OrganizationNode(GetOrganizationNodeResult):
+@dataclasses.dataclass(frozen=True)
+class OrganizationNode(GetOrganizationTreeResult):
+    __slots__ = ("children",)
+
     children: list[OrganizationNode]
 
 
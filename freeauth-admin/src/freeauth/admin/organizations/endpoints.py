@@ -16,7 +16,9 @@ from dataclasses import asdict
 from http import HTTPStatus
 
 import edgedb
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 
 from freeauth.db.admin.admin_qry_async_edgeql import (
     CreateDepartmentResult,
@@ -25,7 +27,7 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
     CreateUserResult,
     DeleteOrganizationResult,
     DeleteOrgTypeResult,
-    GetOrganizationNodeResult,
+    MoveDepartmentResult,
     UpdateOrgTypeStatusResult,
     create_department,
     create_enterprise,
@@ -35,7 +37,9 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
     get_department_by_id_or_code,
     get_enterprise_by_id_or_code,
     get_org_type_by_id_or_code,
-    get_organization_node,
+    get_org_type_tree_version,
+    get_organization_tree,
+    move_department,
     organization_bind_users,
     organization_unbind_users,
     query_org_types,
@@ -45,9 +49,13 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
     update_org_type_status,
 )
 
+from .. import logger
 from ..app import auth_app, router
 from ..dataclasses import PaginatedData
+from ..responses import paginated_response
+from .cache import organization_tree_cache
 from .dataclasses import (
+    DepartmentMoveBody,
     DepartmentPostOrPutBody,
     EnterprisePostBody,
     EnterprisePutBody,
@@ -336,11 +344,12 @@ async def get_enterprise(
     tags=["组织管理"],
     summary="获取企业机构列表",
     description="分页获取，支持关键字搜索、排序，支持过滤指定组织类型下的企业机构",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:orgs"))],
 )
 async def get_enterprises_in_org_type(
     body: EnterpriseQueryBody,
-) -> PaginatedData:
+) -> Response:
     result = await auth_app.db.query_single_json(
         f"""\
             WITH
@@ -396,7 +405,7 @@ async def get_enterprises_in_org_type(
         per_page=body.per_page,
         org_type_id=body.org_type_id,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.post(
@@ -467,6 +476,55 @@ async def put_department(
     return department
 
 
+@router.put(
+    "/departments/{id_or_code}/parent",
+    tags=["组织管理"],
+    summary="移动部门分支",
+    description=(
+        "通过部门 ID 或 Code，将部门及其全部下级部门移动到同一组织类型下的"
+        "其他上级部门或企业机构中"
+    ),
+    dependencies=[Depends(auth_app.perm_accepted("manage:orgs"))],
+)
+async def move_department_to_parent(
+    body: DepartmentMoveBody,
+    params: tuple[str | uuid.UUID, uuid.UUID | None] = Depends(
+        parse_department_id_or_code
+    ),
+) -> MoveDepartmentResult:
+    id_or_code, enterprise_id = params
+    try:
+        department: MoveDepartmentResult | None = await move_department(
+            auth_app.db,
+            id=id_or_code if isinstance(id_or_code, uuid.UUID) else None,
+            current_code=id_or_code if isinstance(id_or_code, str) else None,
+            enterprise_id=enterprise_id,
+            parent_id=body.parent_id,
+        )
+    except edgedb.errors.QueryAssertionError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail={"parent_id": "不能将部门移动到其自身或下级部门中"},
+        )
+    except edgedb.errors.ConstraintViolationError:
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail="目标企业机构中已存在相同 Code 的部门",
+        )
+    if not department:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail="部门或上级部门不存在",
+        )
+    logger.info(
+        "Moved department %s with %d descendants to %s",
+        department.id,
+        department.descendant_count,
+        body.parent_id,
+    )
+    return department
+
+
 @router.get(
     "/departments/{id_or_code}",
     tags=["组织管理"],
@@ -500,6 +558,7 @@ async def get_department(
     tags=["组织管理"],
     summary="获取组织树",
     description="通过组织类型 ID 或 Code，获取组织树信息",
+    response_model=list[OrganizationNode],
     dependencies=[
         Depends(
             auth_app.perm_accepted(
@@ -509,28 +568,75 @@ async def get_department(
     ],
 )
 async def get_organization_tree_by_org_type(
+    request: Request,
     id_or_code: uuid.UUID | str = Depends(parse_org_type_id_or_code),
-) -> list[OrganizationNode]:
-    async def get_child_nodes(
-        parent_id: uuid.UUID | None = None,
-    ) -> list[OrganizationNode]:
-        children: list[OrganizationNode] = []
-        nodes: list[GetOrganizationNodeResult] = await get_organization_node(
+    parent_id: uuid.UUID
+    | None = Query(
+        None,
+        title="上级组织 ID",
+        description="指定后仅返回该组织下的子树，用于逐级展开组织树",
+    ),
+    depth: int
+    | None = Query(
+        None,
+        title="加载层级数",
+        description=(
+            "限制返回的组织层级数，未加载子级的节点 has_children 仍为 true，"
+            "默认返回全部层级"
+        ),
+        ge=1,
+    ),
+    with_counts: bool = Query(
+        False,
+        title="是否统计数量",
+        description="为 true 时返回各节点的直属成员数、全部成员数及下级组织数",
+    ),
+) -> Response:
+    org_type = await get_org_type_tree_version(
+        auth_app.db,
+        org_type_id=id_or_code if isinstance(id_or_code, uuid.UUID) else None,
+        org_type_code=id_or_code if isinstance(id_or_code, str) else None,
+    )
+    if not org_type:
+        return JSONResponse([])
+
+    cache_key = (
+        org_type.id,
+        org_type.tree_version,
+        parent_id,
+        depth,
+        with_counts,
+    )
+    etag = organization_tree_cache.etag(cache_key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+
+    content = organization_tree_cache.get(cache_key)
+    if content is None:
+        tree: list[OrganizationNode] = []
+        nodes: dict[uuid.UUID, OrganizationNode] = {}
+        for org in await get_organization_tree(
             auth_app.db,
-            org_type_id=(
-                id_or_code if isinstance(id_or_code, uuid.UUID) else None
-            ),
-            org_type_code=id_or_code if isinstance(id_or_code, str) else None,
+            org_type_id=org_type.id,
+            org_type_code=None,
             parent_id=parent_id,
-        )
-        for child in nodes:
-            node = OrganizationNode(children=[], **asdict(child))
-            if node.has_children:
-                node.children = await get_child_nodes(node.id)
-            children.append(node)
-        return children
-
-    return await get_child_nodes()
+            depth=depth,
+            with_counts=with_counts,
+        ):
+            # parents are always returned before their children
+            node = OrganizationNode(children=[], **asdict(org))
+            nodes[node.id] = node
+            parent = nodes.get(node.parent_id) if node.parent_id else None
+            if parent:
+                parent.children.append(node)
+            else:
+                tree.append(node)
+        content = JSONResponse(jsonable_encoder(tree)).body
+        organization_tree_cache.set(cache_key, content)
+    return Response(
+        content=content, media_type="application/json", headers=headers
+    )
 
 
 @router.post(
@@ -543,12 +649,13 @@ async def get_organization_tree_by_org_type(
 async def bind_users_to_organizations(
     body: OrganizationUserBody,
 ) -> list[CreateUserResult]:
-    return await organization_bind_users(
+    users: list[CreateUserResult] = await organization_bind_users(
         auth_app.db,
         user_ids=body.user_ids,
         organization_ids=body.organization_ids,
         org_type_id=body.org_type_id,
     )
+    return users
 
 
 @router.post(
@@ -561,11 +668,12 @@ async def bind_users_to_organizations(
 async def unbind_users_to_organizations(
     body: OrganizationUnbindUserBody,
 ) -> list[CreateUserResult]:
-    return await organization_unbind_users(
+    users: list[CreateUserResult] = await organization_unbind_users(
         auth_app.db,
         user_ids=body.user_ids,
         organization_ids=body.organization_ids,
     )
+    return users
 
 
 @router.post(
@@ -573,6 +681,7 @@ async def unbind_users_to_organizations(
     tags=["组织管理"],
     summary="获取组织成员列表",
     description="获取指定部门分支或企业机构下包含的成员，分页获取，支持关键字搜索、排序",
+    response_model=PaginatedData,
     dependencies=[
         Depends(auth_app.perm_accepted("manage:orgs", "manage:roles"))
     ],
@@ -580,13 +689,14 @@ async def unbind_users_to_organizations(
 async def get_members_in_organization(
     body: OrganizationUserQueryBody,
     org_id: uuid.UUID,
-) -> PaginatedData:
+) -> Response:
     result = await auth_app.db.query_single_json(
         f"""\
             WITH
                 page := <optional int64>$page ?? 1,
                 per_page := <optional int64>$per_page ?? 20,
                 q := <optional str>$q,
+                matched_users := search_users(q),
                 include_sub_members := <bool>$include_sub_members,
                 organization := (
                     SELECT Organization FILTER .id = <uuid>$org_id
@@ -598,10 +708,7 @@ async def get_members_in_organization(
                         organization.directly_users
                     ) FILTER (
                         true IF not EXISTS q ELSE
-                        .name ?? '' ILIKE q OR
-                        .username ?? '' ILIKE q OR
-                        .mobile ?? '' ILIKE q OR
-                        .email ?? '' ILIKE q
+                        .id IN matched_users.id
                     )
                 ),
                 total := count(users)
@@ -636,10 +743,10 @@ async def get_members_in_organization(
                 ))
             );\
             """,
-        q=f"%{body.q}%" if body.q else None,
+        q=body.q or None,
         page=body.page,
         per_page=body.per_page,
         include_sub_members=body.include_sub_members,
         org_id=org_id,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
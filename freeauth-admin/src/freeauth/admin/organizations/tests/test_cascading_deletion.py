@@ -30,6 +30,7 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
     get_department_by_id_or_code,
     get_enterprise_by_id_or_code,
     get_org_type_by_id_or_code,
+    get_organization_tree,
     get_role_by_id_or_code,
     get_user_by_id,
     update_user_roles,
@@ -222,3 +223,58 @@ async def test_delete_department(
             edgedb_client, id=dept.id, code=None, enterprise_id=None
         )
         assert not deleted_dept
+
+
+@pytest.mark.asyncio
+async def test_delete_department_updates_membership(
+    edgedb_client: edgedb.AsyncIOClient, org_type, enterprise, faker
+):
+    dept_1 = await create_department_branch(edgedb_client, enterprise, faker)
+    dept_1_1 = await create_department_branch(edgedb_client, dept_1, faker)
+    dept_2 = await create_department_branch(edgedb_client, enterprise, faker)
+    user = await create_user(
+        edgedb_client,
+        name=faker.name(),
+        username=faker.user_name(),
+        mobile=None,
+        email=None,
+        hashed_password="password",
+        organization_ids=[dept_1_1.id, dept_2.id],
+        org_type_id=org_type.id,
+        reset_pwd_on_first_login=False,
+    )
+    other = await create_user(
+        edgedb_client,
+        name=faker.name(),
+        username=faker.user_name(),
+        mobile=None,
+        email=None,
+        hashed_password="password",
+        organization_ids=[dept_1_1.id],
+        org_type_id=org_type.id,
+        reset_pwd_on_first_login=False,
+    )
+
+    async def member_count(org_id):
+        nodes = await get_organization_tree(
+            edgedb_client,
+            org_type_id=org_type.id,
+            org_type_code=None,
+            parent_id=None,
+            depth=None,
+            with_counts=True,
+        )
+        return next(n.member_count for n in nodes if n.id == org_id)
+
+    assert await member_count(enterprise.id) == 2
+
+    await delete_organization(edgedb_client, ids=[dept_1.id])
+
+    assert await member_count(enterprise.id) == 1
+    assert await member_count(dept_2.id) == 1
+    updated_user = await get_user_by_id(edgedb_client, id=user.id)
+    assert updated_user
+    assert [d.id for d in updated_user.departments] == [dept_2.id]
+    updated_other = await get_user_by_id(edgedb_client, id=other.id)
+    assert updated_other
+    assert not updated_other.departments
@@ -23,6 +23,7 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
     CreateEnterpriseResult,
     CreateOrgTypeResult,
     CreateUserResult,
+    get_organization_tree,
 )
 
 from .test_enterprise_api import create_enterprise
@@ -301,6 +302,83 @@ def test_get_department(
     assert CreateDepartmentResult(**rv) == department
 
 
+def test_move_department(
+    bo_client: TestClient,
+    org_type: CreateOrgTypeResult,
+    enterprise: CreateEnterpriseResult,
+    department: CreateDepartmentResult,
+    faker,
+):
+    child = create_department(bo_client, department, faker)
+    grandchild = create_department(bo_client, child, faker)
+    new_enterprise = create_enterprise(bo_client, org_type, faker)
+    other_enterprise = create_enterprise(
+        bo_client, create_org_type(bo_client, faker), faker
+    )
+    user = create_user(
+        bo_client,
+        faker,
+        organization_ids=[str(grandchild.id)],
+        org_type_id=str(org_type.id),
+    )
+
+    for parent in [department, grandchild]:
+        resp = bo_client.put(
+            f"/v1/departments/{department.id}/parent",
+            json={"parent_id": str(parent.id)},
+        )
+        error = resp.json()
+        assert resp.status_code == HTTPStatus.BAD_REQUEST, error
+        assert (
+            error["detail"]["errors"]["parent_id"]
+            == "不能将部门移动到其自身或下级部门中"
+        )
+
+    resp = bo_client.put(
+        f"/v1/departments/{department.id}/parent",
+        json={"parent_id": str(other_enterprise.id)},
+    )
+    error = resp.json()
+    assert resp.status_code == HTTPStatus.NOT_FOUND, error
+    assert (
+        error["detail"]["message"] == "移动部门分支失败：部门或上级部门不存在"
+    )
+
+    resp = bo_client.put(
+        f"/v1/departments/{department.code}/parent",
+        params={"enterprise_id": str(enterprise.id)},
+        json={"parent_id": str(new_enterprise.id)},
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["id"] == str(department.id)
+    assert rv["parent"]["code"] == new_enterprise.code
+    assert rv["enterprise"]["code"] == new_enterprise.code
+    assert rv["descendant_count"] == 2
+
+    resp = bo_client.get(f"/v1/departments/{grandchild.id}")
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["enterprise"]["code"] == new_enterprise.code
+
+    resp = bo_client.get(
+        f"/v1/org_types/{org_type.id}/organization_tree",
+        params={"parent_id": str(new_enterprise.id)},
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert [node["id"] for node in rv] == [str(department.id)]
+    assert rv[0]["children"][0]["id"] == str(child.id)
+    assert rv[0]["children"][0]["children"][0]["id"] == str(grandchild.id)
+
+    for org, total in [(enterprise, 0), (new_enterprise, 1), (child, 1)]:
+        resp = bo_client.post(f"/v1/organizations/{org.id}/members", json={})
+        rv = resp.json()
+        assert resp.status_code == HTTPStatus.OK, rv
+        assert rv["total"] == total
+        assert [u["id"] for u in rv["rows"]] == [str(user.id)] * total
+
+
 def test_get_organization_tree_by_org_type(
     bo_client: TestClient, org_type: CreateOrgTypeResult, faker
 ):
@@ -335,6 +413,124 @@ def test_get_organization_tree_by_org_type(
     for dept_ in rv[1]["children"]:
         assert len(dept_["children"]) == 0
 
+    resp = bo_client.get(
+        f"/v1/org_types/{org_type.id}/organization_tree",
+        params={"depth": 2},
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert len(rv) == 2
+    assert len(rv[0]["children"]) == 2
+    for dept_ in rv[0]["children"]:
+        assert dept_["has_children"]
+        assert dept_["children"] == []
+
+    resp = bo_client.get(
+        f"/v1/org_types/{org_type.id}/organization_tree",
+        params={"parent_id": str(dept_in_e1[0].id)},
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert len(rv) == 3
+    assert all(dept_["parent_id"] == str(dept_in_e1[0].id) for dept_ in rv)
+
+    resp = bo_client.get(
+        f"/v1/org_types/{org_type.id}/organization_tree",
+        params={"depth": 0},
+    )
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+def test_organization_tree_etag(
+    bo_client: TestClient, org_type: CreateOrgTypeResult, faker, mocker
+):
+    enterprise = create_enterprise(bo_client, org_type, faker)
+    url = f"/v1/org_types/{org_type.id}/organization_tree"
+
+    resp = bo_client.get(url)
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    etag = resp.headers["etag"]
+    assert len(resp.json()) == 1
+
+    # unchanged trees are served without querying them again
+    tree_query = mocker.patch(
+        "freeauth.admin.organizations.endpoints.get_organization_tree",
+        wraps=get_organization_tree,
+    )
+    resp = bo_client.get(url, headers={"If-None-Match": etag})
+    assert resp.status_code == HTTPStatus.NOT_MODIFIED
+    assert resp.headers["etag"] == etag
+    assert not resp.content
+
+    resp = bo_client.get(url)
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    assert resp.headers["etag"] == etag
+    assert len(resp.json()) == 1
+    assert not tree_query.called
+
+    create_department(bo_client, enterprise, faker)
+    resp = bo_client.get(url, headers={"If-None-Match": etag})
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert resp.headers["etag"] != etag
+    assert len(rv[0]["children"]) == 1
+    assert tree_query.call_count == 1
+
+
+def test_organization_tree_counts(
+    bo_client: TestClient, org_type: CreateOrgTypeResult, faker
+):
+    enterprise = create_enterprise(bo_client, org_type, faker)
+    dept = create_department(bo_client, enterprise, faker)
+    sub_dept = create_department(bo_client, dept, faker)
+    url = f"/v1/org_types/{org_type.id}/organization_tree"
+
+    resp = bo_client.get(url)
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv[0]["member_count"] is None
+    etag = resp.headers["etag"]
+
+    user = create_user(
+        bo_client,
+        faker,
+        organization_ids=[str(sub_dept.id)],
+        org_type_id=str(org_type.id),
+    )
+    resp = bo_client.get(url, params={"with_counts": True})
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert resp.headers["etag"] != etag
+    etag = resp.headers["etag"]
+    node = rv[0]
+    for direct_member_count, member_count, descendant_count in [
+        (0, 1, 2),
+        (0, 1, 1),
+        (1, 1, 0),
+    ]:
+        assert node["direct_member_count"] == direct_member_count
+        assert node["member_count"] == member_count
+        assert node["descendant_count"] == descendant_count
+        node = (node["children"] or [None])[0]
+
+    resp = bo_client.post(
+        "/v1/organizations/unbind_users",
+        json={
+            "user_ids": [str(user.id)],
+            "organization_ids": [str(sub_dept.id)],
+        },
+    )
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    resp = bo_client.get(
+        url,
+        params={"with_counts": True},
+        headers={"If-None-Match": etag},
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert resp.headers["etag"] != etag
+    assert rv[0]["member_count"] == 0
+
 
 def create_user(
     bo_client: TestClient,
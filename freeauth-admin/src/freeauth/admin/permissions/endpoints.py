@@ -15,7 +15,8 @@ import uuid
 from http import HTTPStatus
 
 import edgedb
-from fastapi import Depends, HTTPException, Query
+from fastapi import Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
 from freeauth.conf.settings import get_settings
 from freeauth.db.admin.admin_qry_async_edgeql import (
@@ -45,6 +46,11 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
 
 from ..app import auth_app, router
 from ..dataclasses import PaginatedData, QueryBody
+from ..responses import (
+    export_response,
+    paginated_response,
+    parse_export_format,
+)
 from .dataclasses import (
     BasePermissionBody,
     PermissionDeleteBody,
@@ -118,6 +124,19 @@ async def delete_permissions(
     return await delete_permission(auth_app.db, ids=body.ids)
 
 
+@router.get(
+    "/permissions/export",
+    tags=["权限管理"],
+    summary="导出权限",
+    description="以 NDJSON 或 CSV 格式流式导出全部权限，包括权限标签",
+    dependencies=[Depends(auth_app.perm_accepted("manage:perms"))],
+)
+async def export_permissions(
+    fmt: str = Depends(parse_export_format),
+) -> StreamingResponse:
+    return export_response("permissions", fmt)
+
+
 @router.get(
     "/permissions/{id_or_code}",
     tags=["权限管理"],
@@ -181,11 +200,12 @@ async def put_permission(
     tags=["权限管理"],
     summary="获取权限列表",
     description="分页获取，支持关键字搜索、排序及条件过滤",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:perms"))],
 )
 async def get_permissions(
     body: QueryBody,
-) -> PaginatedData:
+) -> Response:
     filtering_expr = body.get_filtering_expr(FILTER_TYPE_MAPPING)
     settings = get_settings()
     result = await auth_app.db.query_single_json(
@@ -237,7 +257,7 @@ async def get_permissions(
         per_page=body.per_page,
         application_id=settings.freeauth_app_id,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.post(
@@ -279,12 +299,13 @@ async def unbind_roles_to_perm(
     tags=["权限管理"],
     summary="获取权限绑定角色列表",
     description="获取指定权限下绑定的角色，分页获取，支持关键字搜索、排序",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:perms"))],
 )
 async def get_roles_in_permission(
     body: QueryBody,
     permission_id: uuid.UUID,
-) -> PaginatedData:
+) -> Response:
     result = await auth_app.db.query_single_json(
         f"""\
             WITH
@@ -335,7 +356,7 @@ async def get_roles_in_permission(
         per_page=body.per_page,
         permission_id=permission_id,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.post(
@@ -343,33 +364,29 @@ async def get_roles_in_permission(
     tags=["权限管理"],
     summary="获取权限关联的用户列表",
     description="获取拥有指定权限的用户，分页获取，支持关键字搜索、排序",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:perms"))],
 )
 async def get_users_in_permission(
     body: QueryBody,
     permission_id: uuid.UUID,
-) -> PaginatedData:
+) -> Response:
     result = await auth_app.db.query_single_json(
         f"""\
             WITH
                 page := <optional int64>$page ?? 1,
                 per_page := <optional int64>$per_page ?? 20,
                 q := <optional str>$q,
+                matched_users := search_users(q),
                 permission := (
                     SELECT Permission FILTER .id = <uuid>$permission_id
                 ),
-                roles := (
-                    SELECT permission.roles
-                ),
                 users := (
                     SELECT (
-                        roles.users
+                        permission.users
                     ) FILTER (
                         true IF not EXISTS q ELSE
-                        .name ?? '' ILIKE q OR
-                        .username ?? '' ILIKE q OR
-                        .mobile ?? '' ILIKE q OR
-                        .email ?? '' ILIKE q
+                        .id IN matched_users.id
                     )
                 ),
                 total := count(users)
@@ -400,12 +417,12 @@ async def get_users_in_permission(
                 ))
             );\
             """,
-        q=f"%{body.q}%" if body.q else None,
+        q=body.q or None,
         page=body.page,
         per_page=body.per_page,
         permission_id=permission_id,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.get(
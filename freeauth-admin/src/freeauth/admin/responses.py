@@ -0,0 +1,72 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import json
+
+from fastapi import Query
+from fastapi.responses import Response, StreamingResponse
+
+from freeauth.conf.settings import get_settings
+from freeauth.db.exporting import EXPORT_MEDIA_TYPES, export_async
+
+from .app import auth_app
+from .dataclasses import PaginatedData
+
+
+def parse_export_format(
+    fmt: str = Query(
+        "ndjson",
+        alias="format",
+        title="导出格式",
+        description="支持 ndjson 或 csv",
+        regex="^(ndjson|csv)$",
+    )
+) -> str:
+    return fmt
+
+
+def export_response(kind: str, fmt: str) -> StreamingResponse:
+    return StreamingResponse(
+        export_async(auth_app.db, kind, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{kind}.{fmt}"'
+        },
+    )
+
+
+class RawJSONResponse(Response):
+    """A response whose content is JSON serialized already, e.g. by
+    EdgeDB's ``query_single_json``, and is sent as is."""
+
+    media_type = "application/json"
+
+
+def paginated_response(result: str) -> RawJSONResponse:
+    """Pass a paginated listing returned by EdgeDB as JSON through to the
+    client, skipping the parse and re-encoding of every row.
+
+    Validating it against ``PaginatedData`` means parsing the whole result,
+    rows included, so it is only done with the ``validate_json_responses``
+    setting on, which defaults to on when testing only. Endpoints returning
+    it should declare ``response_model=PaginatedData`` to keep their
+    OpenAPI schema.
+    """
+    settings = get_settings()
+    validate = settings.validate_json_responses
+    if validate is None:
+        validate = settings.testing
+    if validate:
+        PaginatedData.validate(json.loads(result))
+    return RawJSONResponse(result)
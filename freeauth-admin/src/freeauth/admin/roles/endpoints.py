@@ -15,7 +15,8 @@ import uuid
 from http import HTTPStatus
 
 import edgedb
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 
 from freeauth.db.admin.admin_qry_async_edgeql import (
     CreateRoleResult,
@@ -33,6 +34,11 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
 
 from ..app import auth_app, router
 from ..dataclasses import PaginatedData, QueryBody
+from ..responses import (
+    export_response,
+    paginated_response,
+    parse_export_format,
+)
 from .dataclasses import (
     RoleDeleteBody,
     RolePostBody,
@@ -101,6 +107,19 @@ async def delete_roles(
     return await delete_role(auth_app.db, ids=body.ids)
 
 
+@router.get(
+    "/roles/export",
+    tags=["角色管理"],
+    summary="导出角色",
+    description="以 NDJSON 或 CSV 格式流式导出全部角色，包括关联的权限",
+    dependencies=[Depends(auth_app.perm_accepted("manage:roles"))],
+)
+async def export_roles(
+    fmt: str = Depends(parse_export_format),
+) -> StreamingResponse:
+    return export_response("roles", fmt)
+
+
 @router.get(
     "/roles/{id_or_code}",
     tags=["角色管理"],
@@ -161,6 +180,7 @@ async def put_role(
     tags=["角色管理"],
     summary="获取角色列表",
     description="分页获取，支持关键字搜索、排序及条件过滤",
+    response_model=PaginatedData,
     dependencies=[
         Depends(
             auth_app.perm_accepted(
@@ -171,7 +191,7 @@ async def put_role(
 )
 async def get_roles(
     body: RoleQueryBody,
-) -> PaginatedData:
+) -> Response:
     filtering_expr = body.get_filtering_expr(FILTER_TYPE_MAPPING)
     result = await auth_app.db.query_single_json(
         f"""\
@@ -240,7 +260,7 @@ async def get_roles(
         include_global_roles=body.include_global_roles,
         include_org_type_roles=body.include_org_type_roles,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.post(
@@ -248,18 +268,20 @@ async def get_roles(
     tags=["角色管理"],
     summary="获取角色绑定用户列表",
     description="获取指定角色下绑定的用户，分页获取，支持关键字搜索、排序",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:roles"))],
 )
 async def get_users_in_role(
     body: QueryBody,
     role_id: uuid.UUID,
-) -> PaginatedData:
+) -> Response:
     result = await auth_app.db.query_single_json(
         f"""\
             WITH
                 page := <optional int64>$page ?? 1,
                 per_page := <optional int64>$per_page ?? 20,
                 q := <optional str>$q,
+                matched_users := search_users(q),
                 role := (
                     SELECT Role FILTER .id = <uuid>$role_id
                 ),
@@ -268,10 +290,7 @@ async def get_users_in_role(
                         role.users
                     ) FILTER (
                         true IF not EXISTS q ELSE
-                        .name ?? '' ILIKE q OR
-                        .username ?? '' ILIKE q OR
-                        .mobile ?? '' ILIKE q OR
-                        .email ?? '' ILIKE q
+                        .id IN matched_users.id
                     )
                 ),
                 total := count(users)
@@ -306,12 +325,12 @@ async def get_users_in_role(
                 ))
             );\
             """,
-        q=f"%{body.q}%" if body.q else None,
+        q=body.q or None,
         page=body.page,
         per_page=body.per_page,
         role_id=role_id,
     )
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.post(
@@ -176,6 +176,26 @@ def test_get_role(bo_client: TestClient, role: CreateRoleResult):
     assert CreateRoleResult(**resp.json()) == role
 
 
+def test_export_roles(bo_client: TestClient, role: CreateRoleResult):
+    resp = bo_client.get("/v1/roles/export", params={"format": "csv"})
+    assert resp.status_code == HTTPStatus.OK, resp.text
+    header, *lines = resp.text.splitlines()
+    assert header.split(",") == [
+        "id",
+        "name",
+        "code",
+        "description",
+        "org_type",
+        "permissions",
+        "is_deleted",
+        "created_at",
+    ]
+    assert any(line.startswith(f"{role.id},{role.name}") for line in lines)
+
+    resp = bo_client.get("/v1/roles/export", params={"format": "xml"})
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY, resp.json()
+
+
 def test_toggle_role_status(bo_client: TestClient, faker):
     data: dict[str, Any] = {}
     resp = bo_client.put("/v1/roles/status", json=data)
@@ -70,4 +70,5 @@ async def put_login_configs(
         configs[snake_key] = body[key]
 
     await upsert_login_setting(auth_app.db, configs=json.dumps(configs))
+    auth_app.invalidate_login_settings()
     return await load_login_configs()
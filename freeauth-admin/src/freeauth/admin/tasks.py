@@ -11,24 +11,33 @@
 
 from __future__ import annotations
 
+import abc
+import asyncio
+import dataclasses
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from email.utils import formataddr
 from pathlib import Path
+from typing import TYPE_CHECKING, cast
 
-from alibabacloud_dysmsapi20170525 import client as ali_sms_client
-from alibabacloud_dysmsapi20170525 import models as ali_sms_models
-from alibabacloud_tea_openapi.models import Config as AliyunConfig
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+import aiosmtplib
+from fastapi import FastAPI
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 from pydantic import BaseSettings, EmailStr
-from tencentcloud.common import credential
-from tencentcloud.sms.v20210111 import models as tq_sms_models
-from tencentcloud.sms.v20210111 import sms_client as tq_sms_client
 
 from freeauth.conf.settings import get_settings
 
 from . import logger
 
+if TYPE_CHECKING:
+    from tencentcloud.sms.v20210111 import models as tq_sms_models
 
-class MailSettings(ConnectionConfig):
+    _MailQueue = asyncio.Queue[tuple[EmailMessage, asyncio.Future[None]]]
+
+
+class MailSettings(BaseSettings):
     MAIL_FROM_NAME: str = "FreeAuth"
     MAIL_FROM: EmailStr | None = None
     MAIL_USERNAME: str | None = None
@@ -37,8 +46,16 @@ class MailSettings(ConnectionConfig):
     MAIL_SERVER: str = "localhost"
     MAIL_STARTTLS: bool = False
     MAIL_SSL_TLS: bool = False
+    VALIDATE_CERTS: bool = True
+    TIMEOUT: int = 60
+    SUPPRESS_SEND: bool = False
     TEMPLATE_FOLDER: Path = Path(__file__).resolve().parent / "templates/email"
 
+    # Delivery
+    MAIL_POOL_SIZE: int = 2  # persistent SMTP connections
+    MAIL_QUEUE_SIZE: int = 1000  # messages waiting for a connection
+    MAIL_IDLE_TIMEOUT: float = 60  # seconds before reconnecting idle ones
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -47,6 +64,155 @@ class MailSettings(ConnectionConfig):
 mail_conf = MailSettings()
 
 
+@dataclasses.dataclass
+class MailMetrics:
+    sent: int = 0
+    failed: int = 0
+    connections: int = 0
+    # Time spent on SMTP sessions, including reconnections.
+    busy_seconds: float = 0
+
+    @property
+    def throughput(self) -> float:
+        """Messages sent per second of SMTP session time."""
+        return self.sent / self.busy_seconds if self.busy_seconds else 0.0
+
+
+class _PooledSMTP:
+    def __init__(self, dispatcher: MailDispatcher):
+        self.dispatcher = dispatcher
+        self.smtp: aiosmtplib.SMTP | None = None
+        self.last_used = 0.0
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        self.close()
+        conf = self.dispatcher.conf
+        self.smtp = aiosmtplib.SMTP(
+            hostname=conf.MAIL_SERVER,
+            port=conf.MAIL_PORT,
+            username=conf.MAIL_USERNAME,
+            password=conf.MAIL_PASSWORD,
+            use_tls=conf.MAIL_SSL_TLS,
+            start_tls=conf.MAIL_STARTTLS,
+            validate_certs=conf.VALIDATE_CERTS,
+            timeout=conf.TIMEOUT,
+        )
+        await self.smtp.connect()
+        self.dispatcher.metrics.connections += 1
+        return self.smtp
+
+    async def send(self, message: EmailMessage):
+        idle = time.monotonic() - self.last_used
+        smtp = self.smtp
+        if (
+            smtp is None
+            or not smtp.is_connected
+            or idle > self.dispatcher.conf.MAIL_IDLE_TIMEOUT
+        ):
+            smtp = await self.connect()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The server dropped the connection since it was last checked.
+            smtp = await self.connect()
+            await smtp.send_message(message)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.smtp is not None and self.smtp.is_connected:
+            self.smtp.close()
+        self.smtp = None
+
+
+class MailDispatcher:
+    """Sends templated emails over a pool of persistent SMTP connections.
+
+    Templates are compiled once up front. Messages are queued and picked
+    up by ``MAIL_POOL_SIZE`` workers, each keeping its own connection open
+    and reconnecting once it has been idle for ``MAIL_IDLE_TIMEOUT``
+    seconds, so a burst of verification codes reuses a few SMTP sessions
+    instead of opening one per email.
+    """
+
+    def __init__(self, conf: MailSettings):
+        self.conf = conf
+        self.env = Environment(
+            loader=FileSystemLoader(conf.TEMPLATE_FOLDER),
+            autoescape=select_autoescape(),
+        )
+        self.templates: dict[str, Template] = {
+            name: self.env.get_template(name)
+            for name in self.env.list_templates()
+        }
+        self.metrics = MailMetrics()
+        self._queue: _MailQueue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._workers: list[asyncio.Task] = []
+
+    def render(self, tpl: str, body: dict) -> str:
+        return self.templates[tpl].render(**body)
+
+    async def send(self, tpl: str, subject: str, to: str, body: dict):
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = formataddr(
+            (self.conf.MAIL_FROM_NAME, self.conf.MAIL_FROM or "")
+        )
+        message["To"] = to
+        message.set_content(self.render(tpl, body), subtype="html")
+        if self.conf.SUPPRESS_SEND:
+            return
+
+        done = asyncio.get_running_loop().create_future()
+        await self._get_queue().put((message, done))
+        await done
+
+    def _get_queue(self) -> _MailQueue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            queue: _MailQueue = asyncio.Queue(self.conf.MAIL_QUEUE_SIZE)
+            self._queue = queue
+            self._workers = [
+                loop.create_task(self._work(queue))
+                for _ in range(self.conf.MAIL_POOL_SIZE)
+            ]
+        return cast("_MailQueue", self._queue)
+
+    async def _work(self, queue: _MailQueue):
+        conn = _PooledSMTP(self)
+        try:
+            while True:
+                message, done = await queue.get()
+                started = time.monotonic()
+                try:
+                    await conn.send(message)
+                except Exception as error:
+                    self.metrics.failed += 1
+                    conn.close()
+                    if not done.done():
+                        done.set_exception(error)
+                else:
+                    self.metrics.sent += 1
+                    if not done.done():
+                        done.set_result(None)
+                finally:
+                    self.metrics.busy_seconds += time.monotonic() - started
+                    queue.task_done()
+        finally:
+            conn.close()
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = self._loop = None
+
+
+mail_dispatcher = MailDispatcher(mail_conf)
+
+
 class SMSSettings(BaseSettings):
     SMS_PROVIDER: str | None = None  # 'tencent-cloud' or 'aliyun'
     SMS_SECRET_ID: str | None = None
@@ -58,6 +224,13 @@ class SMSSettings(BaseSettings):
     # Template IDs/Codes
     SMS_AUTH_CODE_TPL_ID: str | None = None  # send auth code
 
+    # Delivery
+    SMS_MAX_CONCURRENCY: int = 4  # concurrent requests to the provider
+    SMS_TIMEOUT: float = 10  # seconds
+    SMS_MAX_RETRIES: int = 2
+    SMS_RETRY_BACKOFF: float = 0.5  # seconds, doubled on each retry
+    SMS_BATCH_LINGER: float = 0.05  # seconds to wait for more recipients
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -71,76 +244,256 @@ def is_func_enabled(account):
     return not settings.testing and account not in settings.demo_accounts
 
 
-class TencentSMSProvider:
+class SMSProvider(abc.ABC):
+    """Sends one SMS request for a group of recipients sharing the same
+    template parameters. The SDK calls are blocking, so ``send`` is run
+    in the worker threads of an :class:`SMSDispatcher`.
+    """
+
+    name: str = ""
+    # Maximum number of recipients in a single request.
+    batch_size: int = 1
+
+    @abc.abstractmethod
+    def send(self, phone_nums: list[str], params: list[str]) -> list[str]:
+        """Send the auth code template and return the failed recipients."""
+
+
+class TencentSMSProvider(SMSProvider):
+    name = "tencent-cloud"
+    batch_size = 200
+
     def __init__(self):
+        # The SDKs are heavy, so only the configured provider's is loaded.
+        from tencentcloud.common import credential
+        from tencentcloud.common.profile.client_profile import ClientProfile
+        from tencentcloud.common.profile.http_profile import HttpProfile
+        from tencentcloud.sms.v20210111 import models as tq_sms_models
+        from tencentcloud.sms.v20210111 import sms_client as tq_sms_client
+
+        self.models = tq_sms_models
         cred = credential.Credential(
             sms_conf.SMS_SECRET_ID, sms_conf.SMS_SECRET_KEY
         )
-        self.client = tq_sms_client.SmsClient(cred, sms_conf.SMS_REGION)
+        profile = ClientProfile(
+            httpProfile=HttpProfile(reqTimeout=int(sms_conf.SMS_TIMEOUT))
+        )
+        self.client = tq_sms_client.SmsClient(
+            cred, sms_conf.SMS_REGION, profile
+        )
         logger.info("TencentCloud SMS provider loaded")
 
-    def send_auth_code(self, phone_num: str, code: str, ttl: int):
-        if not is_func_enabled(phone_num):
-            return
+    def send(self, phone_nums: list[str], params: list[str]) -> list[str]:
+        req = self.models.SendSmsRequest()
+        req.SmsSdkAppId = sms_conf.SMS_APP_ID
+        req.SignName = sms_conf.SMS_SIGN_NAME
+        req.TemplateId = sms_conf.SMS_AUTH_CODE_TPL_ID
+        req.TemplateParamSet = params
+        req.PhoneNumberSet = phone_nums
+        logger.info("Sending sms request with params %r", req)
+        resp: tq_sms_models.SendSmsResponse = self.client.SendSms(req)
+        failed = [
+            phone_num
+            for phone_num in phone_nums
+            for status in resp.SendStatusSet
+            if status.PhoneNumber.endswith(phone_num) and status.Code != "Ok"
+        ]
+        if failed:
+            logger.error("Failed to send sms, got error response %r", resp)
+        else:
+            logger.info("Got sms sending response %r", resp)
+        return failed
+
+
+class AliyunSMSProvider(SMSProvider):
+    name = "aliyun"
+    batch_size = 1000
 
-        try:
-            req = tq_sms_models.SendSmsRequest()
-            req.SmsSdkAppId = sms_conf.SMS_APP_ID
-            req.SignName = sms_conf.SMS_SIGN_NAME
-            req.TemplateId = sms_conf.SMS_AUTH_CODE_TPL_ID
-            req.TemplateParamSet = [code, str(ttl)]
-            req.PhoneNumberSet = [phone_num]
-            logger.info("Sending sms request with params %r", req)
-            resp: tq_sms_models.SendSmsResponse = self.client.SendSms(req)
-            status: tq_sms_models.SendStatus = resp.SendStatusSet[0]
-            if status.Code != "Ok":
-                logger.error("Failed to send sms, got error response %r", resp)
-            else:
-                logger.info("Got sms sending response %r", resp)
-        except Exception as error:
-            logger.error("Failed to send sms request %r", error)
-
-
-class AliyunSMSProvider:
     def __init__(self):
+        from alibabacloud_dysmsapi20170525 import client as ali_sms_client
+        from alibabacloud_dysmsapi20170525 import models as ali_sms_models
+        from alibabacloud_tea_openapi.models import Config as AliyunConfig
+
+        self.models = ali_sms_models
+        timeout = int(sms_conf.SMS_TIMEOUT * 1000)
         self.client = ali_sms_client.Client(
             AliyunConfig(
                 access_key_id=sms_conf.SMS_SECRET_ID,
                 access_key_secret=sms_conf.SMS_SECRET_KEY,
                 endpoint="dysmsapi.aliyuncs.com",
+                connect_timeout=timeout,
+                read_timeout=timeout,
             )
         )
         logger.info("Aliyun SMS provider loaded")
 
-    def send_auth_code(self, phone_num: str, code: str, ttl: int):
+    def send(self, phone_nums: list[str], params: list[str]) -> list[str]:
+        req = self.models.SendSmsRequest(
+            phone_numbers=",".join(phone_nums),
+            sign_name=sms_conf.SMS_SIGN_NAME,
+            template_code=sms_conf.SMS_AUTH_CODE_TPL_ID,
+            # Aliyun only supports the `code` parameter.
+            # https://help.aliyun.com/document_detail/463237.html?spm=a2c4g.108253.0.0.666d7f33lMeLAS#section-9tx-f7q-end
+            template_param=json.dumps(dict(code=params[0])),
+        )
+        logger.info("Sending sms request with params %s", req)
+        resp = self.client.send_sms(req)
+        if resp.body.code != "OK":
+            logger.error("Failed to send sms, got error response %s", resp)
+            return phone_nums
+        logger.info("Got sms sending response %s", resp)
+        return []
+
+
+@dataclasses.dataclass
+class _SMSBatch:
+    params: list[str]
+    phone_nums: list[str]
+    done: asyncio.Future[bool]
+
+
+class SMSDispatcher:
+    """Delivers SMS through a provider off the event loop.
+
+    The blocking SDK calls run in a dedicated thread pool rather than the
+    threadpool Starlette shares with sync endpoints and dependencies, so
+    a slow vendor cannot stall the app. At most ``max_concurrency``
+    requests are in flight, each one is given up after ``timeout``
+    seconds and retried with exponential backoff. Recipients sent the
+    same template parameters within ``linger`` seconds are grouped into
+    one request, up to the provider's ``batch_size``. This only pays off
+    for messages shared by many recipients: auth codes differ for each
+    one, so they are sent right away.
+    """
+
+    def __init__(
+        self,
+        provider: SMSProvider,
+        *,
+        max_concurrency: int = 4,
+        timeout: float = 10,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        linger: float = 0.05,
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.linger = linger
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix=f"freeauth-sms-{provider.name}",
+        )
+        self._batches: dict[tuple[str, ...], _SMSBatch] = {}
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def send_auth_code(self, phone_num: str, code: str, ttl: int):
         if not is_func_enabled(phone_num):
             return
-
+        await self.send(phone_num, [code, str(ttl)], batched=False)
+
+    async def send(
+        self, phone_num: str, params: list[str], *, batched: bool = True
+    ) -> bool:
+        if not batched:
+            return await self._deliver([phone_num], params)
+        key = tuple(params)
+        batch = self._batches.get(key)
+        if batch is not None:
+            batch.phone_nums.append(phone_num)
+            if len(batch.phone_nums) >= self.provider.batch_size:
+                del self._batches[key]
+            return await asyncio.shield(batch.done)
+
+        batch = _SMSBatch(
+            params, [phone_num], asyncio.get_running_loop().create_future()
+        )
+        if self.provider.batch_size > 1 and self.linger > 0:
+            self._batches[key] = batch
+            await asyncio.sleep(self.linger)
+            if self._batches.get(key) is batch:
+                del self._batches[key]
         try:
-            req = ali_sms_models.SendSmsRequest(
-                phone_numbers=phone_num,
-                sign_name=sms_conf.SMS_SIGN_NAME,
-                template_code=sms_conf.SMS_AUTH_CODE_TPL_ID,
-                # Aliyun only supports the `code` parameter.
-                # https://help.aliyun.com/document_detail/463237.html?spm=a2c4g.108253.0.0.666d7f33lMeLAS#section-9tx-f7q-end
-                template_param=json.dumps(dict(code=code)),
-            )
-            logger.info("Sending sms request with params %s", req)
-            resp = self.client.send_sms(req)
-            logger.info("Got sms sending response %s", resp)
-        except Exception as error:
-            logger.error("Failed to send sms request %s", error)
+            rv = await self._deliver(batch.phone_nums, batch.params)
+        except BaseException:
+            batch.done.set_result(False)
+            raise
+        batch.done.set_result(rv)
+        return rv
+
+    async def _deliver(self, phone_nums: list[str], params: list[str]) -> bool:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                phone_nums = await self._call(phone_nums, params)
+            except Exception as error:
+                logger.error("Failed to send sms request %r", error)
+            else:
+                if not phone_nums:
+                    return True
+        logger.error(
+            "Gave up sending sms to %s after %d attempts",
+            ", ".join(phone_nums),
+            self.max_retries + 1,
+        )
+        return False
+
+    async def _call(self, phone_nums: list[str], params: list[str]):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = cast(asyncio.Semaphore, self._semaphore)
+        await semaphore.acquire()
+        future = loop.run_in_executor(
+            self.executor, self.provider.send, phone_nums, params
+        )
+
+        # A timed-out call keeps its worker thread busy, so the slot is
+        # only given back once the SDK call really returns.
+        def release(fut: asyncio.Future):
+            semaphore.release()
+            if not fut.cancelled():
+                fut.exception()
 
+        future.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.shield(future), self.timeout)
 
-sms_provider: TencentSMSProvider | AliyunSMSProvider | None = None
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
 
 
-def init_app():
-    global sms_provider
-    if sms_conf.SMS_PROVIDER == "tencent-cloud":
-        sms_provider = TencentSMSProvider()
-    elif sms_conf.SMS_PROVIDER == "aliyun":
-        sms_provider = AliyunSMSProvider()
+SMS_PROVIDERS: dict[str, type[SMSProvider]] = {
+    TencentSMSProvider.name: TencentSMSProvider,
+    AliyunSMSProvider.name: AliyunSMSProvider,
+}
+
+sms_dispatcher: SMSDispatcher | None = None
+
+
+def init_app(app: FastAPI):
+    global sms_dispatcher
+    app.add_event_handler("shutdown", shutdown)
+    provider_class = SMS_PROVIDERS.get(sms_conf.SMS_PROVIDER or "")
+    if provider_class:
+        sms_dispatcher = SMSDispatcher(
+            provider_class(),
+            max_concurrency=sms_conf.SMS_MAX_CONCURRENCY,
+            timeout=sms_conf.SMS_TIMEOUT,
+            max_retries=sms_conf.SMS_MAX_RETRIES,
+            retry_backoff=sms_conf.SMS_RETRY_BACKOFF,
+            linger=sms_conf.SMS_BATCH_LINGER,
+        )
+
+
+async def shutdown():
+    await mail_dispatcher.close()
+    if sms_dispatcher:
+        sms_dispatcher.shutdown()
 
 
 async def send_email(tpl: str, subject: str, to: str, body: dict):
@@ -150,12 +503,4 @@ async def send_email(tpl: str, subject: str, to: str, body: dict):
     logger.info(
         "Sending email %s to account %s with data: %r", subject, to, body
     )
-    message = MessageSchema(
-        subject=subject,
-        recipients=[EmailStr(to)],
-        template_body=body,
-        subtype=MessageType.html,
-    )
-
-    fm = FastMail(mail_conf)
-    await fm.send_message(message, template_name=tpl)
+    await mail_dispatcher.send(tpl, subject, to, body)
@@ -11,6 +11,9 @@
 
 from __future__ import annotations
 
+import os
+import subprocess
+import sys
 from http import HTTPStatus
 
 from fastapi import FastAPI
@@ -30,3 +33,48 @@ def test_app(app: FastAPI, test_client: TestClient):
     resp = test_client.get("/ping")
     assert resp.status_code == HTTPStatus.OK
     assert resp.json() == {"status": "Ok"}
+
+
+# Upper bound of the time spent importing modules when the admin app starts.
+IMPORT_TIME_BUDGET = 3.0  # seconds
+LAZY_IMPORTED_MODULES = (
+    "alibabacloud_dysmsapi20170525",
+    "alibabacloud_tea_openapi",
+    "tencentcloud",
+)
+
+
+def test_app_import_time(tmp_path):
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from freeauth.admin.app import get_app; get_app()",
+        ],
+        cwd=tmp_path,
+        env=dict(os.environ, SMS_PROVIDER=""),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, _, name = line.partition(":")[2].split("|")
+        imports[name.strip()] = int(self_us)
+
+    loaded = [
+        name for name in imports if name.split(".")[0] in LAZY_IMPORTED_MODULES
+    ]
+    assert not loaded, "SMS SDKs are imported without an SMS provider"
+
+    total = sum(imports.values()) / 1e6
+    slowest = sorted(imports, key=imports.__getitem__, reverse=True)[:10]
+    assert (
+        total < IMPORT_TIME_BUDGET
+    ), f"Importing the admin app took {total:.2f}s, slowest: " + ", ".join(
+        f"{name} ({imports[name] / 1e3:.0f}ms)" for name in slowest
+    )
@@ -0,0 +1,48 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import pytest
+from pydantic import ValidationError
+
+from freeauth.conf.settings import get_settings
+
+from ..responses import paginated_response
+
+
+def test_paginated_response():
+    result = (
+        '{"total": 1, "per_page": 20, "page": 1, "last": 1, '
+        '"rows": [{"id": "1", "name": "FreeAuth"}]}'
+    )
+    resp = paginated_response(result)
+    assert resp.body == result.encode()
+    assert resp.media_type == "application/json"
+
+    with pytest.raises(ValidationError):
+        paginated_response('{"total": 1}')
+
+
+def test_paginated_response_without_validation(mocker):
+    mocker.patch.object(get_settings(), "validate_json_responses", False)
+    assert paginated_response('{"total": 1}').body == b'{"total": 1}'
+
+
+def test_paginated_response_validated_when_testing_only(mocker):
+    settings = get_settings()
+    mocker.patch.object(settings, "validate_json_responses", None)
+    with pytest.raises(ValidationError):
+        paginated_response('{"total": 1}')
+
+    mocker.patch.object(settings, "testing", False)
+    assert paginated_response('{"total": 1}').body == b'{"total": 1}'
@@ -0,0 +1,217 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import AsyncGenerator
+
+import pytest
+
+from ..tasks import MailDispatcher, MailSettings, SMSDispatcher, SMSProvider
+
+
+class FakeSMSProvider(SMSProvider):
+    name = "fake"
+    batch_size = 3
+
+    def __init__(self, delay: float = 0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.requests: list[tuple[list[str], list[str]]] = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def send(self, phone_nums: list[str], params: list[str]) -> list[str]:
+        with self.lock:
+            self.requests.append((list(phone_nums), params))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(self.delay)
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("provider unavailable")
+            return []
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+async def test_sms_dispatcher_batches_recipients():
+    provider = FakeSMSProvider()
+    dispatcher = SMSDispatcher(provider, linger=0.05)
+    rv = await asyncio.gather(
+        *(
+            dispatcher.send(f"1380000000{i}", ["123456", "5"])
+            for i in range(4)
+        ),
+        dispatcher.send("13900000000", ["654321", "5"]),
+    )
+    assert all(rv)
+    assert sorted(provider.requests) == [
+        (["13800000000", "13800000001", "13800000002"], ["123456", "5"]),
+        (["13800000003"], ["123456", "5"]),
+        (["13900000000"], ["654321", "5"]),
+    ]
+
+
+async def test_sms_dispatcher_sends_unbatched_right_away():
+    provider = FakeSMSProvider()
+    dispatcher = SMSDispatcher(provider, linger=10)
+    rv = await asyncio.wait_for(
+        asyncio.gather(
+            dispatcher.send("13800000000", ["123456", "5"], batched=False),
+            dispatcher.send("13800000001", ["123456", "5"], batched=False),
+        ),
+        1,
+    )
+    assert all(rv)
+    assert sorted(provider.requests) == [
+        (["13800000000"], ["123456", "5"]),
+        (["13800000001"], ["123456", "5"]),
+    ]
+
+
+async def test_sms_dispatcher_limits_concurrency():
+    provider = FakeSMSProvider(delay=0.05)
+    dispatcher = SMSDispatcher(provider, max_concurrency=2, linger=0)
+    rv = await asyncio.gather(
+        *(dispatcher.send(f"1380000000{i}", [str(i)]) for i in range(6))
+    )
+    assert all(rv)
+    assert len(provider.requests) == 6
+    assert provider.max_running == 2
+
+
+async def test_sms_dispatcher_retries():
+    provider = FakeSMSProvider(failures=2)
+    dispatcher = SMSDispatcher(
+        provider, max_retries=2, retry_backoff=0.01, linger=0
+    )
+    assert await dispatcher.send("13800000000", ["123456"])
+    assert len(provider.requests) == 3
+
+    provider = FakeSMSProvider(delay=0.2)
+    dispatcher = SMSDispatcher(
+        provider, timeout=0.05, max_retries=1, retry_backoff=0, linger=0
+    )
+    assert not await dispatcher.send("13800000000", ["123456"])
+    assert len(provider.requests) == 2
+
+
+class SMTPSink:
+    """A local SMTP server that keeps the messages it receives."""
+
+    def __init__(self):
+        self.messages: list[bytes] = []
+        self.connections = 0
+        self.drop_after_message = False
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        self.connections += 1
+        writer.write(b"220 sink ESMTP\r\n")
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250 sink\r\n")
+            elif command == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                data = []
+                while (line := await reader.readline()) != b".\r\n":
+                    data.append(line)
+                self.messages.append(b"".join(data))
+                writer.write(b"250 OK\r\n")
+                if self.drop_after_message:
+                    await writer.drain()
+                    break
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+@pytest.fixture
+async def smtp_sink() -> AsyncGenerator[tuple[SMTPSink, int], None]:
+    sink = SMTPSink()
+    server = await asyncio.start_server(sink.handle, "127.0.0.1", 0)
+    async with server:
+        yield sink, server.sockets[0].getsockname()[1]
+
+
+async def test_mail_dispatcher_reuses_connections(smtp_sink):
+    sink, port = smtp_sink
+    dispatcher = MailDispatcher(
+        MailSettings(
+            MAIL_SERVER="127.0.0.1",
+            MAIL_PORT=port,
+            MAIL_FROM="noreply@example.com",
+            MAIL_POOL_SIZE=2,
+        )
+    )
+    try:
+        await asyncio.gather(
+            *(
+                dispatcher.send(
+                    "send_signin_code.html",
+                    "登录验证码",
+                    f"user{i}@example.com",
+                    dict(code=f"{i:06}", ttl=5),
+                )
+                for i in range(10)
+            )
+        )
+    finally:
+        await dispatcher.close()
+
+    assert len(sink.messages) == 10
+    assert sink.connections == 2
+    assert dispatcher.metrics.sent == 10
+    assert dispatcher.metrics.connections == 2
+    assert dispatcher.metrics.throughput > 0
+    assert any(b"000003" in message for message in sink.messages)
+
+
+async def test_mail_dispatcher_reconnects(smtp_sink):
+    sink, port = smtp_sink
+    dispatcher = MailDispatcher(
+        MailSettings(
+            MAIL_SERVER="127.0.0.1",
+            MAIL_PORT=port,
+            MAIL_FROM="noreply@example.com",
+            MAIL_POOL_SIZE=1,
+        )
+    )
+    sink.drop_after_message = True
+    try:
+        for i in range(3):
+            await dispatcher.send(
+                "send_signup_code.html",
+                "注册验证码",
+                "user@example.com",
+                dict(code="123456", ttl=5),
+            )
+    finally:
+        await dispatcher.close()
+
+    assert len(sink.messages) == 3
+    assert sink.connections == 3
+    assert dispatcher.metrics.failed == 0
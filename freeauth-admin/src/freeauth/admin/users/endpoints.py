@@ -12,11 +12,20 @@
 from __future__ import annotations
 
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 from typing import List
 
 import edgedb
-from fastapi import BackgroundTasks, Depends, HTTPException
+from fastapi import (
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
 
 from freeauth.db.admin.admin_qry_async_edgeql import (
     CreateUserResult,
@@ -32,10 +41,17 @@ from freeauth.db.admin.admin_qry_async_edgeql import (
     update_user_roles,
     update_user_status,
 )
+from freeauth.db.importing import UserImportResult, import_users_async
 from freeauth.security.utils import gen_random_string, get_password_hash
 
+from .. import logger
 from ..app import auth_app, router
 from ..dataclasses import PaginatedData, QueryBody
+from ..responses import (
+    export_response,
+    paginated_response,
+    parse_export_format,
+)
 from ..tasks import send_email
 from .dataclasses import (
     UserDeleteBody,
@@ -54,6 +70,8 @@ FILTER_TYPE_MAPPING = {
     "is_deleted": "bool",
 }
 
+password_hash_executor = ThreadPoolExecutor(thread_name_prefix="pwd-hash")
+
 
 @router.post(
     "/users",
@@ -103,6 +121,53 @@ async def post_user(
     return created_user
 
 
+@router.post(
+    "/users/import",
+    tags=["用户管理"],
+    summary="批量导入用户",
+    description=(
+        "请求体为 CSV（首行为表头）或 NDJSON 文件，字段同创建用户，"
+        "另支持 org_type、organizations、roles 三列，部门和角色以 Code 表示，"
+        "多个 Code 以分号分隔；出错的行不影响其余行的导入；"
+        "未提供密码的用户将生成随机密码，并在结果的 passwords 中返回"
+    ),
+    dependencies=[Depends(auth_app.perm_accepted("manage:users"))],
+)
+async def import_users(
+    request: Request,
+    fmt: str = Query(
+        "csv",
+        alias="format",
+        title="文件格式",
+        description="支持 csv 或 ndjson",
+        regex="^(csv|ndjson)$",
+    ),
+) -> UserImportResult:
+    result = await import_users_async(
+        auth_app.db, request.stream(), fmt, password_hash_executor
+    )
+    logger.info(
+        "Imported %d of %d users, %d rows failed",
+        result.created,
+        result.total,
+        len(result.errors),
+    )
+    return result
+
+
+@router.get(
+    "/users/export",
+    tags=["用户管理"],
+    summary="导出用户",
+    description="以 NDJSON 或 CSV 格式流式导出全部用户，包括所属部门和角色",
+    dependencies=[Depends(auth_app.perm_accepted("manage:users"))],
+)
+async def export_users(
+    fmt: str = Depends(parse_export_format),
+) -> StreamingResponse:
+    return export_response("users", fmt)
+
+
 @router.put(
     "/users/status",
     tags=["用户管理"],
@@ -337,6 +402,7 @@ async def get_user(
     tags=["用户管理"],
     summary="获取用户列表",
     description="分页获取，支持关键字搜索、排序及条件过滤",
+    response_model=PaginatedData,
     dependencies=[
         Depends(
             auth_app.perm_accepted(
@@ -347,7 +413,7 @@ async def get_user(
 )
 async def query_users(
     body: UserQueryBody,
-) -> PaginatedData:
+) -> Response:
     filtering_expr = body.get_filtering_expr(FILTER_TYPE_MAPPING)
     result = await auth_app.db.query_single_json(
         f"""\
@@ -355,17 +421,15 @@ async def query_users(
             page := <optional int64>$page ?? 1,
             per_page := <optional int64>$per_page ?? 20,
             q := <optional str>$q,
+            matched_users := search_users(q),
             org_type_id := <optional uuid>$org_type_id,
             include_unassigned_users := <bool>$include_unassigned_users,
             users := (
-                SELECT User
+                SELECT (
+                    User IF not EXISTS q ELSE
+                    matched_users
+                )
                 FILTER (
-                    true IF not EXISTS q ELSE
-                    .name ?? '' ILIKE q OR
-                    .username ?? '' ILIKE q OR
-                    .mobile ?? '' ILIKE q OR
-                    .email ?? '' ILIKE q
-                ) AND (
                     true IF include_unassigned_users ELSE
                     EXISTS .org_type
                 ) AND (
@@ -406,14 +470,14 @@ async def query_users(
             ))
         );\
         """,
-        q=f"%{body.q}%" if body.q else None,
+        q=body.q or None,
         page=body.page,
         per_page=body.per_page,
         org_type_id=body.org_type_id,
         include_unassigned_users=body.include_unassigned_users,
     )
 
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
 
 
 @router.post(
@@ -421,12 +485,13 @@ async def query_users(
     tags=["用户管理"],
     summary="获取指定用户的权限列表",
     description="获取指定用户的权限，分页获取，支持关键字搜索、排序及条件过滤",
+    response_model=PaginatedData,
     dependencies=[Depends(auth_app.perm_accepted("manage:users"))],
 )
 async def get_permissions_in_user(
     body: QueryBody,
     user_id: uuid.UUID,
-) -> PaginatedData:
+) -> Response:
     result = await auth_app.db.query_single_json(
         f"""\
         with
@@ -473,4 +538,4 @@ async def get_permissions_in_user(
         user_id=user_id,
     )
 
-    return PaginatedData.parse_raw(result)
+    return paginated_response(result)
@@ -11,6 +11,7 @@
 
 from __future__ import annotations
 
+import json
 import uuid
 from datetime import datetime, timezone
 from http import HTTPStatus
@@ -713,6 +714,109 @@ def test_get_user(bo_client: TestClient, user: CreateUserResult):
     assert CreateUserResult(**resp.json()) == user
 
 
+def test_import_users(
+    bo_client: TestClient,
+    org_type: CreateOrgTypeResult,
+    department: CreateDepartmentResult,
+    roles: list[CreateRoleResult],
+    user: CreateUserResult,
+    faker,
+):
+    usernames = [faker.user_name() + str(i) for i in range(3)]
+    content = (
+        "name,username,email,org_type,organizations,roles\n"
+        f"{faker.name()},{usernames[0]},,{org_type.code},"
+        f"{department.code},{roles[0].code};{roles[1].code}\n"
+        f",{usernames[1]},{faker.email()},,,\n"
+        f",{user.username},,,,\n"
+        f",{usernames[2]},,{org_type.code},NOT_EXIST,\n"
+        ",,,,,\n"
+    )
+    resp = bo_client.post(
+        "/v1/users/import", content=content.encode("utf-8-sig")
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["total"] == 5
+    assert rv["created"] == 2
+    assert rv["errors"] == [
+        dict(row=4, message="用户名、邮箱或手机号已被使用"),
+        dict(row=5, message="部门 NOT_EXIST 不存在"),
+        dict(row=6, message="用户名、邮箱、手机号三个信息中请至少提供一项"),
+    ]
+    assert [(p["row"], p["username"]) for p in rv["passwords"]] == [
+        (2, usernames[0]),
+        (3, usernames[1]),
+    ]
+    generated = rv["passwords"][1]["password"]
+
+    resp = bo_client.post(
+        "/v1/users/query",
+        json=dict(q=usernames[0]),
+    )
+    imported = resp.json()["rows"][0]
+    assert imported["username"] == usernames[0]
+    assert [d["id"] for d in imported["departments"]] == [str(department.id)]
+    assert {r["id"] for r in imported["roles"]} == {
+        str(role.id) for role in roles
+    }
+
+    resp = bo_client.post(
+        "/v1/users/import",
+        params={"format": "ndjson"},
+        content=b'{"username": "1abc"}\n',
+    )
+    rv = resp.json()
+    assert resp.status_code == HTTPStatus.OK, rv
+    assert rv["created"] == 0
+    assert rv["errors"][0]["row"] == 1
+
+    resp = bo_client.post(
+        "/v1/sign_in", json=dict(account=usernames[1], password=generated)
+    )
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+
+
+def test_export_users(
+    bo_client: TestClient,
+    org_type: CreateOrgTypeResult,
+    department: CreateDepartmentResult,
+    user: CreateUserResult,
+    faker,
+):
+    resp = bo_client.post(
+        "/v1/users",
+        json=dict(
+            username=faker.user_name(),
+            organization_ids=[str(department.id)],
+            org_type_id=str(org_type.id),
+        ),
+    )
+    assert resp.status_code == HTTPStatus.CREATED, resp.json()
+    member = resp.json()
+
+    resp = bo_client.get("/v1/users/export")
+    assert resp.status_code == HTTPStatus.OK, resp.text
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    ids = [row["id"] for row in rows]
+    assert ids == sorted(ids)
+    exported = {row["id"]: row for row in rows}
+    assert exported[str(user.id)]["username"] == user.username
+    assert exported[member["id"]]["departments"][0]["code"] == department.code
+
+    resp = bo_client.get("/v1/users/export", params={"format": "csv"})
+    assert resp.status_code == HTTPStatus.OK, resp.text
+    assert resp.headers["content-type"].startswith("text/csv")
+    header, *lines = resp.text.splitlines()
+    assert header.startswith("id,name,username")
+    assert len(lines) == len(rows)
+    assert any(
+        line.startswith(member["id"]) and department.code in line
+        for line in lines
+    )
+
+
 def test_query_users(bo_client: TestClient, bo_user, faker):
     from ...organizations.tests.test_org_type_api import create_org_type
 
@@ -158,3 +158,50 @@ async def test_delete_user(
     await delete_user(edgedb_client, user_ids=[user.id])
     deleted_user = await get_user_by_id(edgedb_client, id=user.id)
     assert deleted_user is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "keyword,matched",
+    [
+        ("张", True),
+        ("张三", True),
+        ("Us", True),
+        ("三a", False),
+        ("USER@EXAMPLE", True),
+        ("1380000", True),
+        ("8000", True),
+        ("admin", False),
+        ("13900000000", False),
+    ],
+)
+async def test_search_users(
+    edgedb_client: edgedb.AsyncIOClient,
+    user: CreateUserResult,
+    keyword: str,
+    matched: bool,
+):
+    users = await edgedb_client.query(
+        "select freeauth::search_users(<str>$q) { id }", q=keyword
+    )
+    assert (user.id in [u.id for u in users]) is matched
+
+
+@pytest.mark.asyncio
+async def test_search_users_after_update(
+    edgedb_client: edgedb.AsyncIOClient,
+    user: CreateUserResult,
+):
+    await update_user(
+        edgedb_client,
+        name="李四",
+        username="lisi",
+        email=None,
+        mobile=None,
+        id=user.id,
+    )
+    search_users = "select freeauth::search_users(<str>$q) { id }"
+    assert not await edgedb_client.query(search_users, q="张三")
+    assert not await edgedb_client.query(search_users, q="user@example.com")
+    users = await edgedb_client.query(search_users, q="lisi")
+    assert [u.id for u in users] == [user.id]
@@ -0,0 +1,122 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+"""Compare the serialization of generated query results by FastAPI's
+default path with the compiled encoders of FreeAuthRoute.
+
+    poetry run python benchmarks/serialization.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import timeit
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from freeauth.db.auth.auth_qry_async_edgeql import (
+    GetCurrentUserResult,
+    GetCurrentUserResultDepartmentsItem,
+    GetCurrentUserResultDepartmentsItemEnterprise,
+    GetCurrentUserResultOrgType,
+    GetCurrentUserResultRolesItem,
+)
+from freeauth.ext.fastapi_ext.routing import (
+    FastJSONResponse,
+    compile_encoder,
+    orjson,
+)
+
+
+def make_user(size: int) -> GetCurrentUserResult:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    org_type = GetCurrentUserResultOrgType(
+        id=uuid.uuid4(), code="INNER", name="内部组织"
+    )
+    enterprise = GetCurrentUserResultDepartmentsItemEnterprise(
+        id=uuid.uuid4(), name="总公司"
+    )
+    return GetCurrentUserResult(
+        id=uuid.uuid4(),
+        name="张三",
+        username="user",
+        email="user@example.com",
+        mobile="13800000000",
+        org_type=org_type,
+        departments=[
+            GetCurrentUserResultDepartmentsItem(
+                id=uuid.uuid4(),
+                code=f"D{i}",
+                name=f"部门{i}",
+                enterprise=enterprise,
+                org_type=GetCurrentUserResultDepartmentsItemEnterprise(
+                    id=org_type.id, name=org_type.name
+                ),
+            )
+            for i in range(size)
+        ],
+        roles=[
+            GetCurrentUserResultRolesItem(
+                id=uuid.uuid4(),
+                name=f"角色{i}",
+                code=f"R{i}",
+                description=None,
+                org_type=org_type,
+                is_deleted=False,
+                is_protected=False,
+                created_at=now,
+            )
+            for i in range(size)
+        ],
+        perms=[f"perm:{i}" for i in range(size * 5)],
+        is_deleted=False,
+        created_at=now,
+        last_login_at=now,
+        reset_pwd_on_next_login=False,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    encode = compile_encoder(GetCurrentUserResult)
+    print(f"JSON library: {'orjson' if orjson else 'json'}")
+    print(f"{'shape':>24} {'default':>12} {'compiled':>12} {'speedup':>8}")
+    for size in (0, 5, 50):
+        user = make_user(size)
+        assert json.loads(JSONResponse(jsonable_encoder(user)).body) == (
+            json.loads(FastJSONResponse(encode(user)).body)
+        )
+        default = timeit.timeit(
+            lambda: JSONResponse(jsonable_encoder(user)).body,
+            number=args.number,
+        )
+        compiled = timeit.timeit(
+            lambda: FastJSONResponse(encode(user)).body,
+            number=args.number,
+        )
+        print(
+            f"{f'{size} depts/roles':>24} "
+            f"{default / args.number * 1e6:>10.1f}us "
+            f"{compiled / args.number * 1e6:>10.1f}us "
+            f"{default / compiled:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,18 @@
 # See the Mulan PSL v2 for more details.
 
 from .app import FreeAuthApp
+from .client import FreeAuthClient
+from .ratelimit import MemoryRateLimitBackend, RateLimitBackend, RateLimiter
+from .routing import FastJSONResponse, FreeAuthRoute
 from .test_app import FreeAuthTestApp
 
-__all__ = ["FreeAuthApp", "FreeAuthTestApp"]
+__all__ = [
+    "FastJSONResponse",
+    "FreeAuthApp",
+    "FreeAuthClient",
+    "FreeAuthRoute",
+    "FreeAuthTestApp",
+    "MemoryRateLimitBackend",
+    "RateLimitBackend",
+    "RateLimiter",
+]
@@ -16,7 +16,7 @@ import logging
 import uuid
 from datetime import datetime, timedelta
 from http import HTTPStatus
-from typing import Callable
+from typing import Any, Callable
 
 import edgedb
 from fastapi import Depends, FastAPI, HTTPException, Request, Response
@@ -24,17 +24,21 @@ from jose import ExpiredSignatureError, JWTError, jwt
 
 from freeauth.conf.login_settings import LoginSettings
 from freeauth.conf.settings import get_settings
-from freeauth.db.admin.admin_qry_async_edgeql import add_missing_permissions
+from freeauth.db.admin.admin_qry_async_edgeql import init_app_data
 from freeauth.db.auth.auth_qry_async_edgeql import (
     GetCurrentUserResult,
     GetUserByAccessTokenResult,
     get_current_user,
     get_login_setting,
+    get_login_settings_version,
     get_user_by_access_token,
     has_any_permission,
 )
 from freeauth.security import FreeAuthSecurity
 
+from .cache import TokenCache
+from .ratelimit import RateLimiter
+
 logger = logging.getLogger(__name__)
 
 __all__ = ["FreeAuthApp"]
@@ -51,6 +55,9 @@ class FreeAuthApp:
         self._edgedb_client: edgedb.AsyncIOClient | None = None
         self.settings = get_settings()
         self.security = FreeAuthSecurity()
+        self.token_cache = TokenCache()
+        self.rate_limiter = RateLimiter()
+        self._login_settings: tuple[int, LoginSettings] | None = None
 
         if app is not None:
             self.init_app(app)
@@ -78,18 +85,19 @@ class FreeAuthApp:
         await self.db.aclose()
 
     async def init_app_data(self) -> None:
-        # create default organization type
-        await self.db.query_single("""\
-            insert OrganizationType {
-                name := '内部组织',
-                code := 'INNER',
-                is_protected := true
-            } unless conflict;\
-        """)
-        # migrate permissions
+        # Create the default organization type and the missing permissions,
+        # unless the registered permissions haven't changed since the last
+        # time any worker of this application did so and none was deleted.
         perm_codes = [perm.code for perm in self.security.permissions]
-        if perm_codes:
-            await add_missing_permissions(self.db, perm_codes=perm_codes)
+        initialized = await init_app_data(
+            self.db,
+            fingerprint=self.security.permissions_fingerprint,
+            perm_codes=perm_codes,
+        )
+        if initialized:
+            logger.info(
+                "Initialized app data with %d permissions", len(perm_codes)
+            )
 
     @property
     def db(self) -> edgedb.AsyncIOClient:
@@ -105,22 +113,40 @@ class FreeAuthApp:
         return self.db.with_globals(*args, **globals_)
 
     async def create_access_token(
-        self, response: Response, user_id: uuid.UUID
+        self, response: Response, user_id: uuid.UUID, jti: uuid.UUID
     ) -> str:
-        now = datetime.utcnow()
         login_settings = await self.get_login_settings()
+        token = self.encode_access_token(login_settings, user_id, jti)
+        self.set_access_token_cookie(response, token, login_settings)
+        return token
+
+    def encode_access_token(
+        self, login_settings: LoginSettings, user_id: uuid.UUID, jti: uuid.UUID
+    ) -> str:
+        """Signs an access token for the stored token of the given ``jti``.
+
+        The token is stored by its ``jti``, which is known up front, so it
+        can be stored by the same query that signs up or signs in the user,
+        and signed once that query returns the user.
+        """
         jwt_token_ttl = login_settings.jwt_token_ttl
         payload = {
             "sub": str(user_id),
-            "exp": now + timedelta(
+            "jti": str(jti),
+            "exp": datetime.utcnow() + timedelta(
                 minutes=jwt_token_ttl or self.settings.jwt_token_ttl
             ),
         }
-        token = jwt.encode(
+        return jwt.encode(
             payload,
             self.settings.jwt_secret_key,
             algorithm=self.settings.jwt_algorithm,
         )
+
+    def set_access_token_cookie(
+        self, response: Response, token: str, login_settings: LoginSettings
+    ) -> None:
+        jwt_token_ttl = login_settings.jwt_token_ttl
         response.set_cookie(
             key=self.settings.jwt_cookie_key,
             value=token,
@@ -129,7 +155,6 @@ class FreeAuthApp:
             max_age=jwt_token_ttl * 60 if jwt_token_ttl else None,
             samesite="strict",
         )
-        return token
 
     async def get_access_token(
         self, request: Request
@@ -141,8 +166,56 @@ class FreeAuthApp:
             logger.info("missing token")
             return None
 
+        payload = self.verify_access_token(access_token)
+        if not payload:
+            return None
+
+        token: GetUserByAccessTokenResult | None = (
+            await get_user_by_access_token(
+                self.db, access_token=access_token, jti=self.token_jti(payload)
+            )
+        )
+        if not token:
+            logger.info("token not found")
+            return None
+
+        if not self.is_token_subject(payload, token.user.id):
+            logger.info("user mismatches in token")
+            return None
+        return token
+
+    @staticmethod
+    def is_token_subject(payload: dict[str, Any], user_id: uuid.UUID) -> bool:
+        """Checks that a decoded access token was issued to the given user."""
+        return payload.get("sub") == str(user_id)
+
+    @staticmethod
+    def token_jti(payload: dict[str, Any]) -> uuid.UUID | None:
+        """Returns the ``jti`` a decoded access token is stored by.
+
+        Tokens signed before they had one are stored as is instead.
+        """
+        jti = payload.get("jti")
+        return uuid.UUID(jti) if jti else None
+
+    def verify_access_token(self, access_token: str) -> dict[str, Any] | None:
+        """Like `decode_access_token`, but served from `token_cache` for
+        tokens verified before.
+        """
+        payload = self.token_cache.get(access_token)
+        if payload is None:
+            payload = self.decode_access_token(access_token)
+            if payload:
+                self.token_cache.set(access_token, payload)
+        return payload
+
+    def decode_access_token(self, access_token: str) -> dict[str, Any] | None:
+        """Verifies the signature and expiry of an access token.
+
+        :return: The payload of the token, or None if the token is invalid
+        """
         try:
-            payload = jwt.decode(
+            return jwt.decode(
                 access_token,
                 self.settings.jwt_secret_key,
                 algorithms=[self.settings.jwt_algorithm],
@@ -153,21 +226,6 @@ class FreeAuthApp:
         except JWTError:
             logger.info("invalid token")
             return None
-        else:
-            token: GetUserByAccessTokenResult | None = (
-                await get_user_by_access_token(
-                    self.db, access_token=access_token
-                )
-            )
-            if not token:
-                logger.info("token not found")
-                return None
-
-            user_id = payload.get("sub")
-            if user_id != str(token.user.id):
-                logger.info("user mismatches in token")
-                return None
-        return token
 
     @property
     def user_scoped_db(self) -> Callable:
@@ -233,6 +291,15 @@ class FreeAuthApp:
         return dependency
 
     async def get_login_settings(self) -> LoginSettings:
+        """Loads the login settings, cached in the current process until
+        their version changes, i.e. until any process saves them.
+        """
+        version = await get_login_settings_version(self.db)
+        if self._login_settings:
+            cached_version, settings = self._login_settings
+            if cached_version == version:
+                return settings
+
         settings = LoginSettings()
         fields = settings.__fields__.keys()
         settings_in_db = await get_login_setting(self.db)
@@ -240,8 +307,12 @@ class FreeAuthApp:
         for item in settings_in_db:
             if item.key in fields:
                 setattr(settings, item.key, json.loads(item.value))
+        self._login_settings = (version, settings)
         return settings
 
+    def invalidate_login_settings(self) -> None:
+        self._login_settings = None
+
     @property
     def login_settings(self):
         async def dependency() -> LoginSettings:
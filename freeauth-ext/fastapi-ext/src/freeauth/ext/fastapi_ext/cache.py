@@ -0,0 +1,57 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any
+
+__all__ = ["TokenCache"]
+
+
+class TokenCache:
+    """In-memory cache of verified access tokens.
+
+    Keeps the payload of each token whose signature has been verified,
+    until the token expires. Whether a token is revoked is never cached, so
+    a revocation made by any process takes effect right away.
+
+    :param maxsize: Maximum number of tokens kept
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def get(self, access_token: str) -> dict[str, Any] | None:
+        """Returns the payload of a verified token that has not expired."""
+        payload = self._entries.get(access_token)
+        if payload is None:
+            return None
+        if time.time() >= payload["exp"]:
+            del self._entries[access_token]
+            return None
+        self._entries.move_to_end(access_token)
+        return payload
+
+    def set(self, access_token: str, payload: dict[str, Any]) -> None:
+        self._entries[access_token] = payload
+        self._entries.move_to_end(access_token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, access_token: str) -> None:
+        self._entries.pop(access_token, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
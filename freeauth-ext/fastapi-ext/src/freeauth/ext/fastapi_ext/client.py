@@ -0,0 +1,91 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import uuid
+from typing import Any, Iterable
+
+__all__ = ["FreeAuthClient"]
+
+
+class FreeAuthClient:
+    """Client of the FreeAuth APIs for downstream services.
+
+    Requires `httpx`, which is imported on first use so that applications
+    not using the client do not need it.
+
+    :param base_url: Base URL of the FreeAuth API, e.g.
+        ``https://auth.example.com/v1``
+    :param app_id: ID of the calling application
+    :param app_secret: Secret of the calling application
+    :param client_kwargs: Extra arguments for `httpx.AsyncClient`
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        app_id: uuid.UUID | str,
+        app_secret: str,
+        timeout: float = 5.0,
+        **client_kwargs: Any,
+    ):
+        try:
+            import httpx
+        except ImportError as e:  # pragma: no cover
+            raise RuntimeError(
+                "FreeAuthClient requires httpx: pip install httpx"
+            ) from e
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            auth=(str(app_id), app_secret),
+            timeout=timeout,
+            **client_kwargs,
+        )
+
+    async def check_permissions(
+        self, checks: Iterable[tuple[uuid.UUID | str, str]]
+    ) -> list[bool]:
+        """Checks many permissions in one round-trip.
+
+        :param checks: Pairs of (user ID or access token, permission code);
+            a string that parses as a UUID is taken as a user ID
+        :return: Whether each pair is allowed, in the same order
+        """
+        items = [
+            dict(_parse_subject(subject), perm_code=perm_code)
+            for subject, perm_code in checks
+        ]
+        if not items:
+            return []
+        resp = await self._client.post("/authz/check", json={"items": items})
+        resp.raise_for_status()
+        return [result["allowed"] for result in resp.json()]
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> FreeAuthClient:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+def _parse_subject(subject: uuid.UUID | str) -> dict[str, str]:
+    if isinstance(subject, uuid.UUID):
+        return dict(user_id=str(subject))
+    try:
+        return dict(user_id=str(uuid.UUID(subject)))
+    except ValueError:
+        return dict(access_token=subject)
@@ -0,0 +1,123 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import abc
+import time
+from collections import OrderedDict, deque
+from typing import Iterable, Mapping
+
+__all__ = ["RateLimitBackend", "MemoryRateLimitBackend", "RateLimiter"]
+
+
+class RateLimitBackend(abc.ABC):
+    """Storage of the hits counted by `RateLimiter`.
+
+    Implement this on top of a shared store such as Redis to enforce the
+    limits across workers; the default backend only sees the current one.
+    """
+
+    @abc.abstractmethod
+    async def count(self, key: str, window: float) -> int:
+        """Returns the number of hits on `key` in the last `window` seconds."""
+
+    @abc.abstractmethod
+    async def add(self, key: str, window: float) -> None:
+        """Records a hit on `key`, to be kept for `window` seconds."""
+
+    @abc.abstractmethod
+    async def reset(self, key: str) -> None:
+        """Forgets all hits on `key`."""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Sliding-window log kept in the memory of the current process.
+
+    :param maxsize: Maximum number of keys tracked, the least recently hit
+        ones are dropped first
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._hits: OrderedDict[str, deque[float]] = OrderedDict()
+
+    def _prune(self, key: str, window: float) -> deque[float] | None:
+        hits = self._hits.get(key)
+        if hits is None:
+            return None
+        since = time.monotonic() - window
+        while hits and hits[0] <= since:
+            hits.popleft()
+        if not hits:
+            del self._hits[key]
+            return None
+        return hits
+
+    async def count(self, key: str, window: float) -> int:
+        hits = self._prune(key, window)
+        return len(hits) if hits else 0
+
+    async def add(self, key: str, window: float) -> None:
+        hits = self._prune(key, window)
+        if hits is None:
+            hits = self._hits[key] = deque()
+        hits.append(time.monotonic())
+        self._hits.move_to_end(key)
+        while len(self._hits) > self.maxsize:
+            self._hits.popitem(last=False)
+
+    async def reset(self, key: str) -> None:
+        self._hits.pop(key, None)
+
+    def clear(self) -> None:
+        self._hits.clear()
+
+
+class RateLimiter:
+    """Sliding-window rate limiter over one or more keys.
+
+    :param backend: Where hits are stored, in memory of the current process
+        by default
+    """
+
+    def __init__(self, backend: RateLimitBackend | None = None):
+        self.backend = backend or MemoryRateLimitBackend()
+
+    async def exceeded(self, limits: Mapping[str, int], window: float) -> bool:
+        """Checks whether any key has reached its limit within `window`.
+
+        :param limits: Maximum number of hits allowed per key
+        :param window: Length of the sliding window in seconds
+        """
+        for key, limit in limits.items():
+            if await self.backend.count(key, window) >= limit:
+                return True
+        return False
+
+    async def add(self, keys: Iterable[str], window: float) -> None:
+        for key in keys:
+            await self.backend.add(key, window)
+
+    async def hit(self, limits: Mapping[str, int], window: float) -> bool:
+        """Records a hit on every key unless one has reached its limit.
+
+        :return: False if the hit is rejected
+        """
+        if await self.exceeded(limits, window):
+            return False
+        await self.add(limits.keys(), window)
+        return True
+
+    async def reset(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            await self.backend.reset(key)
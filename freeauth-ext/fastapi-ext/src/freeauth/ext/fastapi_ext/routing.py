@@ -0,0 +1,281 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import enum
+import functools
+import inspect
+import json
+import types
+import uuid
+from typing import Any, Callable, Union, get_args, get_origin, get_type_hints
+
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.dependencies.utils import (
+    get_typed_return_annotation,
+    get_typed_signature,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+from pydantic.utils import lenient_issubclass
+from starlette.concurrency import run_in_threadpool
+
+from freeauth.db.admin import admin_qry_async_edgeql, admin_qry_edgeql
+from freeauth.db.auth import auth_qry_async_edgeql, auth_qry_edgeql
+
+_orjson_dumps: Callable[[Any], bytes] | None
+try:
+    from orjson import dumps as _orjson_dumps
+except ImportError:  # pragma: no cover
+    _orjson_dumps = None
+
+__all__ = [
+    "FastJSONResponse",
+    "FreeAuthRoute",
+    "compile_encoder",
+    "dumps",
+]
+
+Encoder = Callable[[Any], Any]
+
+# `X | Y` annotations, which are only types.UnionType from Python 3.10 on
+UNION_TYPES = (Union, getattr(types, "UnionType", Union))
+
+# each module generated by edgedb-py defines the base of its result types
+_GENERATED_BASES: tuple[type, ...] = (
+    admin_qry_async_edgeql.NoPydanticValidation,
+    admin_qry_edgeql.NoPydanticValidation,
+    auth_qry_async_edgeql.NoPydanticValidation,
+    auth_qry_edgeql.NoPydanticValidation,
+)
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _isoformat(value: datetime.date | datetime.time) -> str:
+    return value.isoformat()
+
+
+def _enum_value(value: enum.Enum) -> Any:
+    return value.value
+
+
+_SCALAR_ENCODERS: dict[Any, Encoder] = {
+    str: _identity,
+    int: _identity,
+    float: _identity,
+    bool: _identity,
+    type(None): _identity,
+    uuid.UUID: str,
+    datetime.datetime: _isoformat,
+    datetime.date: _isoformat,
+    datetime.time: _isoformat,
+}
+
+
+_ENCODERS: dict[Any, Encoder] = dict(_SCALAR_ENCODERS)
+
+
+def compile_encoder(tp: Any) -> Encoder:
+    """Build a function turning values of type ``tp`` into what
+    :func:`jsonable_encoder` would return for them.
+
+    Dataclasses get a generated function reading each field with the
+    encoder of its annotated type, so the type checks and recursion of
+    ``jsonable_encoder`` happen once per type instead of once per value.
+    Types it doesn't know about fall back to ``jsonable_encoder``.
+    """
+    try:
+        return _ENCODERS[tp]
+    except KeyError:
+        pass
+    encoder = _compile_encoder(tp)
+    _ENCODERS[tp] = encoder
+    return encoder
+
+
+def _compile_encoder(tp: Any) -> Encoder:
+    origin = get_origin(tp)
+    if origin in UNION_TYPES:
+        args = [arg for arg in get_args(tp) if arg is not type(None)]
+        if len(args) != 1:
+            return jsonable_encoder
+        encoder = compile_encoder(args[0])
+        if encoder is _identity:
+            return _identity
+        return lambda value: None if value is None else encoder(value)
+    if origin in (list, tuple, set, frozenset):
+        item_types = get_args(tp)
+        item_encoder: Encoder = jsonable_encoder
+        if item_types:
+            item_encoder = compile_encoder(item_types[0])
+        if item_encoder is _identity:
+            return list
+        return lambda value: [item_encoder(item) for item in value]
+    if isinstance(tp, type) and issubclass(tp, enum.Enum):
+        return _enum_value
+    if isinstance(tp, type) and dataclasses.is_dataclass(tp):
+        # Stands for the type while its fields are compiled, in case they
+        # refer back to it, and looks up the real encoder once there is one.
+        _ENCODERS[tp] = lambda value: _ENCODERS[tp](value)
+        return _compile_dataclass_encoder(tp)
+    return jsonable_encoder
+
+
+def _compile_dataclass_encoder(tp: type) -> Encoder:
+    hints = get_type_hints(tp)
+    namespace: dict[str, Any] = {}
+    items = []
+    for field in dataclasses.fields(tp):
+        encoder = compile_encoder(hints[field.name])
+        if encoder is _identity:
+            items.append(f"{field.name!r}: obj.{field.name}")
+        else:
+            namespace[f"encode_{field.name}"] = encoder
+            items.append(
+                f"{field.name!r}: encode_{field.name}(obj.{field.name})"
+            )
+    source = "def encode(obj):\n    return {%s}\n" % ", ".join(items)
+    exec(source, namespace)
+    return namespace["encode"]
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize JSON-compatible content, with orjson if it is installed."""
+    if _orjson_dumps is not None:
+        return _orjson_dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _generated_type(tp: Any) -> type | None:
+    """Return the result dataclass generated by edgedb-py that ``tp`` is
+    made of, if any."""
+    if get_origin(tp) in (*UNION_TYPES, list):
+        args = [arg for arg in get_args(tp) if arg is not type(None)]
+        return _generated_type(args[0]) if len(args) == 1 else None
+    if (
+        isinstance(tp, type)
+        and dataclasses.is_dataclass(tp)
+        and issubclass(tp, _GENERATED_BASES)
+    ):
+        return tp
+    return None
+
+
+class FreeAuthRoute(APIRoute):
+    """An :class:`APIRoute` serializing the query results generated by
+    edgedb-py with a per-type compiled encoder, rather than validating
+    them with pydantic and walking them with ``jsonable_encoder``.
+
+    Other routes are left as they are. The response model is kept, so
+    the OpenAPI schema doesn't change.
+    """
+
+    def __init__(
+        self, path: str, endpoint: Callable[..., Any], **kwargs: Any
+    ) -> None:
+        response_model = kwargs.get("response_model", Default(None))
+        if isinstance(response_model, DefaultPlaceholder):
+            response_model = get_typed_return_annotation(endpoint)
+        if (
+            _generated_type(response_model)
+            and not lenient_issubclass(response_model, Response)
+            and not any(
+                kwargs.get(option)
+                for option in (
+                    "response_model_include",
+                    "response_model_exclude",
+                    "response_model_exclude_unset",
+                    "response_model_exclude_defaults",
+                    "response_model_exclude_none",
+                )
+            )
+        ):
+            kwargs["response_model"] = response_model
+            endpoint = self._wrap_endpoint(
+                endpoint,
+                compile_encoder(response_model),
+                kwargs.get("status_code"),
+            )
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _wrap_endpoint(
+        endpoint: Callable[..., Any],
+        encoder: Encoder,
+        status_code: int | None,
+    ) -> Callable[..., Any]:
+        signature = get_typed_signature(endpoint)
+        params = list(signature.parameters.values())
+        declared_param = next(
+            (
+                param.name
+                for param in params
+                if lenient_issubclass(param.annotation, Response)
+            ),
+            None,
+        )
+        # Ask for the response FastAPI merges headers and status code from,
+        # since they have to be copied onto the one returned here.
+        injected = declared_param is None
+        response_param = declared_param or "_freeauth_sub_response"
+        if injected:
+            params.append(
+                inspect.Parameter(
+                    response_param,
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Response,
+                )
+            )
+        is_coroutine = inspect.iscoroutinefunction(endpoint)
+
+        @functools.wraps(endpoint)
+        async def wrapper(**values: Any) -> Any:
+            sub_response: Response = (
+                values.pop(response_param)
+                if injected
+                else values[response_param]
+            )
+            if is_coroutine:
+                result = await endpoint(**values)
+            else:
+                result = await run_in_threadpool(endpoint, **values)
+            if isinstance(result, Response):
+                return result
+            response = FastJSONResponse(
+                encoder(result),
+                status_code=sub_response.status_code or status_code or 200,
+            )
+            response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        wrapper.__signature__ = signature.replace(  # type: ignore
+            parameters=params, return_annotation=inspect.Signature.empty
+        )
+        return wrapper
@@ -12,16 +12,23 @@
 from __future__ import annotations
 
 import json
+import uuid
 from http import HTTPStatus
 
 import pytest
 from fastapi import Depends, Response
 
 from freeauth.conf.login_settings import LoginSettings
+from freeauth.db.admin.admin_qry_async_edgeql import (
+    create_application,
+    delete_permission,
+)
 from freeauth.db.auth.auth_qry_async_edgeql import (
+    GetCurrentUserResult,
     GetUserByAccessTokenResult,
     sign_in,
-    sign_up,
+    sign_up_and_sign_in,
+    upsert_login_setting,
 )
 from freeauth.ext.fastapi_ext.utils import get_client_info
 
@@ -42,6 +49,46 @@ def test_auth_app_db(app, auth_app, test_client):
     assert resp.json() == ["1", "2", "3"]
 
 
+def test_init_app_data(app, auth_app, test_client):
+    auth_app.security.add_perm("read", "write")
+
+    async def perm_codes() -> list[str]:
+        return await auth_app.db.query("""
+            select (
+                select Permission
+                filter .application.id = global current_app_id
+                order by .code
+            ).code
+            """)
+
+    @app.post("/init")
+    async def init_app_data() -> list[list[str]]:
+        application = await create_application(
+            auth_app.db, name="app", description=None, hashed_secret="secret"
+        )
+        auth_app.with_globals(current_app_id=application.id)
+        await auth_app.init_app_data()
+        created = await perm_codes()
+
+        await delete_permission(
+            auth_app.db,
+            ids=await auth_app.db.query("""
+                select (
+                    select Permission
+                    filter .application.id = global current_app_id
+                    and .code = 'write'
+                ).id
+                """),
+        )
+        deleted = await perm_codes()
+        await auth_app.init_app_data()
+        return [created, deleted, await perm_codes()]
+
+    resp = test_client.post("/init")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+    assert resp.json() == [["read", "write"], ["read"], ["read", "write"]]
+
+
 def test_get_login_settings(app, auth_app, test_client):
     @app.get("/login_settings", response_model=LoginSettings)
     async def login_settings(
@@ -49,10 +96,22 @@ def test_get_login_settings(app, auth_app, test_client):
     ) -> LoginSettings:
         return settings
 
+    @app.put("/login_settings")
+    async def put_login_settings() -> None:
+        # saved without invalidating the cache, as another process would
+        await upsert_login_setting(
+            auth_app.db, configs=json.dumps({"jwt_token_ttl": 60})
+        )
+
     resp = test_client.get("/login_settings")
     rv = resp.json()
 
     assert rv.keys() == LoginSettings.__fields__.keys()
+    assert rv["jwt_token_ttl"] != 60
+
+    test_client.put("/login_settings")
+    resp = test_client.get("/login_settings")
+    assert resp.json()["jwt_token_ttl"] == 60
 
 
 @pytest.fixture
@@ -62,8 +121,9 @@ def example_app(app, auth_app, test_client, faker):
         response: Response,
         client_info: dict = Depends(get_client_info),
     ):
-        ci = json.dumps(client_info)
-        user = await sign_up(
+        settings = await auth_app.get_login_settings()
+        jti = uuid.uuid4()
+        user = await sign_up_and_sign_in(
             auth_app.db,
             name=faker.name(),
             username=faker.user_name(),
@@ -71,14 +131,28 @@ def example_app(app, auth_app, test_client, faker):
             email=faker.email(),
             hashed_password="",
             reset_pwd_on_next_login=False,
-            client_info=ci,
+            client_info=json.dumps(client_info),
+            jti=jti,
         )
-        token = await auth_app.create_access_token(response, user.id)
+        token = auth_app.encode_access_token(settings, user.id, jti)
+        auth_app.set_access_token_cookie(response, token, settings)
+        return user
+
+    @app.post("/sign_in")
+    async def user_sign_in(
+        response: Response,
+        current_user: GetCurrentUserResult = Depends(
+            auth_app.current_user_or_401
+        ),
+        client_info: dict = Depends(get_client_info),
+    ):
+        jti = uuid.uuid4()
+        await auth_app.create_access_token(response, current_user.id, jti)
         return await sign_in(
             auth_app.db,
-            id=user.id,
-            access_token=token,
-            client_info=ci,
+            id=current_user.id,
+            jti=jti,
+            client_info=json.dumps(client_info),
         )
 
     @app.get("/me")
@@ -90,7 +164,12 @@ def example_app(app, auth_app, test_client, faker):
         return current_user
 
 
-def test_get_current_user(example_app, test_client):
+def test_get_current_user(example_app, app, auth_app, test_client):
+    @app.post("/revoke")
+    async def revoke_tokens() -> None:
+        # revoked without touching the token cache, as another process would
+        await auth_app.db.query("update Token set { is_revoked := true }")
+
     resp = test_client.get("/me")
     error = resp.json()
     assert resp.status_code == HTTPStatus.UNAUTHORIZED, error
@@ -101,3 +180,33 @@ def test_get_current_user(example_app, test_client):
 
     resp = test_client.get("/me")
     assert resp.status_code == HTTPStatus.OK, resp.json()
+
+    resp = test_client.post("/sign_in")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+
+    resp = test_client.get("/me")
+    assert resp.status_code == HTTPStatus.OK, resp.json()
+
+    test_client.post("/revoke")
+    resp = test_client.get("/me")
+    assert resp.status_code == HTTPStatus.UNAUTHORIZED, resp.json()
+
+
+def test_encode_access_token(auth_app):
+    settings = LoginSettings()
+    user_id = uuid.uuid4()
+    jti = uuid.uuid4()
+
+    token = auth_app.encode_access_token(settings, user_id, jti)
+    payload = auth_app.decode_access_token(token)
+    assert payload and payload["sub"] == str(user_id)
+    assert auth_app.verify_access_token(token) == payload
+    assert auth_app.token_cache.get(token) == payload
+    assert auth_app.verify_access_token("invalid token") is None
+    assert auth_app.token_jti(payload) == jti
+    assert auth_app.is_token_subject(payload, user_id)
+    assert not auth_app.is_token_subject(payload, uuid.uuid4())
+
+    # tokens signed before they had a jti
+    assert auth_app.token_jti({"sub": str(user_id)}) is None
+    assert not auth_app.is_token_subject({}, user_id)
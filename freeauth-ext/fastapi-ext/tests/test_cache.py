@@ -0,0 +1,44 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+import time
+
+from freeauth.ext.fastapi_ext.cache import TokenCache
+
+
+def make_payload() -> dict:
+    return {"sub": "user", "exp": time.time() + 3600}
+
+
+def test_token_cache():
+    cache = TokenCache(maxsize=2)
+    payload = make_payload()
+    cache.set("a", payload)
+    assert cache.get("a") == payload
+    assert cache.get("b") is None
+
+    cache.set("b", make_payload())
+    cache.get("a")
+    cache.set("c", make_payload())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    cache.discard("a")
+    assert cache.get("a") is None
+    cache.clear()
+    assert cache.get("c") is None
+
+
+def test_token_cache_expiry():
+    cache = TokenCache()
+    cache.set("a", dict(make_payload(), exp=time.time() - 1))
+    assert cache.get("a") is None
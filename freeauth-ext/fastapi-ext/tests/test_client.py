@@ -0,0 +1,66 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import json
+import uuid
+
+import httpx
+
+from freeauth.ext.fastapi_ext import FreeAuthClient
+
+
+async def test_check_permissions():
+    app_id = uuid.uuid4()
+    user_id = uuid.uuid4()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        items = json.loads(request.content)["items"]
+        return httpx.Response(
+            200,
+            json=[
+                dict(
+                    user_id=item.get("user_id"),
+                    perm_code=item["perm_code"],
+                    allowed=item["perm_code"] == "read",
+                )
+                for item in items
+            ],
+        )
+
+    async with FreeAuthClient(
+        "http://freeauth/v1",
+        app_id,
+        "secret",
+        transport=httpx.MockTransport(handler),
+    ) as client:
+        assert await client.check_permissions([]) == []
+        rv = await client.check_permissions(
+            [
+                (user_id, "read"),
+                (str(user_id), "write"),
+                ("token", "read"),
+            ]
+        )
+
+    assert rv == [True, False, True]
+    (request,) = requests
+    assert request.url == "http://freeauth/v1/authz/check"
+    assert request.headers["authorization"].startswith("Basic ")
+    assert json.loads(request.content)["items"] == [
+        dict(user_id=str(user_id), perm_code="read"),
+        dict(user_id=str(user_id), perm_code="write"),
+        dict(access_token="token", perm_code="read"),
+    ]
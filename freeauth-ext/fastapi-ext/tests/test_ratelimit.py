@@ -0,0 +1,49 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import time
+
+from freeauth.ext.fastapi_ext import MemoryRateLimitBackend, RateLimiter
+
+
+async def test_rate_limiter(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    limiter = RateLimiter()
+    limits = {"account:a": 2, "ip:1.1.1.1": 3}
+
+    assert await limiter.hit(limits, 60)
+    assert await limiter.hit(limits, 60)
+    assert not await limiter.hit(limits, 60)
+    assert await limiter.exceeded(limits, 60)
+    # the IP still has room for another account
+    assert await limiter.hit({"account:b": 2, "ip:1.1.1.1": 3}, 60)
+    assert not await limiter.hit({"account:c": 2, "ip:1.1.1.1": 3}, 60)
+
+    now += 61
+    assert not await limiter.exceeded(limits, 60)
+    assert await limiter.hit(limits, 60)
+
+    await limiter.reset(limits)
+    assert await limiter.backend.count("account:a", 60) == 0
+
+
+async def test_memory_backend_maxsize():
+    backend = MemoryRateLimitBackend(maxsize=2)
+    for key in ["a", "b", "c"]:
+        await backend.add(key, 60)
+    assert await backend.count("a", 60) == 0
+    assert await backend.count("c", 60) == 1
+    backend.clear()
+    assert await backend.count("c", 60) == 0
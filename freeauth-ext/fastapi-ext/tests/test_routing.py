@@ -0,0 +1,156 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import json
+import uuid
+from http import HTTPStatus
+
+from fastapi import APIRouter, FastAPI, Response
+from fastapi.encoders import jsonable_encoder
+from starlette.testclient import TestClient
+
+from freeauth.db.auth.auth_qry_async_edgeql import (
+    FreeauthAuditEventType,
+    GetCurrentUserResult,
+    GetCurrentUserResultDepartmentsItem,
+    GetCurrentUserResultDepartmentsItemEnterprise,
+    GetCurrentUserResultOrgType,
+    GetCurrentUserResultRolesItem,
+    NoPydanticValidation,
+)
+from freeauth.ext.fastapi_ext.routing import (
+    FastJSONResponse,
+    FreeAuthRoute,
+    compile_encoder,
+)
+
+
+def make_user() -> GetCurrentUserResult:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    org_type = GetCurrentUserResultOrgType(
+        id=uuid.uuid4(), code="INNER", name="内部组织"
+    )
+    enterprise = GetCurrentUserResultDepartmentsItemEnterprise(
+        id=uuid.uuid4(), name="总公司"
+    )
+    return GetCurrentUserResult(
+        id=uuid.uuid4(),
+        name="张三",
+        username="user",
+        email="user@example.com",
+        mobile=None,
+        org_type=org_type,
+        departments=[
+            GetCurrentUserResultDepartmentsItem(
+                id=uuid.uuid4(),
+                code=None,
+                name="研发部",
+                enterprise=enterprise,
+                org_type=None,
+            )
+        ],
+        roles=[
+            GetCurrentUserResultRolesItem(
+                id=uuid.uuid4(),
+                name="管理员",
+                code="ADMIN",
+                description=None,
+                org_type=org_type,
+                is_deleted=False,
+                is_protected=True,
+                created_at=now,
+            )
+        ],
+        perms=["manage:users"],
+        is_deleted=False,
+        created_at=now,
+        last_login_at=None,
+        reset_pwd_on_next_login=False,
+    )
+
+
+def test_compile_encoder():
+    user = make_user()
+    assert compile_encoder(GetCurrentUserResult)(user) == jsonable_encoder(
+        user
+    )
+    assert compile_encoder(list[GetCurrentUserResult])(
+        [user]
+    ) == jsonable_encoder([user])
+    assert compile_encoder(GetCurrentUserResult | None)(None) is None
+    assert (
+        compile_encoder(FreeauthAuditEventType)(FreeauthAuditEventType.SIGNIN)
+        == "SignIn"
+    )
+    assert compile_encoder(GetCurrentUserResult) is compile_encoder(
+        GetCurrentUserResult
+    )
+
+
+@dataclasses.dataclass
+class TreeNode(NoPydanticValidation):
+    name: str
+    children: list[TreeNode]
+
+
+def test_compile_recursive_encoder():
+    tree = TreeNode("root", [TreeNode("leaf", [])])
+    assert compile_encoder(TreeNode)(tree) == jsonable_encoder(tree)
+
+
+def test_route():
+    user = make_user()
+    router = APIRouter(
+        route_class=FreeAuthRoute, default_response_class=FastJSONResponse
+    )
+
+    @router.get("/me")
+    async def get_me(response: Response) -> GetCurrentUserResult:
+        response.set_cookie("access_token", "token")
+        return user
+
+    @router.post("/users", status_code=HTTPStatus.CREATED)
+    def post_user() -> GetCurrentUserResult:
+        return user
+
+    @router.get("/ping")
+    async def ping() -> dict[str, str]:
+        return {"status": "Ok"}
+
+    # only the routes returning generated results take the fast path
+    assert router.routes[0].endpoint is not get_me
+    assert router.routes[2].endpoint is ping
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    resp = client.get("/me")
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == json.loads(json.dumps(jsonable_encoder(user)))
+    assert resp.cookies["access_token"] == "token"
+
+    resp = client.post("/users")
+    assert resp.status_code == HTTPStatus.CREATED
+    assert resp.json()["id"] == str(user.id)
+
+    resp = client.get("/ping")
+    assert resp.json() == {"status": "Ok"}
+
+    schema = app.openapi()["paths"]["/me"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/GetCurrentUserResult"
+    }
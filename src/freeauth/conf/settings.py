@@ -41,6 +41,12 @@ class Settings(BaseSettings):
     demo_code: str = "888888"
     demo_accounts: list[str] = []
 
+    # per-IP verification code limits are the per-account ones times this
+    code_rate_limit_ip_multiplier: int = 10
+    # validate listings passed through as EdgeDB's JSON, which parses every
+    # row; defaults to on only when testing
+    validate_json_responses: bool | None = None
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
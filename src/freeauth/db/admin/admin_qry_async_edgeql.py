@@ -15,14 +15,23 @@
 #     'src/freeauth/db/admin/queries/perms/delete_permission_tag.edgeql'
 #     'src/freeauth/db/admin/queries/roles/delete_role.edgeql'
 #     'src/freeauth/db/admin/queries/users/delete_user.edgeql'
+#     'src/freeauth/db/admin/queries/audit/export_audit_logs.edgeql'
+#     'src/freeauth/db/admin/queries/perms/export_permissions.edgeql'
+#     'src/freeauth/db/admin/queries/roles/export_roles.edgeql'
+#     'src/freeauth/db/admin/queries/users/export_users.edgeql'
 #     'src/freeauth/db/admin/queries/apps/get_application_by_id.edgeql'
 #     'src/freeauth/db/admin/queries/orgs/get_department_by_id_or_code.edgeql'
 #     'src/freeauth/db/admin/queries/orgs/get_enterprise_by_id_or_code.edgeql'
 #     'src/freeauth/db/admin/queries/orgs/get_org_type_by_id_or_code.edgeql'
-#     'src/freeauth/db/admin/queries/orgs/get_organization_node.edgeql'
+#     'src/freeauth/db/admin/queries/orgs/get_org_type_tree_version.edgeql'
+#     'src/freeauth/db/admin/queries/orgs/get_organization_tree.edgeql'
 #     'src/freeauth/db/admin/queries/perms/get_permission_by_id_or_code.edgeql'
 #     'src/freeauth/db/admin/queries/roles/get_role_by_id_or_code.edgeql'
 #     'src/freeauth/db/admin/queries/users/get_user_by_id.edgeql'
+#     'src/freeauth/db/admin/queries/users/get_user_import_refs.edgeql'
+#     'src/freeauth/db/admin/queries/users/import_users.edgeql'
+#     'src/freeauth/db/admin/queries/apps/init_app_data.edgeql'
+#     'src/freeauth/db/admin/queries/orgs/move_department.edgeql'
 #     'src/freeauth/db/admin/queries/orgs/organization_bind_users.edgeql'
 #     'src/freeauth/db/admin/queries/orgs/organization_unbind_users.edgeql'
 #     'src/freeauth/db/admin/queries/perms/perm_bind_roles.edgeql'
@@ -60,25 +69,38 @@ from __future__ import annotations
 import dataclasses
 import datetime
 import edgedb
+import enum
 import uuid
 
 
 class NoPydanticValidation:
+    __slots__ = ()
+
     @classmethod
     def __get_validators__(cls):
-        from pydantic.dataclasses import dataclass as pydantic_dataclass
-        pydantic_dataclass(cls)
-        cls.__pydantic_model__.__get_validators__ = lambda: []
+        if "__pydantic_model__" not in cls.__dict__:
+            from pydantic import dataclasses as pydantic_dataclasses
+            cls.__pydantic_model__ = None
+            model = pydantic_dataclasses.create_pydantic_model_from_dataclass(
+                cls
+            )
+            model.__try_update_forward_refs__(**{cls.__name__: cls})
+            model.__get_validators__ = lambda: []
+            cls.__pydantic_model__ = model
         return []
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class AddMissingPermissionsResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateApplicationResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "description", "is_deleted", "created_at")
+
     id: uuid.UUID
     name: str
     description: str | None
@@ -86,8 +108,10 @@ class CreateApplicationResult(NoPydanticValidation):
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateDepartmentResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "code", "description", "parent", "enterprise")
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -96,22 +120,37 @@ class CreateDepartmentResult(NoPydanticValidation):
     enterprise: CreateDepartmentResultEnterprise
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateDepartmentResultEnterprise(NoPydanticValidation):
+    __slots__ = ("id", "name", "code")
+
     id: uuid.UUID
     name: str
     code: str | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateDepartmentResultParent(NoPydanticValidation):
+    __slots__ = ("id", "name", "code")
+
     id: uuid.UUID
     name: str
     code: str | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateEnterpriseResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "tax_id",
+        "issuing_bank",
+        "bank_account_number",
+        "contact_address",
+        "contact_phone_num",
+    )
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -122,8 +161,17 @@ class CreateEnterpriseResult(NoPydanticValidation):
     contact_phone_num: str | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateOrgTypeResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "is_deleted",
+        "is_protected",
+    )
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -132,8 +180,20 @@ class CreateOrgTypeResult(NoPydanticValidation):
     is_protected: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreatePermissionResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "roles",
+        "application",
+        "tags",
+        "is_deleted",
+        "created_at",
+    )
+
     id: uuid.UUID
     name: str
     code: str
@@ -145,35 +205,54 @@ class CreatePermissionResult(NoPydanticValidation):
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreatePermissionResultApplication(NoPydanticValidation):
+    __slots__ = ("id", "name", "is_protected")
+
     id: uuid.UUID
     name: str
     is_protected: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreatePermissionResultRolesItem(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
     id: uuid.UUID
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreatePermissionResultTagsItem(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
     id: uuid.UUID
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreatePermissionTagResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "rank", "created_at")
+
     id: uuid.UUID
     name: str
     rank: int | None
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateRoleResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "org_type",
+        "is_deleted",
+        "is_protected",
+        "created_at",
+    )
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -184,15 +263,31 @@ class CreateRoleResult(NoPydanticValidation):
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateRoleResultOrgType(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateUserResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "username",
+        "email",
+        "mobile",
+        "org_type",
+        "departments",
+        "roles",
+        "is_deleted",
+        "created_at",
+        "last_login_at",
+    )
+
     id: uuid.UUID
     name: str | None
     username: str | None
@@ -206,63 +301,249 @@ class CreateUserResult(NoPydanticValidation):
     last_login_at: datetime.datetime | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateUserResultDepartmentsItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateUserResultRolesItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeleteApplicationResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeleteOrgTypeResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "code")
+
     id: uuid.UUID
     name: str
     code: str | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeleteOrganizationResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeletePermissionTagResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeleteRoleResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeleteUserResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "users",
+        "protected_admin_users",
+        "protected_admin_roles",
+    )
+
     id: uuid.UUID
     users: list[DeleteUserResultUsersItem]
     protected_admin_users: list[DeleteUserResultUsersItem]
     protected_admin_roles: list[CreatePermissionResultRolesItem]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class DeleteUserResultUsersItem(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
     id: uuid.UUID
     name: str | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
+class ExportAuditLogsResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "event_type",
+        "status_code",
+        "is_succeed",
+        "user",
+        "client_ip",
+        "os",
+        "device",
+        "browser",
+        "raw_ua",
+        "created_at",
+    )
+
+    id: uuid.UUID
+    event_type: FreeauthAuditEventType
+    status_code: FreeauthAuditStatusCode
+    is_succeed: bool
+    user: ExportAuditLogsResultUser
+    client_ip: str
+    os: str | None
+    device: str | None
+    browser: str | None
+    raw_ua: str | None
+    created_at: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportAuditLogsResultUser(NoPydanticValidation):
+    __slots__ = ("id", "name", "username", "email", "mobile")
+
+    id: uuid.UUID
+    name: str | None
+    username: str | None
+    email: str | None
+    mobile: str | None
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportPermissionsResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "application",
+        "tags",
+        "is_deleted",
+        "created_at",
+    )
+
+    id: uuid.UUID
+    name: str
+    code: str
+    description: str | None
+    application: ExportRolesResultPermissionsItemApplication
+    tags: list[CreatePermissionResultTagsItem]
+    is_deleted: bool
+    created_at: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportRolesResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "org_type",
+        "permissions",
+        "is_deleted",
+        "created_at",
+    )
+
+    id: uuid.UUID
+    name: str
+    code: str | None
+    description: str | None
+    org_type: CreateRoleResultOrgType | None
+    permissions: list[ExportRolesResultPermissionsItem]
+    is_deleted: bool
+    created_at: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportRolesResultPermissionsItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name", "application")
+
+    id: uuid.UUID
+    code: str
+    name: str
+    application: ExportRolesResultPermissionsItemApplication
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportRolesResultPermissionsItemApplication(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
+    id: uuid.UUID
+    name: str
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportUsersResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "username",
+        "email",
+        "mobile",
+        "org_type",
+        "departments",
+        "roles",
+        "is_deleted",
+        "created_at",
+        "last_login_at",
+    )
+
+    id: uuid.UUID
+    name: str | None
+    username: str | None
+    email: str | None
+    mobile: str | None
+    org_type: CreateRoleResultOrgType | None
+    departments: list[CreateUserResultDepartmentsItem]
+    roles: list[CreateUserResultRolesItem]
+    is_deleted: bool
+    created_at: datetime.datetime
+    last_login_at: datetime.datetime | None
+
+
+class FreeauthAuditEventType(enum.Enum):
+    SIGNIN = "SignIn"
+    SIGNOUT = "SignOut"
+    SIGNUP = "SignUp"
+    RESETPWD = "ResetPwd"
+    CHANGEPWD = "ChangePwd"
+
+
+class FreeauthAuditStatusCode(enum.Enum):
+    OK = "OK"
+    ACCOUNT_ALREADY_EXISTS = "ACCOUNT_ALREADY_EXISTS"
+    ACCOUNT_NOT_EXISTS = "ACCOUNT_NOT_EXISTS"
+    ACCOUNT_DISABLED = "ACCOUNT_DISABLED"
+    INVALID_PASSWORD = "INVALID_PASSWORD"
+    PASSWORD_ATTEMPTS_EXCEEDED = "PASSWORD_ATTEMPTS_EXCEEDED"
+    INVALID_CODE = "INVALID_CODE"
+    CODE_INCORRECT = "CODE_INCORRECT"
+    CODE_ATTEMPTS_EXCEEDED = "CODE_ATTEMPTS_EXCEEDED"
+    CODE_EXPIRED = "CODE_EXPIRED"
+
+
+@dataclasses.dataclass(frozen=True)
 class GetApplicationByIdResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "description",
+        "is_deleted",
+        "is_protected",
+        "created_at",
+    )
+
     id: uuid.UUID
     name: str
     description: str | None
@@ -271,8 +552,29 @@ class GetApplicationByIdResult(NoPydanticValidation):
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
-class GetOrganizationNodeResult(NoPydanticValidation):
+@dataclasses.dataclass(frozen=True)
+class GetOrgTypeTreeVersionResult(NoPydanticValidation):
+    __slots__ = ("id", "tree_version")
+
+    id: uuid.UUID
+    tree_version: int
+
+
+@dataclasses.dataclass(frozen=True)
+class GetOrganizationTreeResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "parent_id",
+        "is_enterprise",
+        "has_children",
+        "direct_member_count",
+        "member_count",
+        "descendant_count",
+    )
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -280,10 +582,25 @@ class GetOrganizationNodeResult(NoPydanticValidation):
     parent_id: uuid.UUID | None
     is_enterprise: bool
     has_children: bool
+    direct_member_count: int | None
+    member_count: int | None
+    descendant_count: int | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetPermissionByIdOrCodeResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "roles",
+        "application",
+        "tags",
+        "is_deleted",
+        "created_at",
+    )
+
     id: uuid.UUID
     name: str
     code: str
@@ -295,15 +612,27 @@ class GetPermissionByIdOrCodeResult(NoPydanticValidation):
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetPermissionByIdOrCodeResultApplication(NoPydanticValidation):
+    __slots__ = ("id", "name", "is_protected")
+
     id: uuid.UUID
     name: str
     is_protected: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetPermissionByIdOrCodeResultRolesItem(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "is_deleted",
+        "created_at",
+        "is_protected",
+    )
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -313,14 +642,30 @@ class GetPermissionByIdOrCodeResultRolesItem(NoPydanticValidation):
     is_protected: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetPermissionByIdOrCodeResultTagsItem(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
     id: uuid.UUID
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetUserByIdResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "username",
+        "email",
+        "mobile",
+        "org_type",
+        "departments",
+        "roles",
+        "is_deleted",
+        "created_at",
+        "last_login_at",
+    )
+
     id: uuid.UUID
     name: str | None
     username: str | None
@@ -334,8 +679,10 @@ class GetUserByIdResult(NoPydanticValidation):
     last_login_at: datetime.datetime | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetUserByIdResultDepartmentsItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name", "enterprise", "org_type")
+
     id: uuid.UUID
     code: str | None
     name: str
@@ -343,14 +690,75 @@ class GetUserByIdResultDepartmentsItem(NoPydanticValidation):
     org_type: GetUserByIdResultDepartmentsItemEnterprise | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetUserByIdResultDepartmentsItemEnterprise(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
     id: uuid.UUID
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
+class GetUserImportRefsResult(NoPydanticValidation):
+    __slots__ = ("id", "org_types", "organizations", "roles")
+
+    id: uuid.UUID
+    org_types: list[GetUserImportRefsResultOrgTypesItem]
+    organizations: list[GetUserImportRefsResultOrganizationsItem]
+    roles: list[GetUserImportRefsResultRolesItem]
+
+
+@dataclasses.dataclass(frozen=True)
+class GetUserImportRefsResultOrgTypesItem(NoPydanticValidation):
+    __slots__ = ("id", "code_upper")
+
+    id: uuid.UUID
+    code_upper: str | None
+
+
+@dataclasses.dataclass(frozen=True)
+class GetUserImportRefsResultOrganizationsItem(NoPydanticValidation):
+    __slots__ = ("id", "code_upper", "org_type_id")
+
+    id: uuid.UUID
+    code_upper: str | None
+    org_type_id: uuid.UUID | None
+
+
+@dataclasses.dataclass(frozen=True)
+class GetUserImportRefsResultRolesItem(NoPydanticValidation):
+    __slots__ = ("id", "code_upper", "org_type_id")
+
+    id: uuid.UUID
+    code_upper: str | None
+    org_type_id: uuid.UUID | None
+
+
+@dataclasses.dataclass(frozen=True)
+class MoveDepartmentResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "parent",
+        "enterprise",
+        "descendant_count",
+    )
+
+    id: uuid.UUID
+    name: str
+    code: str | None
+    description: str | None
+    parent: CreateDepartmentResultParent
+    enterprise: CreateDepartmentResultEnterprise
+    descendant_count: int
+
+
+@dataclasses.dataclass(frozen=True)
 class QueryApplicationOptionsResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "description", "is_deleted", "is_protected")
+
     id: uuid.UUID
     name: str
     description: str | None
@@ -358,8 +766,10 @@ class QueryApplicationOptionsResult(NoPydanticValidation):
     is_protected: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class QueryPermissionsResult(NoPydanticValidation):
+    __slots__ = ("id", "total", "per_page", "page", "last", "rows")
+
     id: uuid.UUID
     total: int
     per_page: int
@@ -368,8 +778,19 @@ class QueryPermissionsResult(NoPydanticValidation):
     rows: list[QueryPermissionsResultRowsItem]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class QueryPermissionsResultRowsItem(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "roles",
+        "application",
+        "tags",
+        "is_deleted",
+    )
+
     id: uuid.UUID
     name: str
     code: str
@@ -380,75 +801,100 @@ class QueryPermissionsResultRowsItem(NoPydanticValidation):
     is_deleted: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class QueryPermissionsResultRowsItemRolesItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class ResetUserPasswordResult(NoPydanticValidation):
+    __slots__ = ("id", "username", "email")
+
     id: uuid.UUID
     username: str | None
     email: str | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class RoleUnbindUsersResult(NoPydanticValidation):
+    __slots__ = ("id", "unbind_users", "protected_admin_roles")
+
     id: uuid.UUID
     unbind_users: list[CreateUserResult]
     protected_admin_roles: list[CreateRoleResult]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdateApplicationStatusResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "is_deleted")
+
     id: uuid.UUID
     name: str
     is_deleted: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdateOrgTypeStatusResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "code", "is_deleted")
+
     id: uuid.UUID
     name: str
     code: str | None
     is_deleted: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdatePermissionStatusResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "code", "is_deleted")
+
     id: uuid.UUID
     name: str
     code: str
     is_deleted: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdateRoleStatusResult(NoPydanticValidation):
+    __slots__ = ("id", "name", "code", "is_deleted")
+
     id: uuid.UUID
     name: str
     code: str | None
     is_deleted: bool
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdateUserRolesResult(NoPydanticValidation):
+    __slots__ = ("id", "user", "protected_admin_roles")
+
     id: uuid.UUID
     user: CreateUserResult | None
     protected_admin_roles: list[CreateRoleResult]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdateUserStatusResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "users",
+        "protected_admin_users",
+        "protected_admin_roles",
+    )
+
     id: uuid.UUID
     users: list[UpdateUserStatusResultUsersItem]
     protected_admin_users: list[UpdateUserStatusResultUsersItem]
     protected_admin_roles: list[CreatePermissionResultRolesItem]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpdateUserStatusResultUsersItem(NoPydanticValidation):
+    __slots__ = ("id", "name", "is_deleted")
+
     id: uuid.UUID
     name: str | None
     is_deleted: bool
@@ -533,7 +979,11 @@ async def create_department(
             enterprise := assert_single((
                 select Enterprise
                 filter .id = parent[is Enterprise].id ?? parent[is Department].enterprise.id
-            ))
+            )),
+            tree_version := (
+                update enterprise.org_type
+                set { tree_version := .tree_version + 1 }
+            )
         for _ in (
             select true filter exists parent
         ) union (
@@ -586,6 +1036,10 @@ async def create_enterprise(
             module freeauth,
             org_type := (
                 select OrganizationType filter .id = <uuid>$org_type_id
+            ),
+            tree_version := (
+                update org_type
+                set { tree_version := .tree_version + 1 }
             )
         for _ in (
             select true filter exists org_type
@@ -813,19 +1267,33 @@ async def create_user(
                             org_type in .ancestors
                         )
                     )
+            ),
+            tree_version := (
+                update org_type filter exists organizations
+                set { tree_version := .tree_version + 1 }
+            ),
+            user := (
+                insert User {
+                    name := name,
+                    username := username,
+                    email := email,
+                    mobile := mobile,
+                    hashed_password := hashed_password,
+                    org_type := org_type,
+                    directly_organizations := organizations,
+                    member_organizations := distinct (
+                        organizations union organizations.ancestors
+                    ),
+                    reset_pwd_on_next_login := reset_pwd_on_first_login
+                }
+            ),
+            search_tokens := (
+                for token in distinct search_ngrams({name, username, email, mobile})
+                union (
+                    insert SearchToken { token := token, user := user }
+                )
             )
-        select (
-            insert User {
-                name := name,
-                username := username,
-                email := email,
-                mobile := mobile,
-                hashed_password := hashed_password,
-                org_type := org_type,
-                directly_organizations := organizations,
-                reset_pwd_on_next_login := reset_pwd_on_first_login
-            }
-        ) {
+        select user {
             name,
             username,
             email,
@@ -872,10 +1340,19 @@ async def delete_org_type(
 ) -> list[DeleteOrgTypeResult]:
     return await executor.query(
         """\
-        select (
-            delete freeauth::OrganizationType
-            filter .id in array_unpack(<array<uuid>>$ids) and not .is_protected
-        ) { name, code };\
+        with
+            module freeauth,
+            org_types := (
+                select OrganizationType
+                filter .id in array_unpack(<array<uuid>>$ids) and not .is_protected
+            ),
+            users := (
+                update org_types.roles.users
+                set {
+                    permissions := distinct (.roles except org_types.roles).permissions
+                }
+            )
+        select (delete org_types) { name, code };\
         """,
         ids=ids,
     )
@@ -888,7 +1365,33 @@ async def delete_organization(
 ) -> list[DeleteOrganizationResult]:
     return await executor.query(
         """\
-        delete freeauth::Organization filter .id in array_unpack(<array<uuid>>$ids);\
+        with
+            module freeauth,
+            organizations := (
+                select Organization filter .id in array_unpack(<array<uuid>>$ids)
+            ),
+            deleted := organizations union organizations.children,
+            tree_version := (
+                update OrganizationType
+                filter
+                    OrganizationType in organizations.ancestors and
+                    OrganizationType not in organizations
+                set { tree_version := .tree_version + 1 }
+            ),
+            affected_members := (
+                update deleted.users
+                set {
+                    member_organizations := distinct (
+                        for org in (
+                            select .directly_organizations
+                            filter .id not in deleted.id
+                        ) union (
+                            org union org.ancestors
+                        )
+                    )
+                }
+            )
+        delete organizations;\
         """,
         ids=ids,
     )
@@ -927,8 +1430,19 @@ async def delete_role(
 ) -> list[DeleteRoleResult]:
     return await executor.query(
         """\
-        delete freeauth::Role
-        filter .id in array_unpack(<array<uuid>>$ids) and not .is_protected;\
+        with
+            module freeauth,
+            roles := (
+                select Role
+                filter .id in array_unpack(<array<uuid>>$ids) and not .is_protected
+            ),
+            users := (
+                update roles.users
+                set {
+                    permissions := distinct (.roles except roles).permissions
+                }
+            )
+        delete roles;\
         """,
         ids=ids,
     )
@@ -958,6 +1472,10 @@ async def delete_user(
                 filter
                     exists protected_admin_roles
                     and users.roles in protected_admin_roles
+            ),
+            tree_version := (
+                update (users except protected_admin_users).org_type
+                set { tree_version := .tree_version + 1 }
             )
         select {
             users := (
@@ -975,6 +1493,143 @@ async def delete_user(
     )
 
 
+async def export_audit_logs(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    after_created_at: datetime.datetime | None,
+    after_id: uuid.UUID | None,
+    since: datetime.datetime,
+    until: datetime.datetime,
+    limit: int,
+) -> list[ExportAuditLogsResult]:
+    return await executor.query(
+        """\
+        with
+            module freeauth,
+            after_created_at := <optional datetime>$after_created_at,
+            after_id := <optional uuid>$after_id
+        select AuditLog {
+            event_type,
+            status_code,
+            is_succeed,
+            user: { name, username, email, mobile },
+            client_ip,
+            os,
+            device,
+            browser,
+            raw_ua,
+            created_at
+        }
+        filter
+            .created_at >= (after_created_at ?? <datetime>$since)
+            and .created_at < <datetime>$until
+            and (
+                true if not exists after_created_at else
+                .created_at > after_created_at or .id > after_id
+            )
+        order by .created_at then .id
+        limit <int64>$limit;\
+        """,
+        after_created_at=after_created_at,
+        after_id=after_id,
+        since=since,
+        until=until,
+        limit=limit,
+    )
+
+
+async def export_permissions(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    after: uuid.UUID | None,
+    limit: int,
+) -> list[ExportPermissionsResult]:
+    return await executor.query(
+        """\
+        with
+            module freeauth,
+            after := <optional uuid>$after
+        select Permission {
+            name,
+            code,
+            description,
+            application: { name },
+            tags: { name },
+            is_deleted,
+            created_at
+        }
+        filter true if not exists after else .id > after
+        order by .id
+        limit <int64>$limit;\
+        """,
+        after=after,
+        limit=limit,
+    )
+
+
+async def export_roles(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    after: uuid.UUID | None,
+    limit: int,
+) -> list[ExportRolesResult]:
+    return await executor.query(
+        """\
+        with
+            module freeauth,
+            after := <optional uuid>$after
+        select Role {
+            name,
+            code,
+            description,
+            org_type: { code, name },
+            permissions: { code, name, application: { name } },
+            is_deleted,
+            created_at
+        }
+        filter true if not exists after else .id > after
+        order by .id
+        limit <int64>$limit;\
+        """,
+        after=after,
+        limit=limit,
+    )
+
+
+async def export_users(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    after: uuid.UUID | None,
+    limit: int,
+) -> list[ExportUsersResult]:
+    return await executor.query(
+        """\
+        with
+            module freeauth,
+            after := <optional uuid>$after
+        select User {
+            name,
+            username,
+            email,
+            mobile,
+            org_type: { code, name },
+            departments := (
+                select .directly_organizations { code, name }
+            ),
+            roles: { code, name },
+            is_deleted,
+            created_at,
+            last_login_at
+        }
+        filter true if not exists after else .id > after
+        order by .id
+        limit <int64>$limit;\
+        """,
+        after=after,
+        limit=limit,
+    )
+
+
 async def get_application_by_id(
     executor: edgedb.AsyncIOExecutor,
     *,
@@ -1110,20 +1765,55 @@ async def get_org_type_by_id_or_code(
     )
 
 
-async def get_organization_node(
+async def get_org_type_tree_version(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    org_type_id: uuid.UUID | None,
+    org_type_code: str | None,
+) -> GetOrgTypeTreeVersionResult | None:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            ot_id := <optional uuid>$org_type_id,
+            ot_code := <optional str>$org_type_code
+        select assert_single((
+            select OrganizationType { tree_version }
+            filter (.id ?= ot_id if exists ot_id else .code ?= ot_code)
+        ));\
+        """,
+        org_type_id=org_type_id,
+        org_type_code=org_type_code,
+    )
+
+
+async def get_organization_tree(
     executor: edgedb.AsyncIOExecutor,
     *,
     org_type_id: uuid.UUID | None,
     org_type_code: str | None,
     parent_id: uuid.UUID | None,
-) -> list[GetOrganizationNodeResult]:
+    depth: int | None,
+    with_counts: bool,
+) -> list[GetOrganizationTreeResult]:
     return await executor.query(
         """\
         with
             module freeauth,
             ot_id := <optional uuid>$org_type_id,
             ot_code := <optional str>$org_type_code,
-            parent_id := <optional uuid>$parent_id
+            parent_id := <optional uuid>$parent_id,
+            depth := <optional int64>$depth,
+            with_counts := <bool>$with_counts,
+            org_type := (
+                select OrganizationType
+                filter (.id ?= ot_id if exists ot_id else .code ?= ot_code)
+            ),
+            root := (
+                select Organization
+                filter .id = parent_id and org_type in .ancestors
+            ),
+            max_hierarchy := (root.hierarchy ?? 0) + depth
         select
             Organization {
                 name,
@@ -1131,18 +1821,26 @@ async def get_organization_node(
                 [is Department].description,
                 parent_id := [is Department].parent.id,
                 is_enterprise := Organization is Enterprise,
-                has_children := exists .directly_children
+                has_children := exists .directly_children,
+                direct_member_count := (
+                    count(.directly_users) if with_counts else <int64>{}
+                ),
+                member_count := count(.users) if with_counts else <int64>{},
+                descendant_count := count(.children) if with_counts else <int64>{}
             }
         filter (
-            [is Department].parent.id ?= parent_id if exists parent_id else
-            [is Enterprise].org_type.id ?= ot_id if exists ot_id else
-            ([is Enterprise].org_type.code = ot_code)
+            root in .ancestors if exists parent_id else
+            org_type in .ancestors
+        ) and (
+            .hierarchy <= max_hierarchy if exists depth else true
         )
-        order by .created_at;\
+        order by .hierarchy then .created_at;\
         """,
         org_type_id=org_type_id,
         org_type_code=org_type_code,
         parent_id=parent_id,
+        depth=depth,
+        with_counts=with_counts,
     )
 
 
@@ -1270,6 +1968,303 @@ async def get_user_by_id(
     )
 
 
+async def get_user_import_refs(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    org_type_codes: list[str],
+    organization_codes: list[str],
+    role_codes: list[str],
+) -> GetUserImportRefsResult:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            org_types := (
+                select OrganizationType
+                filter .code_upper in array_unpack(<array<str>>$org_type_codes)
+            )
+        select {
+            org_types := (
+                select org_types { code_upper }
+            ),
+            organizations := (
+                select Organization {
+                    code_upper,
+                    org_type_id := assert_single(.ancestors[is OrganizationType].id)
+                }
+                filter
+                    Organization is not OrganizationType and
+                    .code_upper in array_unpack(<array<str>>$organization_codes) and
+                    any(.ancestors in org_types)
+            ),
+            roles := (
+                select Role {
+                    code_upper,
+                    org_type_id := .org_type.id
+                }
+                filter .code_upper in array_unpack(<array<str>>$role_codes)
+            )
+        };\
+        """,
+        org_type_codes=org_type_codes,
+        organization_codes=organization_codes,
+        role_codes=role_codes,
+    )
+
+
+async def import_users(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    users: str,
+) -> list[int]:
+    return await executor.query(
+        """\
+        with
+            module freeauth,
+            items := json_array_unpack(<json>$users),
+            tree_version := (
+                update OrganizationType
+                filter OrganizationType in (
+                    select Organization
+                    filter .id in <uuid>json_array_unpack(items['organization_ids'])
+                ).ancestors
+                set { tree_version := .tree_version + 1 }
+            ),
+            rows := (
+                for item in items union (
+                    with
+                        name := <optional str>json_get(item, 'name'),
+                        username := <str>item['username'],
+                        email := <optional str>json_get(item, 'email'),
+                        mobile := <optional str>json_get(item, 'mobile'),
+                        org_type := (
+                            select OrganizationType
+                            filter .id = <optional uuid>json_get(item, 'org_type_id')
+                        ),
+                        organizations := (
+                            select Organization
+                            filter .id in <uuid>json_array_unpack(item['organization_ids'])
+                        ),
+                        roles := (
+                            select Role
+                            filter .id in <uuid>json_array_unpack(item['role_ids'])
+                        ),
+                        user := (
+                            insert User {
+                                name := name,
+                                username := username,
+                                email := email,
+                                mobile := mobile,
+                                hashed_password := <str>item['hashed_password'],
+                                reset_pwd_on_next_login := (
+                                    <bool>item['reset_pwd_on_next_login']
+                                ),
+                                org_type := org_type,
+                                directly_organizations := organizations,
+                                member_organizations := distinct (
+                                    organizations union organizations.ancestors
+                                ),
+                                roles := roles,
+                                permissions := distinct roles.permissions
+                            }
+                            unless conflict
+                        ),
+                        search_tokens := (
+                            for u in user union (
+                                for token in distinct search_ngrams(
+                                    {name, username, email, mobile}
+                                )
+                                union (
+                                    insert SearchToken { token := token, user := u }
+                                )
+                            )
+                        )
+                    select <int64>item['row'] filter exists user
+                )
+            )
+        select rows;\
+        """,
+        users=users,
+    )
+
+
+async def init_app_data(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    fingerprint: str,
+    perm_codes: list[str],
+) -> bool:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            fingerprint := <str>$fingerprint,
+            perm_codes := array_unpack(<array<str>>$perm_codes),
+            # A matching fingerprint isn't enough: permissions deleted or renamed
+            # since it was stored must be created again.
+            existing_codes := (
+                select Permission filter .application.id = global current_app_id
+            ).code,
+            missing_codes := (
+                select perm_codes filter perm_codes not in existing_codes
+            ),
+            # Claiming the application row serializes concurrent workers: the ones
+            # losing the race are retried and find the fingerprint up to date.
+            app := (
+                update Application
+                filter
+                    .id = global current_app_id
+                    and (
+                        .permissions_fingerprint ?!= fingerprint
+                        or exists missing_codes
+                    )
+                set {
+                    permissions_fingerprint := fingerprint
+                }
+            ),
+            initializing := exists app or not exists global current_app,
+            org_type := (
+                for _ in (1 if initializing else <int64>{})
+                union (
+                    insert OrganizationType {
+                        name := '内部组织',
+                        code := 'INNER',
+                        is_protected := true
+                    } unless conflict
+                )
+            ),
+            perms := (
+                for code in (perm_codes if exists app else <str>{})
+                union (
+                    insert Permission {
+                        name := code,
+                        code := code,
+                        application := app
+                    } unless conflict
+                )
+            )
+        select initializing;\
+        """,
+        fingerprint=fingerprint,
+        perm_codes=perm_codes,
+    )
+
+
+async def move_department(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    id: uuid.UUID | None,
+    current_code: str | None,
+    enterprise_id: uuid.UUID | None,
+    parent_id: uuid.UUID,
+) -> MoveDepartmentResult | None:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            id := <optional uuid>$id,
+            current_code := <optional str>$current_code,
+            enterprise_id := <optional uuid>$enterprise_id,
+            department := assert_single((
+                select Department
+                filter
+                    (.id = id) ??
+                    (
+                        .code ?= current_code and
+                        .enterprise.id = enterprise_id
+                    ) ??
+                    false
+            )),
+            parent := (
+                select Organization filter .id = <uuid>$parent_id
+            ),
+            enterprise := assert_single((
+                select Enterprise
+                filter
+                    .id = (
+                        parent[is Enterprise].id ?? parent[is Department].enterprise.id
+                    ) and
+                    .org_type = department.enterprise.org_type
+            )),
+            subtree := department union department.children,
+            old_ancestors := department.ancestors,
+            new_ancestors := distinct (parent union parent.ancestors),
+            is_movable := (
+                assert(
+                    department not in new_ancestors,
+                    message := "不能将部门移动到其自身或下级部门中"
+                ) and
+                exists enterprise
+            ),
+            moved_department := (
+                for _ in (select true filter is_movable) union (
+                    update department
+                    set {
+                        enterprise := enterprise,
+                        parent := parent,
+                        ancestors := new_ancestors
+                    }
+                )
+            ),
+            moved_descendants := (
+                for _ in (select true filter is_movable) union (
+                    update department.children[is Department]
+                    set {
+                        enterprise := enterprise,
+                        ancestors := distinct (
+                            (select .ancestors filter .id not in old_ancestors.id)
+                            union new_ancestors
+                        )
+                    }
+                )
+            ),
+            tree_version := (
+                for _ in (select true filter is_movable) union (
+                    update enterprise.org_type
+                    set { tree_version := .tree_version + 1 }
+                )
+            ),
+            moved_members := (
+                for _ in (select true filter is_movable) union (
+                    update subtree.directly_users
+                    set {
+                        member_organizations := distinct (
+                            for org in .directly_organizations union (
+                                org union (
+                                    (
+                                        (
+                                            select org.ancestors
+                                            filter .id not in old_ancestors.id
+                                        ) union new_ancestors
+                                    ) if org in subtree else org.ancestors
+                                )
+                            )
+                        )
+                    }
+                )
+            )
+        select moved_department {
+            name,
+            code,
+            description,
+            parent: {
+                name,
+                code
+            },
+            enterprise: {
+                name,
+                code,
+            },
+            descendant_count := count(moved_descendants)
+        };\
+        """,
+        id=id,
+        current_code=current_code,
+        enterprise_id=enterprise_id,
+        parent_id=parent_id,
+    )
+
+
 async def organization_bind_users(
     executor: edgedb.AsyncIOExecutor,
     *,
@@ -1299,6 +2294,10 @@ async def organization_bind_users(
                             org_type in .ancestors
                         )
                     )
+            ),
+            tree_version := (
+                update org_type filter exists organizations
+                set { tree_version := .tree_version + 1 }
             )
         select (
             update User filter
@@ -1309,7 +2308,10 @@ async def organization_bind_users(
                 )
             set {
                 org_type := org_type,
-                directly_organizations += organizations
+                directly_organizations += organizations,
+                member_organizations += distinct (
+                    organizations union organizations.ancestors
+                )
             }
         ) {
             name,
@@ -1347,6 +2349,11 @@ async def organization_unbind_users(
             organizations := (
                 select Organization
                 filter .id in array_unpack(organization_ids)
+            ),
+            tree_version := (
+                update OrganizationType
+                filter OrganizationType in organizations.ancestors
+                set { tree_version := .tree_version + 1 }
             )
         select (
             update User filter .id in array_unpack(user_ids)
@@ -1356,10 +2363,24 @@ async def organization_unbind_users(
                     User.directly_organizations) != array_agg(organizations)
                 else {},
                 directly_organizations -= organizations,
+                member_organizations := distinct (
+                    for org in (
+                        select .directly_organizations
+                        filter .id not in organizations.id
+                    ) union (
+                        org union org.ancestors
+                    )
+                ),
                 roles -= .org_type.roles
                 if array_agg(
                     User.directly_organizations) = array_agg(organizations)
                 else {},
+                permissions := (
+                    distinct (.roles except .org_type.roles).permissions
+                )
+                if array_agg(
+                    User.directly_organizations) = array_agg(organizations)
+                else .permissions,
             }
         ) {
             name,
@@ -1392,14 +2413,21 @@ async def perm_bind_roles(
         with
             module freeauth,
             role_ids := <array<uuid>>$role_ids,
-            permission_ids := <array<uuid>>$permission_ids
+            permission_ids := <array<uuid>>$permission_ids,
+            roles := (select Role filter .id in array_unpack(role_ids)),
+            perms := (
+                select Permission filter .id in array_unpack(permission_ids)
+            ),
+            users := (
+                update roles.users
+                set {
+                    permissions += perms
+                }
+            )
         select (
-            update Role filter .id in array_unpack(role_ids)
+            update roles
             set {
-                permissions += (
-                    select Permission
-                    filter .id in array_unpack(permission_ids)
-                )
+                permissions += perms
             }
         ) {
             name,
@@ -1430,14 +2458,26 @@ async def perm_unbind_roles(
         with
             module freeauth,
             role_ids := <array<uuid>>$role_ids,
-            permission_ids := <array<uuid>>$permission_ids
+            permission_ids := <array<uuid>>$permission_ids,
+            roles := (select Role filter .id in array_unpack(role_ids)),
+            perms := (
+                select Permission filter .id in array_unpack(permission_ids)
+            ),
+            users := (
+                update roles.users
+                set {
+                    permissions := distinct (
+                        for role in .roles union (
+                            select role.permissions
+                            filter role not in roles or .id not in perms.id
+                        )
+                    )
+                }
+            )
         select (
-            update Role filter .id in array_unpack(role_ids)
+            update roles
             set {
-                permissions -= (
-                    select Permission
-                    filter .id in array_unpack(permission_ids)
-                )
+                permissions -= perms
             }
         ) {
             name,
@@ -1659,14 +2699,20 @@ async def resign_user(
                 filter
                     exists protected_admin_roles
                     and users.roles in protected_admin_roles
+            ),
+            tree_version := (
+                update (users except protected_admin_users).org_type
+                set { tree_version := .tree_version + 1 }
             )
         select {
             users := (
                 update users except protected_admin_users
                 set {
                     directly_organizations := {},
+                    member_organizations := {},
                     org_type := {},
                     roles := {},
+                    permissions := {},
                     deleted_at := (
                         datetime_of_transaction() if is_deleted else .deleted_at
                     )
@@ -1698,18 +2744,25 @@ async def role_bind_users(
             user_ids := <array<uuid>>$user_ids,
             role_ids := <array<uuid>>$role_ids
         select (
-            update User filter .id in array_unpack(user_ids)
-            set {
-                roles += (
-                    select Role
-                    filter
-                        .id IN array_unpack(role_ids) and
-                        (
-                            not exists .org_type or
-                            .org_type ?= User.org_type
-                        )
-                )
-            }
+            for user in (
+                select User filter .id in array_unpack(user_ids)
+            ) union (
+                with
+                    roles := (
+                        select Role
+                        filter
+                            .id IN array_unpack(role_ids) and
+                            (
+                                not exists .org_type or
+                                .org_type ?= user.org_type
+                            )
+                    )
+                update user
+                set {
+                    roles += roles,
+                    permissions += roles.permissions
+                }
+            )
         ) {
             name,
             username,
@@ -1751,16 +2804,18 @@ async def role_unbind_users(
                     ( select .users filter not .is_deleted )
                     except users
                 )
+            ),
+            unbound_roles := (
+                select Role
+                filter .id in array_unpack(role_ids)
+                and Role not in protected_admin_roles
             )
         select {
             unbind_users := (
                 update users
                 set {
-                    roles -= (
-                        select Role
-                        filter .id in array_unpack(role_ids)
-                        and Role not in protected_admin_roles
-                    )
+                    roles -= unbound_roles,
+                    permissions := distinct (.roles except unbound_roles).permissions
                 }
             ) {
                 name,
@@ -1906,7 +2961,14 @@ async def update_department(
                         .enterprise.id = enterprise_id
                     ) ??
                     false
-            ))
+            )),
+            tree_version := (
+                update OrganizationType
+                filter OrganizationType in (
+                    department.enterprise.org_type union enterprise.org_type
+                )
+                set { tree_version := .tree_version + 1 }
+            )
         select (
             update department
             set {
@@ -1978,7 +3040,11 @@ async def update_enterprise(
                         .org_type.code = org_type_code
                     ) ??
                     false
-            ))
+            )),
+            tree_version := (
+                update enterprise.org_type
+                set { tree_version := .tree_version + 1 }
+            )
         select (
             UPDATE enterprise
             set {
@@ -2294,19 +3360,30 @@ async def update_user(
     return await executor.query_single(
         """\
         with
+            module freeauth,
             name := <str>$name,
             username := <str>$username,
             email := <optional str>$email,
-            mobile := <optional str>$mobile
-        select (
-            update freeauth::User filter .id = <uuid>$id
-            set {
-                name := name,
-                username := username,
-                email := email,
-                mobile := mobile
-            }
-        ) {
+            mobile := <optional str>$mobile,
+            user := (
+                update User filter .id = <uuid>$id
+                set {
+                    name := name,
+                    username := username,
+                    email := email,
+                    mobile := mobile
+                }
+            ),
+            stale_search_tokens := (delete user.search_tokens),
+            search_tokens := (
+                for u in user union (
+                    for token in distinct search_ngrams({name, username, email, mobile})
+                    union (
+                        insert SearchToken { token := token, user := u }
+                    )
+                )
+            )
+        select user {
             name,
             username,
             email,
@@ -2346,23 +3423,32 @@ async def update_user_organization(
                 user.org_type ?? (
                     select OrganizationType filter .id = org_type_id
                 )
+            ),
+            organizations := (
+                select Organization
+                filter
+                    ( Organization is not OrganizationType )
+                    and (
+                        false if not exists org_type else
+                        (
+                            .id in array_unpack(
+                                <array<uuid>>$organization_ids
+                            )
+                            and org_type in .ancestors
+                        )
+                    )
+            ),
+            tree_version := (
+                update OrganizationType
+                filter OrganizationType in (org_type union user.org_type)
+                set { tree_version := .tree_version + 1 }
             )
         select (
             update user filter .id = <uuid>$id
             set {
-                directly_organizations := (
-                    select Organization
-                    filter
-                        ( Organization is not OrganizationType )
-                        and (
-                            false if not exists org_type else
-                            (
-                                .id in array_unpack(
-                                    <array<uuid>>$organization_ids
-                                )
-                                and org_type in .ancestors
-                            )
-                        )
+                directly_organizations := organizations,
+                member_organizations := distinct (
+                    organizations union organizations.ancestors
                 ),
                 org_type := org_type
             }
@@ -2422,7 +3508,10 @@ async def update_user_roles(
             user := (
                 update user
                 set {
-                    roles := roles union protected_admin_roles
+                    roles := roles union protected_admin_roles,
+                    permissions := distinct (
+                        roles union protected_admin_roles
+                    ).permissions
                 }
             ) {
                 name,
@@ -1,20 +1,27 @@
 # AUTOGENERATED FROM:
+#     'src/freeauth/db/auth/queries/check_permissions.edgeql'
 #     'src/freeauth/db/auth/queries/create_audit_log.edgeql'
+#     'src/freeauth/db/auth/queries/get_application_secret.edgeql'
 #     'src/freeauth/db/auth/queries/get_current_user.edgeql'
 #     'src/freeauth/db/auth/queries/get_login_setting.edgeql'
 #     'src/freeauth/db/auth/queries/get_login_setting_by_key.edgeql'
+#     'src/freeauth/db/auth/queries/get_login_settings_version.edgeql'
 #     'src/freeauth/db/auth/queries/get_user_by_access_token.edgeql'
 #     'src/freeauth/db/auth/queries/get_user_by_account.edgeql'
 #     'src/freeauth/db/auth/queries/has_any_permission.edgeql'
+#     'src/freeauth/db/auth/queries/introspect_tokens.edgeql'
+#     'src/freeauth/db/auth/queries/record_pwd_failure.edgeql'
 #     'src/freeauth/db/auth/queries/send_code.edgeql'
 #     'src/freeauth/db/auth/queries/sign_in.edgeql'
 #     'src/freeauth/db/auth/queries/sign_out.edgeql'
 #     'src/freeauth/db/auth/queries/sign_up.edgeql'
+#     'src/freeauth/db/auth/queries/sign_up_and_sign_in.edgeql'
 #     'src/freeauth/db/auth/queries/update_profile.edgeql'
 #     'src/freeauth/db/auth/queries/update_pwd.edgeql'
 #     'src/freeauth/db/auth/queries/upsert_login_setting.edgeql'
 #     'src/freeauth/db/auth/queries/validate_account.edgeql'
 #     'src/freeauth/db/auth/queries/validate_code.edgeql'
+#     'src/freeauth/db/auth/queries/verify_code_and_sign_in.edgeql'
 # WITH:
 #     $ edgedb-py --target async --dir src/freeauth/db/auth --file src/freeauth/db/auth/auth_qry_async_edgeql.py
 
@@ -29,16 +36,47 @@ import uuid
 
 
 class NoPydanticValidation:
+    __slots__ = ()
+
     @classmethod
     def __get_validators__(cls):
-        from pydantic.dataclasses import dataclass as pydantic_dataclass
-        pydantic_dataclass(cls)
-        cls.__pydantic_model__.__get_validators__ = lambda: []
+        if "__pydantic_model__" not in cls.__dict__:
+            from pydantic import dataclasses as pydantic_dataclasses
+            cls.__pydantic_model__ = None
+            model = pydantic_dataclasses.create_pydantic_model_from_dataclass(
+                cls
+            )
+            model.__try_update_forward_refs__(**{cls.__name__: cls})
+            model.__get_validators__ = lambda: []
+            cls.__pydantic_model__ = model
         return []
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
+class CheckPermissionsResult(NoPydanticValidation):
+    __slots__ = ("id", "jtis", "access_tokens", "perm_codes")
+
+    id: uuid.UUID
+    jtis: list[uuid.UUID]
+    access_tokens: list[str]
+    perm_codes: list[str]
+
+
+@dataclasses.dataclass(frozen=True)
 class CreateAuditLogResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "client_ip",
+        "os",
+        "device",
+        "browser",
+        "status_code",
+        "is_succeed",
+        "event_type",
+        "created_at",
+        "user",
+    )
+
     id: uuid.UUID
     client_ip: str
     os: str | None
@@ -51,8 +89,10 @@ class CreateAuditLogResult(NoPydanticValidation):
     user: CreateAuditLogResultUser
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class CreateAuditLogResultUser(NoPydanticValidation):
+    __slots__ = ("id", "username", "mobile", "email")
+
     id: uuid.UUID
     username: str | None
     mobile: str | None
@@ -90,8 +130,32 @@ class FreeauthVerifyType(enum.Enum):
     SIGNUP = "SignUp"
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
+class GetApplicationSecretResult(NoPydanticValidation):
+    __slots__ = ("id", "hashed_secret")
+
+    id: uuid.UUID
+    hashed_secret: str | None
+
+
+@dataclasses.dataclass(frozen=True)
 class GetCurrentUserResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "username",
+        "email",
+        "mobile",
+        "org_type",
+        "departments",
+        "roles",
+        "perms",
+        "is_deleted",
+        "created_at",
+        "last_login_at",
+        "reset_pwd_on_next_login",
+    )
+
     id: uuid.UUID
     name: str | None
     username: str | None
@@ -107,8 +171,10 @@ class GetCurrentUserResult(NoPydanticValidation):
     reset_pwd_on_next_login: bool | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetCurrentUserResultDepartmentsItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name", "enterprise", "org_type")
+
     id: uuid.UUID
     code: str | None
     name: str
@@ -116,21 +182,36 @@ class GetCurrentUserResultDepartmentsItem(NoPydanticValidation):
     org_type: GetCurrentUserResultDepartmentsItemEnterprise | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetCurrentUserResultDepartmentsItemEnterprise(NoPydanticValidation):
+    __slots__ = ("id", "name")
+
     id: uuid.UUID
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetCurrentUserResultOrgType(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetCurrentUserResultRolesItem(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "code",
+        "description",
+        "org_type",
+        "is_deleted",
+        "is_protected",
+        "created_at",
+    )
+
     id: uuid.UUID
     name: str
     code: str | None
@@ -141,33 +222,88 @@ class GetCurrentUserResultRolesItem(NoPydanticValidation):
     created_at: datetime.datetime
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetLoginSettingResult(NoPydanticValidation):
+    __slots__ = ("id", "key", "value")
+
     id: uuid.UUID
     key: str
     value: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetUserByAccessTokenResult(NoPydanticValidation):
+    __slots__ = ("id", "access_token", "user")
+
     id: uuid.UUID
     access_token: str
     user: GetUserByAccessTokenResultUser
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetUserByAccessTokenResultUser(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class GetUserByAccountResult(NoPydanticValidation):
+    __slots__ = ("id", "is_deleted")
+
+    id: uuid.UUID
+    is_deleted: bool
+
+
+@dataclasses.dataclass(frozen=True)
+class IntrospectTokensResult(NoPydanticValidation):
+    __slots__ = ("id", "tokens", "users")
+
+    id: uuid.UUID
+    tokens: list[IntrospectTokensResultTokensItem]
+    users: list[IntrospectTokensResultUsersItem]
+
+
+@dataclasses.dataclass(frozen=True)
+class IntrospectTokensResultTokensItem(NoPydanticValidation):
+    __slots__ = ("id", "jti", "access_token", "is_revoked", "user")
+
+    id: uuid.UUID
+    jti: uuid.UUID | None
+    access_token: str | None
+    is_revoked: bool
+    user: GetUserByAccessTokenResultUser
+
+
+@dataclasses.dataclass(frozen=True)
+class IntrospectTokensResultUsersItem(NoPydanticValidation):
+    __slots__ = ("id", "is_deleted", "perm_codes")
+
     id: uuid.UUID
     is_deleted: bool
+    perm_codes: list[str]
+
+
+@dataclasses.dataclass(frozen=True)
+class RecordPwdFailureResult(NoPydanticValidation):
+    __slots__ = ("id", "failed_pwd_attempts")
+
+    id: uuid.UUID
+    failed_pwd_attempts: int | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class SendCodeResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "created_at",
+        "account",
+        "code_type",
+        "verify_type",
+        "expired_at",
+        "ttl",
+    )
+
     id: uuid.UUID
     created_at: datetime.datetime
     account: str
@@ -177,8 +313,22 @@ class SendCodeResult(NoPydanticValidation):
     ttl: int
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class SignInResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "name",
+        "username",
+        "email",
+        "mobile",
+        "org_type",
+        "departments",
+        "roles",
+        "is_deleted",
+        "created_at",
+        "last_login_at",
+    )
+
     id: uuid.UUID
     name: str | None
     username: str | None
@@ -192,32 +342,47 @@ class SignInResult(NoPydanticValidation):
     last_login_at: datetime.datetime | None
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class SignInResultDepartmentsItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class SignInResultRolesItem(NoPydanticValidation):
+    __slots__ = ("id", "code", "name")
+
     id: uuid.UUID
     code: str | None
     name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class SignOutResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class UpsertLoginSettingResult(NoPydanticValidation):
+    __slots__ = ("id",)
+
     id: uuid.UUID
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class ValidateAccountResult(NoPydanticValidation):
+    __slots__ = (
+        "id",
+        "hashed_password",
+        "is_deleted",
+        "recent_failed_attempts",
+    )
+
     id: uuid.UUID
     hashed_password: str | None
     is_deleted: bool
@@ -228,6 +393,69 @@ class ValidateCodeResult(typing.NamedTuple):
     status_code: FreeauthAuditStatusCode
 
 
+class VerifyCodeAndSignInResult(typing.NamedTuple):
+    status_code: FreeauthAuditStatusCode
+    user: SignInResult | None
+
+
+async def check_permissions(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    app_id: uuid.UUID,
+    perm_codes: list[str],
+    jtis: list[uuid.UUID],
+    access_tokens: list[str],
+    user_ids: list[uuid.UUID],
+) -> list[CheckPermissionsResult]:
+    return await executor.query(
+        """\
+        with
+            module freeauth,
+            app := (select Application filter .id = <uuid>$app_id),
+            perm_codes := distinct str_upper(
+                array_unpack(<array<str>>$perm_codes)
+            ),
+            tokens := (
+                select Token
+                filter
+                    (
+                        .jti in array_unpack(<array<uuid>>$jtis)
+                        or .access_token in array_unpack(<array<str>>$access_tokens)
+                    )
+                    and not .is_revoked
+            ),
+            users := (
+                select User
+                filter
+                    (
+                        .id in array_unpack(<array<uuid>>$user_ids)
+                        or .id in tokens.user.id
+                    )
+                    and not .is_deleted
+            )
+        select users {
+            jtis := (select tokens filter .user = users).jti,
+            access_tokens := (select tokens filter .user = users).access_token,
+            perm_codes := (
+                with
+                    user_perms := (
+                        select users.permissions filter .application = app
+                    )
+                select perm_codes
+                filter
+                    perm_codes in user_perms.code_upper
+                    or '*' in user_perms.code
+            )
+        };\
+        """,
+        app_id=app_id,
+        perm_codes=perm_codes,
+        jtis=jtis,
+        access_tokens=access_tokens,
+        user_ids=user_ids,
+    )
+
+
 async def create_audit_log(
     executor: edgedb.AsyncIOExecutor,
     *,
@@ -281,6 +509,20 @@ async def create_audit_log(
     )
 
 
+async def get_application_secret(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    id: uuid.UUID,
+) -> GetApplicationSecretResult | None:
+    return await executor.query_single(
+        """\
+        select freeauth::Application { hashed_secret }
+        filter .id = <uuid>$id and not .is_deleted;\
+        """,
+        id=id,
+    )
+
+
 async def get_current_user(
     executor: edgedb.AsyncIOExecutor,
 ) -> GetCurrentUserResult | None:
@@ -356,23 +598,39 @@ async def get_login_setting_by_key(
     )
 
 
+async def get_login_settings_version(
+    executor: edgedb.AsyncIOExecutor,
+) -> int:
+    return await executor.query_required_single(
+        """\
+        select max(freeauth::LoginSetting.version) ?? 0;\
+        """,
+    )
+
+
 async def get_user_by_access_token(
     executor: edgedb.AsyncIOExecutor,
     *,
     access_token: str,
+    jti: uuid.UUID | None,
 ) -> GetUserByAccessTokenResult | None:
     return await executor.query_single(
         """\
         with
+            access_token := <str>$access_token,
             token := (
                 select freeauth::Token
                 filter
-                    .access_token = <str>$access_token
+                    (
+                        (.jti = <optional uuid>$jti)
+                        ?? (.access_token = access_token)
+                    )
                     and .is_revoked = false
             )
-        select token { access_token, user };\
+        select token { access_token := access_token, user };\
         """,
         access_token=access_token,
+        jti=jti,
     )
 
 
@@ -386,16 +644,17 @@ async def get_user_by_account(
     return await executor.query_single(
         """\
         with
+            module freeauth,
             username := <optional str>$username,
             mobile := <optional str>$mobile,
             email := <optional str>$email
-        select
-            freeauth::User { id, is_deleted }
-        filter (
-            .username ?= username if exists username else
-            .mobile ?= mobile if exists mobile else
-            .email ?= email if exists email else false
-        )
+        select (
+            # One equality per exclusive column, so each branch is a single index
+            # probe; callers set only one of the arguments.
+            (select User filter .username = username) union
+            (select User filter .mobile = mobile) union
+            (select User filter .email = email)
+        ) { id, is_deleted }
         limit 1;\
         """,
         username=username,
@@ -433,6 +692,83 @@ async def has_any_permission(
     )
 
 
+async def introspect_tokens(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    app_id: uuid.UUID,
+    jtis: list[uuid.UUID],
+    access_tokens: list[str],
+) -> IntrospectTokensResult:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            app := (select Application filter .id = <uuid>$app_id),
+            tokens := (
+                select Token
+                filter
+                    .jti in array_unpack(<array<uuid>>$jtis)
+                    or .access_token in array_unpack(<array<str>>$access_tokens)
+            ),
+            users := (
+                select User filter .id in tokens.user.id
+            )
+        select {
+            tokens := tokens { jti, access_token, is_revoked, user },
+            users := users {
+                is_deleted,
+                perm_codes := (
+                    with
+                        user_perms := (
+                            select users.permissions filter .application = app
+                        )
+                    select distinct (
+                        (select Permission filter .application = app).code
+                        if '*' in user_perms.code else
+                        user_perms.code
+                    )
+                )
+            }
+        };\
+        """,
+        app_id=app_id,
+        jtis=jtis,
+        access_tokens=access_tokens,
+    )
+
+
+async def record_pwd_failure(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    interval: int,
+    id: uuid.UUID,
+) -> RecordPwdFailureResult | None:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            start_dt := datetime_of_statement() - cal::to_relative_duration(minutes := <int64>$interval)
+        select (
+            update User
+            filter .id = <uuid>$id
+            set {
+                failed_pwd_attempts := (
+                    .failed_pwd_attempts + 1
+                    if .first_failed_pwd_at >= start_dt else 1
+                ) ?? 1,
+                first_failed_pwd_at := (
+                    .first_failed_pwd_at
+                    if .first_failed_pwd_at >= start_dt else
+                    datetime_of_statement()
+                ) ?? datetime_of_statement()
+            }
+        ) { failed_pwd_attempts };\
+        """,
+        interval=interval,
+        id=id,
+    )
+
+
 async def send_code(
     executor: edgedb.AsyncIOExecutor,
     *,
@@ -508,7 +844,7 @@ async def sign_in(
     *,
     client_info: str,
     id: uuid.UUID,
-    access_token: str,
+    jti: uuid.UUID,
 ) -> SignInResult | None:
     return await executor.query_single(
         """\
@@ -520,11 +856,15 @@ async def sign_in(
             user := (
                 update User
                 filter .id = <uuid>$id
-                set { last_login_at := datetime_of_transaction() }
+                set {
+                    last_login_at := datetime_of_transaction(),
+                    failed_pwd_attempts := {},
+                    first_failed_pwd_at := {}
+                }
             ),
             token := (
                 insert Token {
-                    access_token := <str>$access_token,
+                    jti := <uuid>$jti,
                     user := user
                 }
             ),
@@ -557,26 +897,26 @@ async def sign_in(
         """,
         client_info=client_info,
         id=id,
-        access_token=access_token,
+        jti=jti,
     )
 
 
 async def sign_out(
     executor: edgedb.AsyncIOExecutor,
     *,
-    access_token: str,
+    id: uuid.UUID,
 ) -> SignOutResult | None:
     return await executor.query_single(
         """\
         update freeauth::Token
         filter
-            .access_token = <str>$access_token
+            .id = <uuid>$id
             and .is_revoked = false
         set {
             revoked_at := datetime_of_transaction()
         };\
         """,
-        access_token=access_token,
+        id=id,
     )
 
 
@@ -614,6 +954,12 @@ async def sign_up(
                     reset_pwd_on_next_login := reset_pwd_on_next_login
                 }
             ),
+            search_tokens := (
+                for token in distinct search_ngrams({name, username, email, mobile})
+                union (
+                    insert SearchToken { token := token, user := user }
+                )
+            ),
             audit_log := (
                 insert AuditLog {
                     client_ip := client_info.client_ip,
@@ -651,30 +997,132 @@ async def sign_up(
     )
 
 
+async def sign_up_and_sign_in(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    name: str | None,
+    username: str,
+    email: str | None,
+    mobile: str | None,
+    hashed_password: str,
+    reset_pwd_on_next_login: bool,
+    client_info: str,
+    jti: uuid.UUID,
+) -> SignInResult:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            name := <optional str>$name,
+            username := <str>$username,
+            email := <optional str>$email,
+            mobile := <optional str>$mobile,
+            hashed_password := <str>$hashed_password,
+            reset_pwd_on_next_login := <bool>$reset_pwd_on_next_login,
+            client_info := (
+                <tuple<client_ip: str, user_agent: json>><json>$client_info
+            ),
+            user := (
+                insert User {
+                    name := name,
+                    username := username,
+                    email := email,
+                    mobile := mobile,
+                    hashed_password := hashed_password,
+                    reset_pwd_on_next_login := reset_pwd_on_next_login,
+                    last_login_at := datetime_of_transaction()
+                }
+            ),
+            search_tokens := (
+                for token in distinct search_ngrams({name, username, email, mobile})
+                union (
+                    insert SearchToken { token := token, user := user }
+                )
+            ),
+            token := (
+                insert Token {
+                    jti := <uuid>$jti,
+                    user := user
+                }
+            ),
+            audit_logs := (
+                for event_type in {AuditEventType.SignUp, AuditEventType.SignIn}
+                union (
+                    insert AuditLog {
+                        client_ip := client_info.client_ip,
+                        event_type := event_type,
+                        status_code := AuditStatusCode.OK,
+                        raw_ua := <str>client_info.user_agent['raw_ua'],
+                        os := <str>client_info.user_agent['os'],
+                        device := <str>client_info.user_agent['device'],
+                        browser := <str>client_info.user_agent['browser'],
+                        user := user
+                    }
+                )
+            )
+        select user {
+            name,
+            username,
+            email,
+            mobile,
+            org_type: { code, name },
+            departments := (
+                select .directly_organizations { code, name }
+            ),
+            roles: { code, name },
+            is_deleted,
+            created_at,
+            last_login_at
+        };\
+        """,
+        name=name,
+        username=username,
+        email=email,
+        mobile=mobile,
+        hashed_password=hashed_password,
+        reset_pwd_on_next_login=reset_pwd_on_next_login,
+        client_info=client_info,
+        jti=jti,
+    )
+
+
 async def update_profile(
     executor: edgedb.AsyncIOExecutor,
     *,
-    id: uuid.UUID,
     name: str,
     username: str,
     email: str | None,
     mobile: str | None,
+    id: uuid.UUID,
 ) -> SignInResult | None:
     return await executor.query_single(
         """\
         with
             module freeauth,
+            name := <str>$name,
+            username := <str>$username,
+            email := <optional str>$email,
+            mobile := <optional str>$mobile,
             user := (
                 update User
                 filter
                     .id = <uuid>$id and not .is_deleted
                 set {
-                    name := <str>$name,
-                    username := <str>$username,
-                    email := <optional str>$email,
-                    mobile := <optional str>$mobile
+                    name := name,
+                    username := username,
+                    email := email,
+                    mobile := mobile
                 }
             ),
+            stale_search_tokens := (delete user.search_tokens),
+            search_tokens := (
+                for u in user union (
+                    for token in distinct search_ngrams({name, username, email, mobile})
+                    union (
+                        insert SearchToken { token := token, user := u }
+                    )
+                )
+            ),
         select user { 
             name,
             username,
@@ -690,11 +1138,11 @@ async def update_profile(
             last_login_at
         };\
         """,
-        id=id,
         name=name,
         username=username,
         email=email,
         mobile=mobile,
+        id=id,
     )
 
 
@@ -748,13 +1196,19 @@ async def upsert_login_setting(
 ) -> list[UpsertLoginSettingResult]:
     return await executor.query(
         """\
+        with
+            new_version := (max(freeauth::LoginSetting.version) ?? 0) + 1
         for x in json_object_unpack(<json>$configs)
         union (
             insert freeauth::LoginSetting {
                 key := x.0,
-                value := to_str(x.1)
+                value := to_str(x.1),
+                version := new_version
             } unless conflict on (.key) else (
-                update freeauth::LoginSetting set { value := to_str(x.1)}
+                update freeauth::LoginSetting set {
+                    value := to_str(x.1),
+                    version := new_version
+                }
             )
         );\
         """,
@@ -779,38 +1233,16 @@ async def validate_account(
             email := <optional str>$email,
             start_dt := datetime_of_statement() - cal::to_relative_duration(minutes := <optional int64>$interval),
             user := assert_single((
-                select User
-                filter
-                    (exists username and .username ?= username) or
-                    (exists mobile and .mobile ?= mobile) or
-                    (exists email and .email ?= email)
-            )),
-            recent_success_attempt := (
-                select AuditLog
-                filter
-                    .user = user
-                    and .event_type = AuditEventType.SignIn
-                    and .status_code = AuditStatusCode.OK
-                    and .created_at >= start_dt
-                order by .created_at desc
-                limit 1
-            ),
-            recent_failed_attempts := (
-                select AuditLog
-                filter
-                    .user = user
-                    and .event_type = AuditEventType.SignIn
-                    and .status_code = AuditStatusCode.INVALID_PASSWORD
-                    and (
-                        .created_at >= recent_success_attempt.created_at
-                        if exists recent_success_attempt else
-                        .created_at >= start_dt
-                    )
-            )
+                (select User filter .username = username) union
+                (select User filter .mobile = mobile) union
+                (select User filter .email = email)
+            ))
         select user {
             hashed_password,
             is_deleted,
-            recent_failed_attempts := count(recent_failed_attempts)
+            recent_failed_attempts := (
+                .failed_pwd_attempts if .first_failed_pwd_at >= start_dt else 0
+            ) ?? 0
         };\
         """,
         username=username,
@@ -890,3 +1322,137 @@ async def validate_code(
         code=code,
         max_attempts=max_attempts,
     )
+
+
+async def verify_code_and_sign_in(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    account: str,
+    code_type: FreeauthCodeType,
+    code: str,
+    max_attempts: int | None,
+    client_info: str,
+    jti: uuid.UUID,
+) -> VerifyCodeAndSignInResult:
+    return await executor.query_single(
+        """\
+        with
+            module freeauth,
+            account := <str>$account,
+            code_type := <CodeType>$code_type,
+            code := <str>$code,
+            max_attempts := <optional int64>$max_attempts,
+            client_info := (
+                <tuple<client_ip: str, user_agent: json>><json>$client_info
+            ),
+            user := assert_single((
+                (select User filter .mobile = account)
+                if code_type = CodeType.SMS else
+                (select User filter .email = account)
+            )),
+            active_user := (select user filter not .is_deleted),
+            # The code is only checked, and counted as attempted, for an account
+            # that is able to sign in.
+            consumable_record := (
+                select VerifyRecord
+                filter exists active_user
+                    and .account = account
+                    and .code_type = code_type
+                    and .verify_type = VerifyType.SignIn
+                    and .consumable
+                    and (.incorrect_attempts <= max_attempts) ?? true
+            ),
+            record := ( select consumable_record filter .code = code ),
+            valid_record := (
+                update record
+                filter .expired_at > datetime_of_transaction()
+                set {
+                    consumed_at := datetime_of_transaction()
+                }
+            ),
+            incorrect_record := (
+                update consumable_record
+                filter exists max_attempts and not exists record
+                set {
+                    incorrect_attempts := .incorrect_attempts + 1,
+                    expired_at := (
+                        datetime_of_transaction() if
+                        .incorrect_attempts = max_attempts - 1 else
+                        .expired_at
+                    )
+                }
+            ),
+            code_attempts_exceeded := any(
+                (incorrect_record.incorrect_attempts >= max_attempts) ?? false
+            ),
+            status_code := (
+                AuditStatusCode.ACCOUNT_NOT_EXISTS
+                if not exists user
+                else AuditStatusCode.ACCOUNT_DISABLED
+                if not exists active_user
+                else AuditStatusCode.INVALID_CODE
+                if not exists consumable_record
+                else AuditStatusCode.CODE_ATTEMPTS_EXCEEDED
+                if code_attempts_exceeded
+                else AuditStatusCode.CODE_INCORRECT
+                if not exists record
+                else AuditStatusCode.CODE_EXPIRED
+                if not exists valid_record
+                else AuditStatusCode.OK
+            ),
+            signed_in_user := (
+                update active_user
+                filter status_code = AuditStatusCode.OK
+                set {
+                    last_login_at := datetime_of_transaction(),
+                    failed_pwd_attempts := {},
+                    first_failed_pwd_at := {}
+                }
+            ),
+            token := (
+                for token_user in signed_in_user union (
+                    insert Token {
+                        jti := <uuid>$jti,
+                        user := token_user
+                    }
+                )
+            ),
+            audit_log := (
+                for audit_user in active_user union (
+                    insert AuditLog {
+                        client_ip := client_info.client_ip,
+                        event_type := AuditEventType.SignIn,
+                        status_code := status_code,
+                        raw_ua := <str>client_info.user_agent['raw_ua'],
+                        os := <str>client_info.user_agent['os'],
+                        device := <str>client_info.user_agent['device'],
+                        browser := <str>client_info.user_agent['browser'],
+                        user := audit_user
+                    }
+                )
+            )
+        select (
+            status_code := status_code,
+            user := signed_in_user {
+                name,
+                username,
+                email,
+                mobile,
+                org_type: { code, name },
+                departments := (
+                    select .directly_organizations { code, name }
+                ),
+                roles: { code, name },
+                is_deleted,
+                created_at,
+                last_login_at
+            }
+        );\
+        """,
+        account=account,
+        code_type=code_type,
+        code=code,
+        max_attempts=max_attempts,
+        client_info=client_info,
+        jti=jti,
+    )
@@ -0,0 +1,289 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import json
+import random
+import statistics
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import edgedb
+
+BENCH_DATABASE = "freeauth_bench"
+SEED_BATCH_SIZE = 1000
+
+EVENT_TYPES = ("SignIn", "SignOut", "SignUp", "ResetPwd", "ChangePwd")
+STATUS_CODES = ("OK", "INVALID_PASSWORD", "CODE_INCORRECT")
+
+
+@dataclasses.dataclass
+class Dataset:
+    user_ids: list[uuid.UUID]
+    accounts: list[str]
+    now: datetime.datetime
+
+
+@dataclasses.dataclass(frozen=True)
+class IndexBenchmark:
+    """A hot query timed with and without the index it relies on."""
+
+    type_name: str
+    index: str
+    query: str
+    make_args: Callable[[random.Random, Dataset], dict[str, Any]]
+
+    @property
+    def name(self) -> str:
+        return f"{self.type_name.split('::')[-1]} {self.index}"
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    name: str
+    with_index: float  # median in milliseconds
+    without_index: float
+
+    @property
+    def speedup(self) -> float:
+        return self.without_index / self.with_index
+
+
+INDEX_BENCHMARKS = [
+    IndexBenchmark(
+        "freeauth::AuditLog",
+        "(.event_type, .created_at)",
+        """\
+        select AuditLog { status_code, created_at }
+        filter .event_type = <AuditEventType><str>$event_type
+        order by .created_at desc
+        limit 20;\
+        """,
+        lambda rng, ds: dict(event_type=rng.choice(EVENT_TYPES)),
+    ),
+    IndexBenchmark(
+        "freeauth::AuditLog",
+        "(.user, .created_at)",
+        """\
+        select AuditLog { event_type, status_code, created_at }
+        filter .user.id = <uuid>$user_id
+        order by .created_at desc
+        limit 20;\
+        """,
+        lambda rng, ds: dict(user_id=rng.choice(ds.user_ids)),
+    ),
+    IndexBenchmark(
+        "freeauth::VerifyRecord",
+        "(.account, .code_type, .verify_type, .created_at)",
+        """\
+        select count((
+            select VerifyRecord
+            filter
+                .account = <str>$account
+                and .code_type = CodeType.SMS
+                and .verify_type = VerifyType.SignIn
+                and .created_at >= <datetime>$since
+        ));\
+        """,
+        lambda rng, ds: dict(
+            account=rng.choice(ds.accounts),
+            since=ds.now - datetime.timedelta(minutes=60),
+        ),
+    ),
+]
+
+
+def create_database(database: str, migrations_dir: Path, **connect_kwargs):
+    """Creates `database` with the schema of `migrations_dir` if missing.
+
+    :return: A client of the database, with `freeauth` as default module
+    """
+    default_cli = edgedb.create_client(database="edgedb", **connect_kwargs)
+    try:
+        databases = default_cli.query("select sys::Database.name")
+        exists = database in databases
+        if not exists:
+            default_cli.execute(f"create database {database}")
+    finally:
+        default_cli.close()
+
+    client = edgedb.create_client(database=database, **connect_kwargs)
+    if not exists:
+        for path in sorted(migrations_dir.glob("*.edgeql")):
+            client.execute(path.read_text())
+    return client.with_default_module("freeauth")
+
+
+def _insert_in_batches(
+    client: edgedb.Client, query: str, rows: list[dict[str, Any]]
+) -> list[Any]:
+    rv = []
+    for i in range(0, len(rows), SEED_BATCH_SIZE):
+        batch = rows[i : i + SEED_BATCH_SIZE]  # noqa: E203
+        rv.extend(client.query(query, rows=json.dumps(batch, default=str)))
+    return rv
+
+
+def seed(
+    client: edgedb.Client,
+    users: int,
+    logs_per_user: int,
+    codes_per_account: int,
+    rng: random.Random,
+) -> Dataset:
+    """Inserts a reproducible dataset: users with their audit history
+    spread over 90 days, and verification codes sent to their mobiles
+    over the last day.
+
+    :raises ValueError: If the database was already seeded, as a rerun
+        would conflict with the users of the previous one
+    """
+    if client.query("select User filter .username like 'bench_%' limit 1;"):
+        raise ValueError("database already seeded")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    prefix = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+    accounts = [f"1{rng.randrange(10**10):010d}" for _ in range(users)]
+    user_ids = _insert_in_batches(
+        client,
+        """\
+        for item in json_array_unpack(<json>$rows) union (
+            select (
+                insert User {
+                    username := <str>item['username'],
+                    mobile := <str>item['mobile']
+                }
+                unless conflict
+            ).id
+        );\
+        """,
+        [
+            dict(username=f"bench_{prefix}_{i}", mobile=account)
+            for i, account in enumerate(accounts)
+        ],
+    )
+
+    def ago(max_seconds: int) -> str:
+        return (
+            now - datetime.timedelta(seconds=rng.randrange(max_seconds))
+        ).isoformat()
+
+    _insert_in_batches(
+        client,
+        """\
+        for item in json_array_unpack(<json>$rows) union (
+            insert AuditLog {
+                user := (
+                    select User filter .id = <uuid>item['user_id']
+                ),
+                client_ip := <str>item['client_ip'],
+                event_type := <AuditEventType><str>item['event_type'],
+                status_code := <AuditStatusCode><str>item['status_code'],
+                created_at := <datetime><str>item['created_at']
+            }
+        );\
+        """,
+        [
+            dict(
+                user_id=user_id,
+                client_ip=f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+                event_type=rng.choice(EVENT_TYPES),
+                status_code=rng.choice(STATUS_CODES),
+                created_at=ago(90 * 86400),
+            )
+            for user_id in user_ids
+            for _ in range(logs_per_user)
+        ],
+    )
+    _insert_in_batches(
+        client,
+        """\
+        for item in json_array_unpack(<json>$rows) union (
+            with created_at := <datetime><str>item['created_at']
+            insert VerifyRecord {
+                account := <str>item['account'],
+                code := <str>item['code'],
+                code_type := CodeType.SMS,
+                verify_type := <VerifyType><str>item['verify_type'],
+                created_at := created_at,
+                expired_at := created_at + <duration>'10 minutes'
+            }
+        );\
+        """,
+        [
+            dict(
+                account=account,
+                code=f"{rng.randrange(10**6):06d}",
+                verify_type=rng.choice(("SignIn", "SignUp")),
+                created_at=ago(86400),
+            )
+            for account in accounts
+            for _ in range(codes_per_account)
+        ],
+    )
+    return Dataset(user_ids=user_ids, accounts=accounts, now=now)
+
+
+def load_dataset(client: edgedb.Client) -> Dataset:
+    """Loads the users inserted by a previous `seed`."""
+    users = client.query("""\
+        select User { mobile } filter .username like 'bench_%';\
+        """)
+    return Dataset(
+        user_ids=[user.id for user in users],
+        accounts=[user.mobile for user in users],
+        now=datetime.datetime.now(datetime.timezone.utc),
+    )
+
+
+def _time_query(
+    client: edgedb.Client, query: str, args: list[dict[str, Any]]
+) -> float:
+    client.query(query, **args[0])  # warm up
+    timings = []
+    for kwargs in args:
+        start = time.perf_counter()
+        client.query(query, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run_benchmarks(
+    client: edgedb.Client,
+    dataset: Dataset,
+    runs: int,
+    rng: random.Random,
+    benchmarks: list[IndexBenchmark] = INDEX_BENCHMARKS,
+) -> Iterator[BenchmarkResult]:
+    """Times each query with its index, then again after dropping it.
+
+    The index is recreated afterwards, so the schema is left unchanged.
+    """
+    for bench in benchmarks:
+        args = [bench.make_args(rng, dataset) for _ in range(runs)]
+        with_index = _time_query(client, bench.query, args)
+        client.execute(
+            f"alter type {bench.type_name} "
+            f"{{ drop index on ({bench.index}); }};"
+        )
+        try:
+            without_index = _time_query(client, bench.query, args)
+        finally:
+            client.execute(
+                f"alter type {bench.type_name} "
+                f"{{ create index on ({bench.index}); }};"
+            )
+        yield BenchmarkResult(bench.name, with_index, without_index)
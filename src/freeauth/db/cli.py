@@ -12,8 +12,12 @@
 from __future__ import annotations
 
 import os
+import random
 import string
 import subprocess
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 
 import edgedb
@@ -26,6 +30,22 @@ from freeauth.conf.settings import get_settings
 from freeauth.security.utils import gen_random_string, get_password_hash
 
 from .admin import admin_qry_edgeql
+from .benchmark import (
+    BENCH_DATABASE,
+    create_database,
+    load_dataset,
+    run_benchmarks,
+    seed,
+)
+from .exporting import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    EXPORTS,
+    AuditLogExporter,
+    export,
+    export_audit_logs,
+)
+from .importing import IMPORT_BATCH_SIZE, import_users
 
 app = typer.Typer(help="FreeAuth CLI")
 
@@ -239,5 +259,196 @@ def setup():
         print(table)
 
 
+@app.command("import-users")
+def import_users_command(
+    file: Path = typer.Argument(
+        ..., exists=True, dir_okay=False, help="CSV or NDJSON file"
+    ),
+    fmt: str = typer.Option(
+        None, "--format", help="csv or ndjson, guessed from the file suffix"
+    ),
+    batch_size: int = typer.Option(IMPORT_BATCH_SIZE, min=1),
+):
+    """
+    Importing users from a CSV or NDJSON file.
+    """
+    if not fmt:
+        fmt = (
+            "ndjson" if file.suffix.lower() in (".ndjson", ".jsonl") else "csv"
+        )
+    db = client.with_default_module("freeauth")
+
+    def read_chunks():
+        with file.open("rb") as f:
+            while chunk := f.read(64 * 1024):
+                yield chunk
+
+    with ThreadPoolExecutor() as executor:
+        result = import_users(
+            db, read_chunks(), fmt, executor, batch_size=batch_size
+        )
+    print(
+        f"[green][OK][/green] 共 {result.total} 行，"
+        f"成功导入 [cyan]{result.created}[/cyan] 个用户\n"
+    )
+    if result.errors:
+        print("以下行导入失败：")
+        table = Table("行号", "原因")
+        for error in result.errors:
+            table.add_row(str(error.row), error.message)
+        print(table)
+    if result.passwords:
+        print("以下用户未提供密码，已生成随机密码：")
+        table = Table("行号", "用户名", "密码")
+        for item in result.passwords:
+            table.add_row(str(item.row), item.username, item.password)
+        print(table)
+
+
+@app.command("export")
+def export_command(
+    kind: str = typer.Argument(..., help="users, roles or permissions"),
+    output: Path = typer.Option(
+        None, "--output", "-o", dir_okay=False, help="defaults to stdout"
+    ),
+    fmt: str = typer.Option("ndjson", "--format", help="ndjson or csv"),
+    chunk_size: int = typer.Option(EXPORT_CHUNK_SIZE, min=1),
+):
+    """
+    Exporting users, roles or permissions as NDJSON or CSV.
+    """
+    if kind not in EXPORTS:
+        raise typer.BadParameter(f"unknown kind: {kind}")
+    if fmt not in EXPORT_FORMATS:
+        raise typer.BadParameter(f"unsupported format: {fmt}")
+    db = client.with_default_module("freeauth")
+    with typer.open_file(
+        str(output) if output else "-", "w", encoding="utf-8"
+    ) as f:
+        for chunk in export(db, kind, fmt, chunk_size=chunk_size):
+            f.write(chunk)
+
+
+@app.command("export-audit-logs")
+def export_audit_logs_command(
+    since: datetime = typer.Option(..., help="inclusive, UTC if naive"),
+    until: datetime = typer.Option(..., help="exclusive, UTC if naive"),
+    output: Path = typer.Option(..., "--output", "-o", dir_okay=False),
+    fmt: str = typer.Option("csv", "--format", help="csv (gzipped) or ndjson"),
+    after_created_at: datetime = typer.Option(
+        None, help="resume after the log created at this time"
+    ),
+    after_id: uuid.UUID = typer.Option(
+        None, help="resume after the log with this ID"
+    ),
+    chunk_size: int = typer.Option(EXPORT_CHUNK_SIZE, min=1),
+):
+    """
+    Exporting audit logs of a time range as gzipped CSV or NDJSON.
+
+    When resuming, the export is appended to the output file. If the export
+    fails, the output file is cut back to the last complete chunk and the
+    cursor to resume from is printed.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise typer.BadParameter(f"unsupported format: {fmt}")
+    if (after_created_at is None) != (after_id is None):
+        raise typer.BadParameter(
+            "--after-created-at and --after-id must be given together"
+        )
+    exporter = AuditLogExporter(
+        fmt,
+        since,
+        until,
+        after=(after_created_at, after_id) if after_id else None,
+        chunk_size=chunk_size,
+    )
+    db = client.with_default_module("freeauth")
+    written = exporter.after
+    with output.open("ab" if exporter.after else "wb") as f:
+        size = f.tell()
+        try:
+            for chunk in export_audit_logs(db, exporter):
+                f.write(chunk)
+                f.flush()
+                size, written = f.tell(), exporter.after
+        except BaseException:
+            f.truncate(size)
+            if written:
+                created_at, id_ = written
+                print(
+                    "[red][FAILED][/red] 导出中断，可通过"
+                    f" --after-created-at {created_at.isoformat()}"
+                    f" --after-id {id_} 继续导出"
+                )
+            raise
+    if exporter.after:
+        created_at, id_ = exporter.after
+        print(
+            f"[green][OK][/green] 已导出至 {created_at.isoformat()}（{id_}）"
+        )
+    else:
+        print("[green][OK][/green] 该时间段内没有审计日志")
+
+
+@app.command("bench-indexes")
+def bench_indexes_command(
+    database: str = typer.Option(
+        BENCH_DATABASE, help="scratch database, created if missing"
+    ),
+    users: int = typer.Option(5000, min=1),
+    logs_per_user: int = typer.Option(100, min=1),
+    codes_per_account: int = typer.Option(20, min=1),
+    runs: int = typer.Option(200, min=1, help="timed runs per query"),
+    seed_: int = typer.Option(0, "--seed", help="random seed"),
+    skip_seeding: bool = typer.Option(
+        False, help="reuse the data seeded by a previous run"
+    ),
+):
+    """
+    Benchmarking the hot queries with and without their indexes.
+    """
+    if database == settings.edgedb_database:
+        raise typer.BadParameter("refusing to seed the configured database")
+    dir_ = find_edgedb_project_dir()
+    if not dir_:
+        return
+    db = create_database(
+        database,
+        Path(dir_) / "dbschema" / "migrations",
+        dsn=settings.edgedb_dsn or settings.edgedb_instance,
+        tls_ca_file=settings.edgedb_tls_ca_file,  # type: ignore[arg-type]
+        tls_ca=settings.edgedb_tls_ca,  # type: ignore[arg-type]
+    )
+    rng = random.Random(seed_)
+    try:
+        if skip_seeding:
+            dataset = load_dataset(db)
+        else:
+            print("正在生成测试数据...")
+            try:
+                dataset = seed(
+                    db, users, logs_per_user, codes_per_account, rng
+                )
+            except ValueError:
+                print(
+                    "[red][FAILED][/red] 数据库中已有测试数据，"
+                    "请使用 --skip-seeding 复用"
+                )
+                raise typer.Exit(code=1)
+
+        table = Table("索引", "有索引 (ms)", "无索引 (ms)", "加速比")
+        for result in run_benchmarks(db, dataset, runs, rng):
+            table.add_row(
+                result.name,
+                f"{result.with_index:.2f}",
+                f"{result.without_index:.2f}",
+                f"{result.speedup:.1f}x",
+            )
+        print(table)
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
     app()
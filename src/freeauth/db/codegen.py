@@ -0,0 +1,116 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+"""Post-processing of the query modules generated by ``edgedb-py``.
+
+The generated result types are plain dataclasses, each instance carrying
+a ``__dict__``. :func:`compact_result_types` rewrites them as frozen
+dataclasses with ``__slots__``, which is smaller and faster to read for
+results built in Python, e.g. by caches and tests, and makes it explicit
+that query results are read-only. Run it on the generated modules with::
+
+    python -m freeauth.db.codegen src/freeauth/db/*/*_edgeql.py
+
+``make genqlapi`` does so after each regeneration.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from pathlib import Path
+
+LINE_LENGTH = 79
+
+_BASE_CLASS = """\
+class NoPydanticValidation:
+    @classmethod
+    def __get_validators__(cls):
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+        pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+"""
+
+# ``pydantic_dataclass()`` re-creates the dataclass and wraps ``__init__``
+# to store state in the instance ``__dict__``, neither of which works on a
+# frozen slotted class, so only its schema model is built here, once per
+# class; the placeholder stops recursive types from building it forever.
+_COMPACT_BASE_CLASS = """\
+class NoPydanticValidation:
+    __slots__ = ()
+
+    @classmethod
+    def __get_validators__(cls):
+        if "__pydantic_model__" not in cls.__dict__:
+            from pydantic import dataclasses as pydantic_dataclasses
+            cls.__pydantic_model__ = None
+            model = pydantic_dataclasses.create_pydantic_model_from_dataclass(
+                cls
+            )
+            model.__try_update_forward_refs__(**{cls.__name__: cls})
+            model.__get_validators__ = lambda: []
+            cls.__pydantic_model__ = model
+        return []
+"""
+
+_RESULT_CLASS = re.compile(
+    r"^@dataclasses\.dataclass\n"
+    r"(class \w+\(NoPydanticValidation\):\n)"
+    r"((?:    \w+: .+\n)+)",
+    re.M,
+)
+
+
+def _slots(names: list[str]) -> str:
+    line = "    __slots__ = (%s)\n" % ", ".join(f'"{n}"' for n in names)
+    if len(names) == 1:
+        line = line.replace(")\n", ",)\n")
+    if len(line) <= LINE_LENGTH + 1:
+        return line
+    items = "".join(f'        "{name}",\n' for name in names)
+    return f"    __slots__ = (\n{items}    )\n"
+
+
+def _compact_class(match: re.Match) -> str:
+    header, fields = match.groups()
+    names = [line.split(":")[0].strip() for line in fields.splitlines()]
+    return (
+        "@dataclasses.dataclass(frozen=True)\n"
+        + header
+        + _slots(names)
+        + "\n"
+        + fields
+    )
+
+
+def compact_result_types(source: str) -> str:
+    """Make the result dataclasses of a generated module frozen and slotted.
+
+    Running it again on its own output changes nothing.
+    """
+    # Slots only save memory if every base class declares them too.
+    source = source.replace(_BASE_CLASS, _COMPACT_BASE_CLASS)
+    return _RESULT_CLASS.sub(_compact_class, source)
+
+
+def main(paths: list[str]) -> None:
+    for path in map(Path, paths):
+        source = path.read_text()
+        compacted = compact_result_types(source)
+        if compacted != source:
+            path.write_text(compacted)
+            print(f"Compacted result types in {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,368 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import csv
+import dataclasses
+import datetime
+import enum
+import gzip
+import io
+import json
+import uuid
+from typing import Any, AsyncIterator, Callable, Iterator
+
+import edgedb
+
+from .admin import admin_qry_async_edgeql, admin_qry_edgeql
+from .importing import CODE_SEPARATOR
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _join(values: Iterator[str | None]) -> str:
+    return CODE_SEPARATOR.join(v for v in values if v)
+
+
+def _flatten_user(user: Any) -> dict[str, Any]:
+    return dict(
+        organizations=_join(d.code for d in user.departments),
+        roles=_join(r.code for r in user.roles),
+    )
+
+
+def _flatten_role(role: Any) -> dict[str, Any]:
+    return dict(permissions=_join(p.code for p in role.permissions))
+
+
+def _flatten_permission(perm: Any) -> dict[str, Any]:
+    return dict(
+        application=perm.application.name,
+        tags=_join(t.name for t in perm.tags),
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class ExportSpec:
+    query: str
+    columns: tuple[str, ...]
+    flatten: Callable[[Any], dict[str, Any]]
+
+
+EXPORTS = {
+    "users": ExportSpec(
+        "export_users",
+        (
+            "id",
+            "name",
+            "username",
+            "email",
+            "mobile",
+            "org_type",
+            "organizations",
+            "roles",
+            "is_deleted",
+            "created_at",
+            "last_login_at",
+        ),
+        _flatten_user,
+    ),
+    "roles": ExportSpec(
+        "export_roles",
+        (
+            "id",
+            "name",
+            "code",
+            "description",
+            "org_type",
+            "permissions",
+            "is_deleted",
+            "created_at",
+        ),
+        _flatten_role,
+    ),
+    "permissions": ExportSpec(
+        "export_permissions",
+        (
+            "id",
+            "name",
+            "code",
+            "description",
+            "application",
+            "tags",
+            "is_deleted",
+            "created_at",
+        ),
+        _flatten_permission,
+    ),
+}
+
+
+def _flatten_audit_log(log: Any) -> dict[str, Any]:
+    return dict(
+        user_id=log.user.id,
+        user_name=log.user.name,
+        username=log.user.username,
+        email=log.user.email,
+        mobile=log.user.mobile,
+    )
+
+
+AUDIT_LOG_EXPORT = ExportSpec(
+    "export_audit_logs",
+    (
+        "id",
+        "created_at",
+        "event_type",
+        "status_code",
+        "is_succeed",
+        "user_id",
+        "user_name",
+        "username",
+        "email",
+        "mobile",
+        "client_ip",
+        "os",
+        "device",
+        "browser",
+        "raw_ua",
+    ),
+    _flatten_audit_log,
+)
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if dataclasses.is_dataclass(value):
+        # nested objects such as org_type are exported by their code
+        return getattr(value, "code", None) or ""
+    return value
+
+
+class ExportEncoder:
+    """Encodes query results into NDJSON lines or CSV rows.
+
+    CSV columns hold plain values: nested objects are exported by code and
+    lists are joined with semicolons, the same way the import accepts them.
+    """
+
+    def __init__(self, spec: ExportSpec, fmt: str) -> None:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.spec = spec
+        self.fmt = fmt
+
+    def header(self) -> str:
+        if self.fmt == "ndjson":
+            return ""
+        return self._write_csv([self.spec.columns])
+
+    def encode(self, records: list[Any]) -> str:
+        if self.fmt == "ndjson":
+            return "".join(
+                json.dumps(
+                    dataclasses.asdict(record),
+                    ensure_ascii=False,
+                    default=_json_default,
+                )
+                + "\n"
+                for record in records
+            )
+        rows = []
+        for record in records:
+            values = self.spec.flatten(record)
+            rows.append(
+                [
+                    _csv_value(
+                        values[column]
+                        if column in values
+                        else getattr(record, column)
+                    )
+                    for column in self.spec.columns
+                ]
+            )
+        return self._write_csv(rows)
+
+    @staticmethod
+    def _write_csv(rows: list[Any]) -> str:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue()
+
+
+async def export_async(
+    db: edgedb.AsyncIOExecutor,
+    kind: str,
+    fmt: str,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[str]:
+    """Streams all objects of `kind` ordered by ID.
+
+    Each chunk continues after the last ID of the previous one, so memory
+    stays constant and no chunk needs an OFFSET scan or a count.
+    """
+    spec = EXPORTS[kind]
+    query = getattr(admin_qry_async_edgeql, spec.query)
+    encoder = ExportEncoder(spec, fmt)
+    if header := encoder.header():
+        yield header
+    after = None
+    while True:
+        records = await query(db, after=after, limit=chunk_size)
+        if records:
+            yield encoder.encode(records)
+        if len(records) < chunk_size:
+            break
+        after = records[-1].id
+
+
+def export(
+    db: edgedb.Executor,
+    kind: str,
+    fmt: str,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """Same as `export_async()` with a blocking client."""
+    spec = EXPORTS[kind]
+    query = getattr(admin_qry_edgeql, spec.query)
+    encoder = ExportEncoder(spec, fmt)
+    if header := encoder.header():
+        yield header
+    after = None
+    while True:
+        records = query(db, after=after, limit=chunk_size)
+        if records:
+            yield encoder.encode(records)
+        if len(records) < chunk_size:
+            break
+        after = records[-1].id
+
+
+def _aware(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+class AuditLogExporter:
+    """Exports the audit logs created in [since, until) as bytes.
+
+    Logs are fetched in chunks ordered by (created_at, id), each chunk
+    continuing after the last log of the previous one. An interrupted
+    export resumes by passing the `created_at` and `id` of the last
+    received log as `after`; the CSV header is then omitted. CSV output is
+    gzip-compressed with every chunk as a complete gzip member, and since
+    concatenated gzip members are still a valid gzip file, a download cut
+    at a chunk boundary can be resumed by appending to it.
+
+    Naive datetimes are taken as UTC.
+    """
+
+    def __init__(
+        self,
+        fmt: str,
+        since: datetime.datetime,
+        until: datetime.datetime,
+        after: tuple[datetime.datetime, uuid.UUID] | None = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+    ) -> None:
+        self.encoder = ExportEncoder(AUDIT_LOG_EXPORT, fmt)
+        self.since = _aware(since)
+        self.until = _aware(until)
+        self.after = (_aware(after[0]), after[1]) if after else None
+        self.chunk_size = chunk_size
+        self.compressed = fmt == "csv"
+
+    @property
+    def media_type(self) -> str:
+        if self.compressed:
+            return "application/gzip"
+        return "application/x-ndjson"
+
+    @property
+    def filename(self) -> str:
+        ext = "csv.gz" if self.compressed else "ndjson"
+        return f"audit_logs_{self.since:%Y%m%d}_{self.until:%Y%m%d}.{ext}"
+
+    def query_args(self) -> dict[str, Any]:
+        after_created_at, after_id = self.after or (None, None)
+        return dict(
+            after_created_at=after_created_at,
+            after_id=after_id,
+            since=self.since,
+            until=self.until,
+            limit=self.chunk_size,
+        )
+
+    def header(self) -> bytes:
+        return b"" if self.after else self._compress(self.encoder.header())
+
+    def encode(self, records: list[Any]) -> bytes:
+        """Encodes a chunk and moves the cursor past it."""
+        self.after = (records[-1].created_at, records[-1].id)
+        return self._compress(self.encoder.encode(records))
+
+    def _compress(self, data: str) -> bytes:
+        encoded = data.encode("utf-8")
+        if self.compressed and encoded:
+            return gzip.compress(encoded)
+        return encoded
+
+
+async def export_audit_logs_async(
+    db: edgedb.AsyncIOExecutor, exporter: AuditLogExporter
+) -> AsyncIterator[bytes]:
+    yield exporter.header()
+    while True:
+        records = await admin_qry_async_edgeql.export_audit_logs(
+            db, **exporter.query_args()
+        )
+        if records:
+            yield exporter.encode(records)
+        if len(records) < exporter.chunk_size:
+            break
+
+
+def export_audit_logs(
+    db: edgedb.Executor, exporter: AuditLogExporter
+) -> Iterator[bytes]:
+    """Same as `export_audit_logs_async()` with a blocking client."""
+    yield exporter.header()
+    while True:
+        records = admin_qry_edgeql.export_audit_logs(
+            db, **exporter.query_args()
+        )
+        if records:
+            yield exporter.encode(records)
+        if len(records) < exporter.chunk_size:
+            break
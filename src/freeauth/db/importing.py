@@ -0,0 +1,408 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import csv
+import json
+import uuid
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Iterable
+
+import edgedb
+from pydantic import (
+    BaseModel,
+    Field,
+    ValidationError,
+    root_validator,
+    validator,
+)
+
+from freeauth.security.utils import gen_random_string, get_password_hash
+from freeauth.security.validators import MobileStr, UsernameStr
+
+from .admin import admin_qry_async_edgeql, admin_qry_edgeql
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_BATCH_SIZE = 500
+CODE_SEPARATOR = ";"
+
+
+class UserImportRow(BaseModel):
+    name: str | None = Field(None, max_length=50)
+    username: UsernameStr | None = None
+    email: str | None = Field(None, regex=r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+    mobile: MobileStr | None = None
+    password: str | None = None
+    org_type: str | None = None
+    organizations: list[str] = []
+    roles: list[str] = []
+    reset_pwd_on_first_login: bool = False
+
+    class Config:
+        anystr_strip_whitespace = True
+        error_msg_templates = {
+            "value_error.any_str.max_length": "最大支持的长度为50个字符",
+            "value_error.str.regex": "邮箱格式有误",
+        }
+
+    @validator("*", pre=True)
+    def empty_str_to_none(cls, v):
+        if v == "":
+            return None
+        return v
+
+    @validator("org_type")
+    def convert_to_uppercase(cls, v):
+        return v.upper() if v else v
+
+    @validator("organizations", "roles", pre=True)
+    def split_codes(cls, v):
+        if v is None:
+            return []
+        if isinstance(v, str):
+            v = v.split(CODE_SEPARATOR)
+        return [code.strip().upper() for code in v if code and code.strip()]
+
+    @root_validator(skip_on_failure=True)
+    def validate_username_or_email_or_mobile(cls, values):
+        if not (
+            values.get("username")
+            or values.get("email")
+            or values.get("mobile")
+        ):
+            raise ValueError("用户名、邮箱、手机号三个信息中请至少提供一项")
+        if values.get("organizations") and not values.get("org_type"):
+            raise ValueError("指定部门时请同时指定组织类型")
+        return values
+
+
+@dataclass
+class UserImportError:
+    row: int
+    message: str
+
+
+@dataclass
+class UserImportPassword:
+    row: int
+    username: str
+    password: str
+
+
+@dataclass
+class UserImportResult:
+    total: int = 0
+    created: int = 0
+    errors: list[UserImportError] = field(default_factory=list)
+    # passwords generated for the created users imported without one
+    passwords: list[UserImportPassword] = field(default_factory=list)
+
+
+class UserImporter:
+    """Turns an uploaded CSV or NDJSON file into batches of users.
+
+    The file is fed in chunks of bytes, so it is never held in memory as a
+    whole. CSV files must start with a header row; organization and role
+    codes are separated by semicolons.
+    """
+
+    def __init__(self, fmt: str, batch_size: int = IMPORT_BATCH_SIZE) -> None:
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.result = UserImportResult()
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+        self._line_no = 0
+        self._record = ""
+        self._record_line_no = 0
+        self._header: list[str] | None = None
+        self._batch: list[tuple[int, UserImportRow]] = []
+        self._accounts: set[str] = set()
+        self._generated_passwords: set[int] = set()
+
+    def feed(
+        self, data: bytes, final: bool = False
+    ) -> list[list[tuple[int, UserImportRow]]]:
+        """Parses a chunk of the file and returns the batches it completes."""
+        lines = (self._pending + self._decoder.decode(data, final)).split("\n")
+        self._pending = "" if final else lines.pop()
+        batches = []
+        for line in lines:
+            self._line_no += 1
+            if self.fmt == "csv":
+                self._feed_csv_line(line)
+            else:
+                self._feed_json_line(line)
+            if len(self._batch) >= self.batch_size:
+                batches.append(self._batch)
+                self._batch = []
+        if final:
+            if self._record:
+                self.add_error(self._record_line_no, "CSV 格式有误")
+            if self._batch:
+                batches.append(self._batch)
+                self._batch = []
+        return batches
+
+    def close(self) -> list[list[tuple[int, UserImportRow]]]:
+        return self.feed(b"", final=True)
+
+    def add_error(self, row: int, message: str) -> None:
+        self.result.errors.append(UserImportError(row=row, message=message))
+
+    def _feed_csv_line(self, line: str) -> None:
+        if not self._record:
+            if not line.strip():
+                return
+            self._record_line_no = self._line_no
+        self._record += line + "\n"
+        # a quoted field may span several lines
+        if self._record.count('"') % 2:
+            return
+        record, self._record = self._record, ""
+        values = next(csv.reader([record]))
+        if self._header is None:
+            self._header = [name.strip().lower() for name in values]
+            return
+        self._add_record(self._record_line_no, dict(zip(self._header, values)))
+
+    def _feed_json_line(self, line: str) -> None:
+        if not line.strip():
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            self.add_error(self._line_no, "JSON 格式有误")
+            return
+        self._add_record(self._line_no, record)
+
+    def _add_record(self, row: int, record: dict[str, Any]) -> None:
+        self.result.total += 1
+        try:
+            user = UserImportRow(**record)
+        except ValidationError as e:
+            error = e.errors()[0]
+            fields = ".".join(str(loc) for loc in error["loc"])
+            message = error["msg"]
+            if fields != "__root__":
+                message = f"{fields}: {message}"
+            self.add_error(row, message)
+            return
+        accounts = {
+            f"{key}:{value.lower()}"
+            for key in ("username", "email", "mobile")
+            if (value := getattr(user, key))
+        }
+        if accounts & self._accounts:
+            self.add_error(row, "用户名、邮箱或手机号与文件中其他行重复")
+            return
+        self._accounts |= accounts
+        self._batch.append((row, user))
+
+    @staticmethod
+    def get_references(
+        batch: list[tuple[int, UserImportRow]]
+    ) -> dict[str, list[str]]:
+        org_type_codes: set[str] = set()
+        organization_codes: set[str] = set()
+        role_codes: set[str] = set()
+        for _, user in batch:
+            if user.org_type:
+                org_type_codes.add(user.org_type)
+            organization_codes.update(user.organizations)
+            role_codes.update(user.roles)
+        return dict(
+            org_type_codes=sorted(org_type_codes),
+            organization_codes=sorted(organization_codes),
+            role_codes=sorted(role_codes),
+        )
+
+    def resolve(
+        self,
+        batch: list[tuple[int, UserImportRow]],
+        refs: (
+            admin_qry_async_edgeql.GetUserImportRefsResult
+            | admin_qry_edgeql.GetUserImportRefsResult
+        ),
+    ) -> list[dict[str, Any]]:
+        """Replaces codes with IDs, dropping the rows that cannot be
+        resolved."""
+        org_types = {ot.code_upper: ot.id for ot in refs.org_types}
+        organizations: dict[tuple[uuid.UUID | None, str], list[uuid.UUID]]
+        organizations = {}
+        for org in refs.organizations:
+            key = (org.org_type_id, org.code_upper or "")
+            organizations.setdefault(key, []).append(org.id)
+        roles = {role.code_upper: role for role in refs.roles}
+
+        items = []
+        for row, user in batch:
+            org_type_id = org_types.get(user.org_type)
+            if user.org_type and not org_type_id:
+                self.add_error(row, f"组织类型 {user.org_type} 不存在")
+                continue
+            organization_ids = []
+            for code in user.organizations:
+                ids = organizations.get((org_type_id, code), [])
+                if len(ids) != 1:
+                    self.add_error(
+                        row,
+                        (
+                            f"部门 {code} 不存在"
+                            if not ids
+                            else f"部门 Code {code} 存在多个匹配，请在界面中设置"
+                        ),
+                    )
+                    break
+                organization_ids.append(str(ids[0]))
+            else:
+                role_ids = []
+                for code in user.roles:
+                    role = roles.get(code)
+                    if not role or role.org_type_id not in (None, org_type_id):
+                        self.add_error(row, f"角色 {code} 不存在")
+                        break
+                    role_ids.append(str(role.id))
+                else:
+                    username = user.username or gen_random_string(8)
+                    password = user.password
+                    if not password:
+                        password = gen_random_string(12, secret=True)
+                        self._generated_passwords.add(row)
+                    items.append(
+                        dict(
+                            row=row,
+                            name=user.name or username,
+                            username=username,
+                            email=user.email,
+                            mobile=user.mobile,
+                            password=password,
+                            reset_pwd_on_next_login=(
+                                user.reset_pwd_on_first_login
+                            ),
+                            org_type_id=(
+                                str(org_type_id) if org_type_id else None
+                            ),
+                            organization_ids=organization_ids,
+                            role_ids=role_ids,
+                        )
+                    )
+        return items
+
+    def finish(self, items: list[dict[str, Any]], created: list[int]) -> None:
+        self.result.created += len(created)
+        created_rows = set(created)
+        for item in items:
+            row = item["row"]
+            if row not in created_rows:
+                self.add_error(row, "用户名、邮箱或手机号已被使用")
+            elif row in self._generated_passwords:
+                self.result.passwords.append(
+                    UserImportPassword(row, item["username"], item["password"])
+                )
+            self._generated_passwords.discard(row)
+
+
+def _dump_users(items: list[dict[str, Any]], hashed: Iterable[str]) -> str:
+    users = []
+    for item, hashed_password in zip(items, hashed):
+        user = item.copy()
+        del user["password"]
+        user["hashed_password"] = hashed_password
+        users.append(user)
+    return json.dumps(users)
+
+
+async def import_users_async(
+    db: edgedb.AsyncIOExecutor,
+    chunks: AsyncIterable[bytes],
+    fmt: str,
+    executor: Executor,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> UserImportResult:
+    """Imports users from an async stream of file chunks.
+
+    Passwords are hashed on `executor`, so that bcrypt does not block the
+    event loop.
+    """
+    loop = asyncio.get_running_loop()
+    importer = UserImporter(fmt, batch_size)
+
+    async def import_batch(batch: list[tuple[int, UserImportRow]]) -> None:
+        refs = await admin_qry_async_edgeql.get_user_import_refs(
+            db, **importer.get_references(batch)
+        )
+        items = importer.resolve(batch, refs)
+        if not items:
+            return
+        hashed = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    executor, get_password_hash, item["password"]
+                )
+                for item in items
+            )
+        )
+        created = await admin_qry_async_edgeql.import_users(
+            db, users=_dump_users(items, hashed)
+        )
+        importer.finish(items, created)
+
+    async for chunk in chunks:
+        for batch in importer.feed(chunk):
+            await import_batch(batch)
+    for batch in importer.close():
+        await import_batch(batch)
+    importer.result.errors.sort(key=lambda e: e.row)
+    return importer.result
+
+
+def import_users(
+    db: edgedb.Executor,
+    chunks: Iterable[bytes],
+    fmt: str,
+    executor: Executor,
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> UserImportResult:
+    """Imports users from file chunks with a blocking client."""
+    importer = UserImporter(fmt, batch_size)
+
+    def import_batch(batch: list[tuple[int, UserImportRow]]) -> None:
+        refs = admin_qry_edgeql.get_user_import_refs(
+            db, **importer.get_references(batch)
+        )
+        items = importer.resolve(batch, refs)
+        if not items:
+            return
+        hashed = executor.map(
+            get_password_hash, [item["password"] for item in items]
+        )
+        created = admin_qry_edgeql.import_users(
+            db, users=_dump_users(items, hashed)
+        )
+        importer.finish(items, created)
+
+    for chunk in chunks:
+        for batch in importer.feed(chunk):
+            import_batch(batch)
+    for batch in importer.close():
+        import_batch(batch)
+    importer.result.errors.sort(key=lambda e: e.row)
+    return importer.result
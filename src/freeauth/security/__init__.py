@@ -11,6 +11,8 @@
 
 from __future__ import annotations
 
+import hashlib
+
 __all__ = ["FreeAuthSecurity", "PermNeed"]
 
 
@@ -40,3 +42,10 @@ class FreeAuthSecurity(object):
                 perm = PermNeed(perm)
             if perm not in self.permissions:
                 self.permissions.append(perm)
+
+    @property
+    def permissions_fingerprint(self) -> str:
+        """A digest of the registered permission codes, regardless of the
+        order they were added in."""
+        codes = sorted(perm.code for perm in self.permissions)
+        return hashlib.sha256("\n".join(codes).encode()).hexdigest()
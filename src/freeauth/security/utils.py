@@ -12,14 +12,19 @@
 from __future__ import annotations
 
 import random
+import re
 import secrets
 import string
+from typing import Iterable
 
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 MOBILE_REGEX = r"^1[3-9]\d{9}$"
+EMAIL_REGEX = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+ACCOUNT_TYPES = ("username", "mobile", "email")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -38,3 +43,36 @@ def gen_random_string(
         return "".join(secrets.choice(letters) for _ in range(size))
     else:
         return "".join(random.choices(letters, k=size))
+
+
+def get_account_type(account: str) -> str | None:
+    """Tell which kind of account a login string is.
+
+    Usernames cannot contain ``@``, so a string is unambiguously a mobile,
+    an email or a username. Usernames chosen by users cannot start with a
+    digit either, but generated ones may, so anything that is neither a
+    mobile nor an email is taken as a username.
+    """
+    if re.match(MOBILE_REGEX, account):
+        return "mobile"
+    if re.match(EMAIL_REGEX, account):
+        return "email"
+    if "@" in account:
+        return None
+    return "username"
+
+
+def resolve_account(
+    account: str, types: Iterable[str] = ACCOUNT_TYPES
+) -> dict[str, str | None]:
+    """Map a login string onto the ``username``/``mobile``/``email``
+    arguments of the account queries, so that only one of them is set.
+
+    Every argument is ``None`` if the account is of a type not in
+    ``types``.
+    """
+    account_type = get_account_type(account)
+    return {
+        t: account if t == account_type and t in types else None
+        for t in ACCOUNT_TYPES
+    }
@@ -0,0 +1,76 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import datetime
+import random
+import uuid
+
+import pytest
+
+from freeauth.db.benchmark import (
+    INDEX_BENCHMARKS,
+    Dataset,
+    run_benchmarks,
+    seed,
+)
+
+
+class RecordingClient:
+    def __init__(self, seeded: bool = False):
+        self.ddl: list[str] = []
+        self.queries: list[str] = []
+        self.seeded = seeded
+
+    def execute(self, query: str) -> None:
+        self.ddl.append(query)
+
+    def query(self, query: str, **kwargs):
+        self.queries.append(query)
+        if "insert User" in query or (self.seeded and "bench_%" in query):
+            return [uuid.uuid4()]
+        return []
+
+
+def test_seed_is_reproducible():
+    datasets = [
+        seed(RecordingClient(), 3, 2, 2, random.Random(1)) for _ in range(2)
+    ]
+    assert datasets[0].accounts == datasets[1].accounts
+    assert len(datasets[0].accounts) == 3
+
+
+def test_seed_refuses_seeded_database():
+    client = RecordingClient(seeded=True)
+    with pytest.raises(ValueError):
+        seed(client, 3, 2, 2, random.Random(1))
+    assert len(client.queries) == 1
+
+
+def test_run_benchmarks_restores_indexes():
+    client = RecordingClient()
+    dataset = Dataset(
+        user_ids=[uuid.uuid4()],
+        accounts=["13800000000"],
+        now=datetime.datetime.now(datetime.timezone.utc),
+    )
+    results = list(run_benchmarks(client, dataset, 3, random.Random(0)))
+    assert [r.name for r in results] == [b.name for b in INDEX_BENCHMARKS]
+    assert len(client.ddl) == 2 * len(INDEX_BENCHMARKS)
+    for bench, drop, create in zip(
+        INDEX_BENCHMARKS, client.ddl[::2], client.ddl[1::2]
+    ):
+        assert f"drop index on ({bench.index})" in drop
+        assert f"create index on ({bench.index})" in create
+    # a warm-up and 3 timed runs, with and without the index
+    assert len(client.queries) == 8 * len(INDEX_BENCHMARKS)
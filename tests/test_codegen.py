@@ -0,0 +1,89 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import dataclasses
+import sys
+import types
+import uuid
+
+import pytest
+
+from freeauth.db.admin import admin_qry_edgeql
+from freeauth.db.codegen import compact_result_types
+
+GENERATED = """\
+from __future__ import annotations
+import dataclasses
+import uuid
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_validators__(cls):
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+        pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class GetNodeResult(NoPydanticValidation):
+    id: uuid.UUID
+    name: str | None
+    children: list[GetNodeResult]
+"""
+
+
+@pytest.fixture
+def load(monkeypatch):
+    def _load(source: str) -> types.ModuleType:
+        module = types.ModuleType("generated")
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+        exec(compile(source, "generated.py", "exec"), module.__dict__)
+        return module
+
+    return _load
+
+
+def test_compact_result_types(load):
+    compacted = compact_result_types(GENERATED)
+    assert compact_result_types(compacted) == compacted
+    assert '__slots__ = ("id", "name", "children")' in compacted
+
+    result_cls = load(compacted).GetNodeResult
+    result = result_cls(id=uuid.uuid4(), name=None, children=[])
+    assert not hasattr(result, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        result.name = "changed"
+
+
+def test_compacted_result_schema(load):
+    result_cls = load(compact_result_types(GENERATED)).GetNodeResult
+    assert result_cls.__get_validators__() == []
+
+    schema = result_cls.__pydantic_model__.schema()
+    assert schema["$ref"] == "#/definitions/GetNodeResult"
+    schema = schema["definitions"]["GetNodeResult"]
+    assert schema["required"] == ["id", "name", "children"]
+    assert schema["properties"]["children"]["items"] == {
+        "$ref": "#/definitions/GetNodeResult"
+    }
+
+
+def test_generated_modules_are_compact():
+    assert admin_qry_edgeql.NoPydanticValidation.__slots__ == ()
+    for value in vars(admin_qry_edgeql).values():
+        if dataclasses.is_dataclass(value):
+            assert value.__dataclass_params__.frozen
+            assert "__slots__" in value.__dict__
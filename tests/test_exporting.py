@@ -0,0 +1,220 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import uuid
+
+import pytest
+
+from freeauth.db.admin.admin_qry_async_edgeql import (
+    CreateRoleResultOrgType,
+    CreateUserResultDepartmentsItem,
+    CreateUserResultRolesItem,
+    ExportAuditLogsResult,
+    ExportAuditLogsResultUser,
+    ExportUsersResult,
+    FreeauthAuditEventType,
+    FreeauthAuditStatusCode,
+)
+from freeauth.db.exporting import (
+    EXPORTS,
+    AuditLogExporter,
+    ExportEncoder,
+    export,
+    export_audit_logs,
+)
+
+
+@pytest.fixture
+def users() -> list[ExportUsersResult]:
+    created_at = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+    return [
+        ExportUsersResult(
+            id=uuid.UUID(int=i),
+            name=f"用户{i}",
+            username=f"user{i}",
+            email=None,
+            mobile=None,
+            org_type=CreateRoleResultOrgType(
+                id=uuid.uuid4(), code="INNER", name="内部"
+            ),
+            departments=[
+                CreateUserResultDepartmentsItem(
+                    id=uuid.uuid4(), code="D1", name="部门1"
+                ),
+                CreateUserResultDepartmentsItem(
+                    id=uuid.uuid4(), code="D2", name="部门2"
+                ),
+            ],
+            roles=[
+                CreateUserResultRolesItem(
+                    id=uuid.uuid4(), code="R1", name="角色1"
+                )
+            ],
+            is_deleted=False,
+            created_at=created_at,
+            last_login_at=None,
+        )
+        for i in range(1, 6)
+    ]
+
+
+def test_encode_ndjson(users):
+    encoder = ExportEncoder(EXPORTS["users"], "ndjson")
+    assert encoder.header() == ""
+    lines = encoder.encode(users[:2]).splitlines()
+    assert len(lines) == 2
+    user = json.loads(lines[0])
+    assert user["id"] == str(users[0].id)
+    assert user["name"] == "用户1"
+    assert user["departments"][1]["code"] == "D2"
+    assert user["created_at"] == "2023-06-01T00:00:00+00:00"
+    assert user["last_login_at"] is None
+
+
+def test_encode_csv(users):
+    encoder = ExportEncoder(EXPORTS["users"], "csv")
+    assert (
+        encoder.header().rstrip()
+        == "id,name,username,email,mobile,org_type,organizations,roles,"
+        "is_deleted,created_at,last_login_at"
+    )
+    assert (
+        encoder.encode(users[:1]).rstrip()
+        == f"{users[0].id},用户1,user1,,,INNER,D1;D2,R1,"
+        "False,2023-06-01T00:00:00+00:00,"
+    )
+
+
+def test_export_in_chunks(mocker, users):
+    def export_users(db, *, after, limit):
+        calls.append(after)
+        rest = [u for u in users if after is None or u.id > after]
+        return rest[:limit]
+
+    calls: list[uuid.UUID | None] = []
+    mocker.patch(
+        "freeauth.db.admin.admin_qry_edgeql.export_users", export_users
+    )
+    chunks = list(export(None, "users", "ndjson", chunk_size=2))
+    assert len(chunks) == 3
+    assert calls == [None, users[1].id, users[3].id]
+    exported = [json.loads(line) for c in chunks for line in c.splitlines()]
+    assert [u["username"] for u in exported] == [u.username for u in users]
+
+
+@pytest.fixture
+def audit_logs() -> list[ExportAuditLogsResult]:
+    user = ExportAuditLogsResultUser(
+        id=uuid.uuid4(),
+        name="用户",
+        username="user",
+        email=None,
+        mobile=None,
+    )
+    start = datetime.datetime(2023, 6, 1, tzinfo=datetime.timezone.utc)
+    return [
+        ExportAuditLogsResult(
+            id=uuid.UUID(int=i),
+            event_type=FreeauthAuditEventType.SIGNIN,
+            status_code=FreeauthAuditStatusCode.OK,
+            is_succeed=True,
+            user=user,
+            client_ip="127.0.0.1",
+            os=None,
+            device=None,
+            browser=None,
+            raw_ua=None,
+            # two logs share each timestamp
+            created_at=start + datetime.timedelta(minutes=i // 2),
+        )
+        for i in range(7)
+    ]
+
+
+@pytest.fixture
+def audit_log_query(mocker, audit_logs):
+    def export_audit_logs(
+        db, *, after_created_at, after_id, since, until, limit
+    ):
+        calls.append((after_created_at, after_id))
+        rv = [
+            log
+            for log in audit_logs
+            if since <= log.created_at < until
+            and (
+                after_created_at is None
+                or (log.created_at, log.id) > (after_created_at, after_id)
+            )
+        ]
+        return rv[:limit]
+
+    calls: list[tuple] = []
+    mocker.patch(
+        "freeauth.db.admin.admin_qry_edgeql.export_audit_logs",
+        export_audit_logs,
+    )
+    return calls
+
+
+def test_export_audit_logs_csv(audit_log_query, audit_logs):
+    exporter = AuditLogExporter(
+        "csv",
+        datetime.datetime(2023, 6, 1),
+        datetime.datetime(2023, 7, 1),
+        chunk_size=3,
+    )
+    assert exporter.since.tzinfo is datetime.timezone.utc
+    assert exporter.filename == "audit_logs_20230601_20230701.csv.gz"
+    data = b"".join(export_audit_logs(None, exporter))
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(data).decode())))
+
+    assert audit_log_query == [
+        (None, None),
+        (audit_logs[2].created_at, audit_logs[2].id),
+        (audit_logs[5].created_at, audit_logs[5].id),
+    ]
+    assert [row["id"] for row in rows] == [str(log.id) for log in audit_logs]
+    assert rows[0]["event_type"] == "SignIn"
+    assert rows[0]["username"] == "user"
+    assert rows[0]["os"] == ""
+    assert exporter.after == (audit_logs[-1].created_at, audit_logs[-1].id)
+
+
+def test_resume_audit_log_export(audit_log_query, audit_logs):
+    since = datetime.datetime(2023, 6, 1)
+    until = datetime.datetime(2023, 6, 1, 0, 3)
+    first = AuditLogExporter("csv", since, until, chunk_size=2)
+    chunks = export_audit_logs(None, first)
+    # the download is interrupted after the first chunk of logs
+    data = next(chunks) + next(chunks)
+    assert gzip.decompress(data).decode().count("\n") == 3
+
+    resumed = AuditLogExporter(
+        "csv", since, until, after=first.after, chunk_size=2
+    )
+    data += b"".join(export_audit_logs(None, resumed))
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(data).decode())))
+    assert [row["id"] for row in rows] == [
+        str(log.id) for log in audit_logs[:6]
+    ]
+
+    resumed = AuditLogExporter("ndjson", since, until, after=first.after)
+    lines = b"".join(export_audit_logs(None, resumed)).splitlines()
+    assert json.loads(lines[0])["id"] == str(audit_logs[2].id)
+    assert json.loads(lines[0])["status_code"] == "OK"
@@ -0,0 +1,168 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+import json
+import uuid
+
+from freeauth.db.admin.admin_qry_async_edgeql import (
+    GetUserImportRefsResult,
+    GetUserImportRefsResultOrganizationsItem,
+    GetUserImportRefsResultOrgTypesItem,
+    GetUserImportRefsResultRolesItem,
+)
+from freeauth.db.importing import UserImporter
+
+
+def feed_all(importer, data: bytes, chunk_size: int = 7):
+    batches = []
+    for start in range(0, len(data), chunk_size):
+        end = start + chunk_size
+        batches += importer.feed(data[start:end])
+    return batches + importer.close()
+
+
+def test_parse_csv_in_chunks():
+    data = (
+        "\ufeffname,username,email,mobile,org_type,organizations\n"
+        '"张三, Jr.",zhangsan,,,inner,"dept1; dept2"\n'
+        '"multi\nline",lisi,,13800000000,,\n'
+        "\n"
+        "noaccount,,,,,\n"
+        "bad,,not-an-email,,,\n"
+        "dup,zhangsan,,,,\n"
+        "nodept,wangwu,,,,dept1\n"
+    ).encode()
+    importer = UserImporter("csv", batch_size=1)
+    batches = feed_all(importer, data)
+
+    assert [len(batch) for batch in batches] == [1, 1]
+    (row1, user1), (row2, user2) = batches[0][0], batches[1][0]
+    assert row1 == 2
+    assert user1.name == "张三, Jr."
+    assert user1.org_type == "INNER"
+    assert user1.organizations == ["DEPT1", "DEPT2"]
+    assert user1.email is None
+    assert row2 == 3
+    assert user2.name == "multi\nline"
+    assert user2.mobile == "13800000000"
+
+    assert importer.result.total == 6
+    assert {e.row: e.message for e in importer.result.errors} == {
+        6: "用户名、邮箱、手机号三个信息中请至少提供一项",
+        7: "email: 邮箱格式有误",
+        8: "用户名、邮箱或手机号与文件中其他行重复",
+        9: "指定部门时请同时指定组织类型",
+    }
+
+
+def test_parse_ndjson():
+    data = (
+        json.dumps({"username": "user1", "roles": ["r1", "r2"]})
+        + "\n[1, 2]\n"
+        + json.dumps({"username": "1user"})
+    ).encode()
+    importer = UserImporter("ndjson")
+    batches = feed_all(importer, data, chunk_size=5)
+
+    assert len(batches) == 1
+    assert batches[0][0][1].roles == ["R1", "R2"]
+    errors = {e.row: e.message for e in importer.result.errors}
+    assert errors[2] == "JSON 格式有误"
+    assert errors[3].startswith("username")
+
+
+def test_resolve_references():
+    org_type_id = uuid.uuid4()
+    other_org_type_id = uuid.uuid4()
+    dept_id = uuid.uuid4()
+    role_id = uuid.uuid4()
+    refs = GetUserImportRefsResult(
+        id=uuid.uuid4(),
+        org_types=[
+            GetUserImportRefsResultOrgTypesItem(
+                id=org_type_id, code_upper="INNER"
+            )
+        ],
+        organizations=[
+            GetUserImportRefsResultOrganizationsItem(
+                id=dept_id, code_upper="DEPT", org_type_id=org_type_id
+            )
+        ],
+        roles=[
+            GetUserImportRefsResultRolesItem(
+                id=role_id, code_upper="ROLE", org_type_id=None
+            ),
+            GetUserImportRefsResultRolesItem(
+                id=uuid.uuid4(),
+                code_upper="OTHER",
+                org_type_id=other_org_type_id,
+            ),
+        ],
+    )
+    data = (
+        "username,org_type,organizations,roles\n"
+        "u1,inner,dept,role\n"
+        "u2,unknown,,\n"
+        "u3,inner,missing,\n"
+        "u4,inner,,other\n"
+    ).encode()
+    importer = UserImporter("csv")
+    (batch,) = feed_all(importer, data)
+    assert importer.get_references(batch) == dict(
+        org_type_codes=["INNER", "UNKNOWN"],
+        organization_codes=["DEPT", "MISSING"],
+        role_codes=["OTHER", "ROLE"],
+    )
+
+    (item,) = importer.resolve(batch, refs)
+    assert item["row"] == 2
+    assert item["name"] == "u1"
+    assert item["org_type_id"] == str(org_type_id)
+    assert item["organization_ids"] == [str(dept_id)]
+    assert item["role_ids"] == [str(role_id)]
+    assert len(item["password"]) == 12
+    assert [(e.row, e.message) for e in importer.result.errors] == [
+        (3, "组织类型 UNKNOWN 不存在"),
+        (4, "部门 MISSING 不存在"),
+        (5, "角色 OTHER 不存在"),
+    ]
+
+    importer.finish([item], [])
+    assert importer.result.created == 0
+    assert importer.result.errors[-1].message == "用户名、邮箱或手机号已被使用"
+    assert not importer.result.passwords
+
+
+def test_report_generated_passwords():
+    data = (
+        '{"username": "u1"}\n'
+        '{"username": "u2", "password": "password"}\n'
+        '{"username": "u3"}\n'
+    ).encode()
+    importer = UserImporter("ndjson")
+    (batch,) = feed_all(importer, data)
+    items = importer.resolve(
+        batch,
+        GetUserImportRefsResult(
+            id=uuid.uuid4(), org_types=[], organizations=[], roles=[]
+        ),
+    )
+    assert items[1]["password"] == "password"
+
+    importer.finish(items, [1, 2])
+    assert importer.result.created == 2
+    assert [(p.row, p.username) for p in importer.result.passwords] == [
+        (1, "u1")
+    ]
+    assert importer.result.passwords[0].password == items[0]["password"]
@@ -0,0 +1,31 @@
+# Copyright (c) 2016-present DecentFoX Studio and the FreeAuth authors.
+# FreeAuth is licensed under Mulan PSL v2.
+# You can use this software according to the terms and conditions of the Mulan
+# PSL v2.
+# You may obtain a copy of Mulan PSL v2 at:
+#          http://license.coscl.org.cn/MulanPSL2
+# THIS SOFTWARE IS PROVIDED ON AN "AS IS" BASIS, WITHOUT WARRANTIES OF ANY
+# KIND, EITHER EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# NON-INFRINGEMENT, MERCHANTABILITY OR FIT FOR A PARTICULAR PURPOSE.
+# See the Mulan PSL v2 for more details.
+
+
+from __future__ import annotations
+
+from freeauth.security import FreeAuthSecurity, PermNeed
+
+
+def test_permissions_fingerprint():
+    security = FreeAuthSecurity()
+    empty = security.permissions_fingerprint
+
+    security.add_perm("read:users", PermNeed("write:users"))
+    fingerprint = security.permissions_fingerprint
+    assert fingerprint != empty
+
+    reordered = FreeAuthSecurity()
+    reordered.add_perm("write:users", "read:users", "read:users")
+    assert reordered.permissions_fingerprint == fingerprint
+
+    security.add_perm("read:roles")
+    assert security.permissions_fingerprint != fingerprint
@@ -15,7 +15,9 @@ import string
 
 from freeauth.security.utils import (
     gen_random_string,
+    get_account_type,
     get_password_hash,
+    resolve_account,
     verify_password,
 )
 
@@ -36,3 +38,22 @@ def test_password_hash():
     hashed_password = get_password_hash("123456")
     assert not verify_password("123123", hashed_password)
     assert verify_password("123456", hashed_password)
+
+
+def test_resolve_account():
+    assert get_account_type("13800000000") == "mobile"
+    assert get_account_type("user@example.com") == "email"
+    assert get_account_type("user") == "username"
+    assert get_account_type("1user") == "username"
+    assert get_account_type("user@localhost") is None
+
+    assert resolve_account("user@example.com") == {
+        "username": None,
+        "mobile": None,
+        "email": "user@example.com",
+    }
+    assert resolve_account("13800000000", ["username", "email"]) == {
+        "username": None,
+        "mobile": None,
+        "email": None,
+    }